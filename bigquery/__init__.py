@@ -1,3 +1,34 @@
+import importlib
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)-12s %(levelname)-8s %(message)s")
+
+_LAZY_EXPORTS = {
+    "EmsApiError": "bigquery.ems_api_error",
+    "EmsAutoPriorityPolicy": "bigquery.ems_auto_priority",
+    "EmsBigqueryClient": "bigquery.ems_bigquery_client",
+    "EmsBigquerySession": "bigquery.ems_bigquery_session",
+    "EmsBufferedResult": "bigquery.ems_buffered_result",
+    "EmsCheckpointStore": "bigquery.ems_checkpoint",
+    "EmsCheckpointedPipeline": "bigquery.ems_checkpoint",
+    "EmsCopyJobConfig": "bigquery.job.config.ems_copy_job_config",
+    "EmsQueryDagExecutor": "bigquery.ems_query_dag",
+    "EmsQueryFanout": "bigquery.ems_query_fanout",
+    "EmsQueryNode": "bigquery.ems_query_dag",
+    "EmsQueryTemplateRegistry": "bigquery.ems_query_template",
+    "EmsStatementBatcher": "bigquery.ems_statement_batcher",
+    "RetryLimitExceededError": "bigquery.ems_bigquery_client",
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
@@ -0,0 +1,71 @@
+from typing import Callable
+
+from bigquery.job.config.ems_job_config import EmsJobPriority
+
+DEFAULT_MAX_INTERACTIVE_JOBS = 100
+DEFAULT_BATCH_START_DELAY_SECONDS = 600.
+DEFAULT_BATCH_BYTES_THRESHOLD = 1024 ** 4
+DEFAULT_IN_FLIGHT_REFRESH_SECONDS = 30.
+
+
+class EmsAutoPriorityPolicy:
+    """
+    Resolves EmsJobPriority.AUTO to INTERACTIVE or BATCH for a single query.
+
+    When max_interactive_jobs interactive jobs are already running or pending, a new interactive job would only queue
+    behind them, so BATCH is chosen. Otherwise a latency target shorter than batch_start_delay_seconds gets
+    INTERACTIVE and a longer one BATCH. Without a latency target everything goes to INTERACTIVE, unless
+    estimate_bytes_with_dry_run is set: then queries whose dry run reports at least batch_bytes_threshold bytes go to
+    BATCH, at the price of a dry run per query.
+
+    The client counts the interactive jobs in flight at most every in_flight_refresh_seconds, scanning only until
+    max_interactive_jobs are found, and adds the jobs it started as INTERACTIVE in between.
+    """
+
+    def __init__(self,
+                 max_interactive_jobs: int = DEFAULT_MAX_INTERACTIVE_JOBS,
+                 batch_start_delay_seconds: float = DEFAULT_BATCH_START_DELAY_SECONDS,
+                 batch_bytes_threshold: int = DEFAULT_BATCH_BYTES_THRESHOLD,
+                 estimate_bytes_with_dry_run: bool = False,
+                 in_flight_refresh_seconds: float = DEFAULT_IN_FLIGHT_REFRESH_SECONDS):
+        if max_interactive_jobs < 1:
+            raise ValueError("max_interactive_jobs must be at least 1!")
+        self.__max_interactive_jobs = max_interactive_jobs
+        self.__batch_start_delay_seconds = batch_start_delay_seconds
+        self.__batch_bytes_threshold = batch_bytes_threshold
+        self.__estimate_bytes_with_dry_run = estimate_bytes_with_dry_run
+        self.__in_flight_refresh_seconds = in_flight_refresh_seconds
+
+    @property
+    def max_interactive_jobs(self) -> int:
+        return self.__max_interactive_jobs
+
+    @property
+    def batch_start_delay_seconds(self) -> float:
+        return self.__batch_start_delay_seconds
+
+    @property
+    def batch_bytes_threshold(self) -> int:
+        return self.__batch_bytes_threshold
+
+    @property
+    def estimate_bytes_with_dry_run(self) -> bool:
+        return self.__estimate_bytes_with_dry_run
+
+    @property
+    def in_flight_refresh_seconds(self) -> float:
+        return self.__in_flight_refresh_seconds
+
+    def choose(self,
+               in_flight_interactive_jobs: int,
+               latency_target_seconds: float = None,
+               estimate_bytes_processed: Callable[[], int] = None) -> EmsJobPriority:
+        if in_flight_interactive_jobs >= self.__max_interactive_jobs:
+            return EmsJobPriority.BATCH
+        if latency_target_seconds is not None:
+            if latency_target_seconds < self.__batch_start_delay_seconds:
+                return EmsJobPriority.INTERACTIVE
+            return EmsJobPriority.BATCH
+        if estimate_bytes_processed is not None and estimate_bytes_processed() >= self.__batch_bytes_threshold:
+            return EmsJobPriority.BATCH
+        return EmsJobPriority.INTERACTIVE
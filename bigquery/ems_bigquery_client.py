@@ -1,35 +1,59 @@
+import concurrent.futures
 import logging
 import re
-from datetime import datetime
-from typing import List, Union, Iterable
-
-from google.api_core.exceptions import GoogleAPIError, NotFound, Conflict
-from google.cloud import bigquery
-from google.cloud.bigquery import QueryJobConfig, QueryJob, TableReference, DatasetReference, TimePartitioning, \
-    LoadJobConfig, LoadJob, ExtractJobConfig, ExtractJob
-from google.cloud.bigquery.schema import _parse_schema_resource, _build_schema_resource
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Union, Iterable, TYPE_CHECKING
 
 from bigquery.ems_api_error import EmsApiError
+from bigquery.ems_auto_priority import EmsAutoPriorityPolicy
+from bigquery.ems_bigquery_session import EmsBigquerySession
+from bigquery.ems_buffered_result import EmsBufferedResult, DEFAULT_MAX_MEMORY_BYTES
+from bigquery.ems_export_reader import read_export_stream
+from bigquery.ems_dataframe import check_dataframe_dependencies, iter_dataframes, to_dataframe
+from bigquery.ems_query_parameter import EmsQueryParameter, EmsScalarQueryParameter, EmsArrayQueryParameter, \
+    EmsStructQueryParameter, to_ems_query_parameters
+from bigquery.job.config.ems_copy_job_config import EmsCopyJobConfig, EmsCopyOperationType
 from bigquery.job.config.ems_extract_job_config import EmsExtractJobConfig, Compression, DestinationFormat
 from bigquery.job.config.ems_job_config import EmsJobPriority, EmsCreateDisposition, EmsWriteDisposition
-from bigquery.job.config.ems_load_job_config import EmsLoadJobConfig
-from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig, EmsTimePartitioning, EmsTimePartitioningType
+from bigquery.job.config.ems_load_job_config import EmsLoadJobConfig, EmsSourceFormat
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig, EmsTimePartitioning, EmsTimePartitioningType, \
+    EmsRangePartitioning
+from bigquery.job.ems_copy_job import EmsCopyJob
 from bigquery.job.ems_extract_job import EmsExtractJob
 from bigquery.job.ems_job import EmsJob
 from bigquery.job.ems_job_state import EmsJobState
 from bigquery.job.ems_load_job import EmsLoadJob
 from bigquery.job.ems_query_job import EmsQueryJob
 
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from storage.ems_storage_client import EmsStorageClient
+    from google.cloud.bigquery import QueryJobConfig, QueryJob, TimePartitioning, LoadJobConfig, ExtractJobConfig, \
+        CopyJobConfig, RangePartitioning, TableReference
+
+
 LOGGER = logging.getLogger(__name__)
 
 RETRY = "-retry-"
+IN_FLIGHT_SCAN_FACTOR = 10
 
 
 class EmsBigqueryClient:
-    def __init__(self, project_id: str, location: str = "EU"):
+    def __init__(self, project_id: str, location: str = "EU", auto_priority_policy: EmsAutoPriorityPolicy = None):
+        from google.cloud import bigquery
+
         self.__project_id = project_id
         self.__bigquery_client = bigquery.Client(project_id, location=location)
         self.__location = location
+        self.__auto_priority_policy = auto_priority_policy or EmsAutoPriorityPolicy()
+        self.__in_flight_lock = threading.Lock()
+        self.__in_flight_interactive_jobs = 0
+        self.__in_flight_counted_at = None
 
     @property
     def project_id(self) -> str:
@@ -40,6 +64,8 @@ class EmsBigqueryClient:
         return self.__location
 
     def dataset_exists(self, dataset_id: str):
+        from google.api_core.exceptions import NotFound
+
         try:
             self.__bigquery_client.get_dataset(dataset_id)
         except NotFound:
@@ -47,6 +73,8 @@ class EmsBigqueryClient:
         return True
 
     def create_dataset_if_not_exists(self, dataset_id: str):
+        from google.api_core.exceptions import Conflict
+
         dataset = self.__bigquery_client.dataset(dataset_id, self.__project_id)
         try:
             self.__bigquery_client.create_dataset(dataset)
@@ -55,6 +83,8 @@ class EmsBigqueryClient:
             LOGGER.info("Dataset %s already exists in project %s", dataset_id, self.__project_id)
 
     def delete_dataset_if_exists(self, dataset_id: str, delete_contents=False):
+        from google.api_core.exceptions import NotFound
+
         try:
             self.__bigquery_client.delete_dataset(dataset_id, delete_contents)
             LOGGER.info("Dataset %s deleted in project %s", dataset_id, self.__project_id)
@@ -62,6 +92,9 @@ class EmsBigqueryClient:
             LOGGER.info("Dataset %s not found in project %s", dataset_id, self.__project_id)
 
     def table_exists(self, table: str) -> bool:
+        from google.api_core.exceptions import NotFound
+        from google.cloud.bigquery import TableReference
+
         try:
             self.__bigquery_client.get_table(table=TableReference.from_string(table))
             return True
@@ -94,8 +127,18 @@ class EmsBigqueryClient:
             if ems_job is not None:
                 yield ems_job
 
+    @staticmethod
+    def __get_script_start_line(job) -> Optional[int]:
+        script_statistics = job.script_statistics
+        if script_statistics is None or not script_statistics.stack_frames:
+            return None
+        return script_statistics.stack_frames[0].start_line
+
     @staticmethod
     def __convert_to_ems_job(job):
+        from google.cloud.bigquery import QueryJob, LoadJob, ExtractJob, CopyJob
+        from google.cloud.bigquery.schema import _build_schema_resource
+
         if isinstance(job, QueryJob):
             destination = job.destination
             table_id, dataset_id, project_id = \
@@ -112,12 +155,18 @@ class EmsBigqueryClient:
                                            job.write_disposition),
                                        time_partitioning=EmsBigqueryClient.__convert_to_ems_time_partitioning(
                                            job.time_partitioning),
+                                       range_partitioning=EmsBigqueryClient.__convert_to_ems_range_partitioning(
+                                           job.range_partitioning),
+                                       clustering_fields=job.clustering_fields,
                                        labels=job.labels)
             return EmsQueryJob(job.job_id, job.query,
                                config,
                                EmsJobState(job.state),
                                job.error_result,
-                               job.created)
+                               job.created,
+                               job.statement_type,
+                               job.num_dml_affected_rows,
+                               EmsBigqueryClient.__get_script_start_line(job))
         elif isinstance(job, LoadJob):
             destination = job.destination
             table_id, dataset_id, project_id = destination.table_id, destination.dataset_id, destination.project
@@ -132,6 +181,8 @@ class EmsBigqueryClient:
                                           job.create_disposition),
                                       write_disposition=EmsBigqueryClient.__convert_to_ems_write_disposition(
                                           job.write_disposition),
+                                      source_format=EmsBigqueryClient.__convert_to_ems_source_format(
+                                          job.source_format),
                                       labels=job.labels)
 
             return EmsLoadJob(job_id=job.job_id,
@@ -156,10 +207,44 @@ class EmsBigqueryClient:
                                  state=EmsJobState(job.state),
                                  error_result=job.error_result,
                                  created=job.created)
+        elif isinstance(job, CopyJob):
+            source_tables = [f"{source.project}.{source.dataset_id}.{source.table_id}" for source in job.sources]
+            destination = job.destination
+            destination_table = f"{destination.project}.{destination.dataset_id}.{destination.table_id}"
+            job_config = EmsCopyJobConfig(
+                operation_type=EmsBigqueryClient.__convert_to_ems_operation_type(job.configuration.operation_type),
+                destination_expiration_time=EmsBigqueryClient.__parse_rfc3339(
+                    job.configuration.destination_expiration_time),
+                create_disposition=EmsBigqueryClient.__convert_to_ems_create_disposition(job.create_disposition),
+                write_disposition=EmsBigqueryClient.__convert_to_ems_write_disposition(job.write_disposition),
+                labels=job.labels)
+            return EmsCopyJob(job_id=job.job_id,
+                              source_tables=source_tables,
+                              destination_table=destination_table,
+                              job_config=job_config,
+                              state=EmsJobState(job.state),
+                              error_result=job.error_result,
+                              created=job.created)
         else:
             LOGGER.warning(f"Unexpected job type for : {job.job_id}, with type class: {job.__class__}")
             return None
 
+    @staticmethod
+    def __format_rfc3339(value: datetime) -> str:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    @staticmethod
+    def __parse_rfc3339(value: Optional[str]) -> Optional[datetime]:
+        if value is None:
+            return None
+        date_part, _, fraction = value.rstrip("Z").partition(".")
+        parsed = datetime.strptime(date_part, "%Y-%m-%dT%H:%M:%S")
+        if fraction:
+            parsed = parsed.replace(microsecond=int(fraction[:6].ljust(6, "0")))
+        return parsed.replace(tzinfo=timezone.utc)
+
     @staticmethod
     def __convert_to_ems_create_disposition(disposition):
         if disposition is None:
@@ -167,7 +252,19 @@ class EmsBigqueryClient:
         return EmsCreateDisposition(disposition)
 
     @staticmethod
-    def __convert_to_ems_time_partitioning(partitioning: TimePartitioning) -> EmsTimePartitioning:
+    def __convert_to_ems_source_format(source_format: str) -> EmsSourceFormat:
+        if source_format not in EmsSourceFormat.__members__:
+            return EmsSourceFormat.CSV
+        return EmsSourceFormat(source_format)
+
+    @staticmethod
+    def __convert_to_ems_operation_type(operation_type: str) -> EmsCopyOperationType:
+        if operation_type not in EmsCopyOperationType.__members__:
+            return EmsCopyOperationType.COPY
+        return EmsCopyOperationType(operation_type)
+
+    @staticmethod
+    def __convert_to_ems_time_partitioning(partitioning: "TimePartitioning") -> EmsTimePartitioning:
         if partitioning is None:
             return None
         return EmsTimePartitioning(type_=EmsTimePartitioningType(partitioning.type_),
@@ -175,12 +272,44 @@ class EmsBigqueryClient:
                                    expiration_ms=partitioning.expiration_ms,
                                    require_partition_filter=partitioning.require_partition_filter)
 
+    @staticmethod
+    def __convert_to_ems_range_partitioning(partitioning: "RangePartitioning") -> EmsRangePartitioning:
+        if partitioning is None:
+            return None
+        return EmsRangePartitioning(field=partitioning.field,
+                                    start=partitioning.range_.start,
+                                    end=partitioning.range_.end,
+                                    interval=partitioning.range_.interval)
+
     @staticmethod
     def __convert_to_ems_write_disposition(disposition):
         if disposition is None:
             return None
         return EmsWriteDisposition(disposition)
 
+    def get_child_jobs(self, parent_job_id: str) -> List[EmsJob]:
+        """
+        Returns the jobs of the statements of a script job in execution order.
+        """
+        jobs = self.__bigquery_client.list_jobs(parent_job=parent_job_id)
+        ordered_jobs = sorted(jobs, key=lambda job: (job.created, job.job_id))
+        return [ems_job for ems_job in map(self.__convert_to_ems_job, ordered_jobs) if ems_job is not None]
+
+    def get_in_flight_job_counts(self, all_users: bool = True, max_results: int = None) -> Dict[EmsJobPriority, int]:
+        """
+        Counts running and pending query jobs of the project by priority, looking at most at max_results running
+        and max_results pending jobs.
+        """
+        from google.cloud.bigquery import QueryJob
+
+        counts = {EmsJobPriority.INTERACTIVE: 0, EmsJobPriority.BATCH: 0}
+        for state in ("running", "pending"):
+            for job in self.__bigquery_client.list_jobs(all_users=all_users, state_filter=state,
+                                                        max_results=max_results):
+                if isinstance(job, QueryJob) and job.priority in EmsJobPriority.__members__:
+                    counts[EmsJobPriority[job.priority]] += 1
+        return counts
+
     def get_jobs_with_prefix(self, job_prefix: str, min_creation_time: datetime, max_creation_time: datetime = None,
                              max_result: int = 20, all_users: bool = True) -> list:
         jobs = self.get_job_list(min_creation_time, max_creation_time, max_result, all_users=all_users)
@@ -189,13 +318,16 @@ class EmsBigqueryClient:
 
     def relaunch_failed_jobs(self, job_prefix: str, min_creation_time: datetime, max_creation_time: datetime = None,
                              max_attempts: int = 3, max_result: int = None, all_users: bool = True) -> list:
-        def launch(job: Union[EmsQueryJob, EmsExtractJob]) -> str:
-            prefix_with_retry = self.__decorate_id_with_retry(job.job_id, job_prefix, max_attempts)
+        def launch(job: Union[EmsQueryJob, EmsExtractJob, EmsCopyJob]) -> str:
+            prefix_with_retry = self.decorate_id_with_retry(job.job_id, job_prefix, max_attempts)
 
             if isinstance(job, EmsQueryJob):
                 return self.run_async_query(job.query, prefix_with_retry, job.query_config)
             elif isinstance(job, EmsExtractJob):
                 return self.run_async_extract_job(prefix_with_retry, job.table, job.destination_uris, job.job_config)
+            elif isinstance(job, EmsCopyJob):
+                return self.run_async_copy_job(prefix_with_retry, job.source_tables, job.destination_table,
+                                               job.job_config)
             else:
                 LOGGER.error(f"Unsupported job: {job}")
 
@@ -208,12 +340,23 @@ class EmsBigqueryClient:
                         query: str,
                         job_id_prefix: str = None,
                         ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(
-                            priority=EmsJobPriority.INTERACTIVE)) -> str:
+                            priority=EmsJobPriority.INTERACTIVE),
+                        session_id: str = None,
+                        query_parameters: Union[Dict[str, Any], List[Any]] = None,
+                        deadline_seconds: float = None) -> str:
+        """
+        If deadline_seconds is given, BigQuery cancels the job once it has been running for that long.
+        """
         return self.__execute_query_job(query=query,
                                         ems_query_job_config=ems_query_job_config,
-                                        job_id_prefix=job_id_prefix).job_id
+                                        job_id_prefix=job_id_prefix,
+                                        session_id=session_id,
+                                        query_parameters=query_parameters,
+                                        deadline_seconds=deadline_seconds).job_id
 
     def run_async_load_job(self, job_id_prefix: str, config: EmsLoadJobConfig) -> str:
+        from google.cloud.bigquery import TableReference, DatasetReference
+
         return self.__bigquery_client.load_table_from_uri(source_uris=config.source_uri_template,
                                                           destination=TableReference(
                                                               DatasetReference(config.destination_project_id,
@@ -225,6 +368,7 @@ class EmsBigqueryClient:
 
     def run_async_extract_job(self, job_id_prefix: str, table: str, destination_uris: List[str],
                               job_config: EmsExtractJobConfig) -> str:
+        from google.cloud.bigquery import TableReference
 
         extract_job_config = self.__create_extract_job_config(job_config)
 
@@ -234,59 +378,483 @@ class EmsBigqueryClient:
                                                     location=self.__location,
                                                     job_config=extract_job_config).job_id
 
+    def run_async_copy_job(self, job_id_prefix: str, source_tables: Union[str, List[str]], destination_table: str,
+                           job_config: EmsCopyJobConfig = EmsCopyJobConfig()) -> str:
+        from google.cloud.bigquery import TableReference
+
+        if isinstance(source_tables, str):
+            source_tables = [source_tables]
+
+        return self.__bigquery_client.copy_table(sources=[TableReference.from_string(table_id=table)
+                                                          for table in source_tables],
+                                                 destination=TableReference.from_string(table_id=destination_table),
+                                                 job_id_prefix=job_id_prefix,
+                                                 location=self.__location,
+                                                 job_config=self.__create_copy_job_config(job_config)).job_id
+
+    def run_async_copy_jobs(self, job_id_prefix: str, table_mapping: Dict[str, str],
+                            job_config: EmsCopyJobConfig = EmsCopyJobConfig(), max_parallelism: int = 16) -> List[str]:
+        """
+        Submits one copy job per source -> destination pair of table_mapping. Copy, snapshot and clone jobs are
+        metadata operations on the BigQuery side, so submitting them concurrently is the only client-side cost.
+        Returns the job ids in the order of table_mapping.
+        """
+        with ThreadPoolExecutor(max_workers=max_parallelism) as executor:
+            futures = [executor.submit(self.run_async_copy_job, job_id_prefix, source, destination, job_config)
+                       for source, destination in table_mapping.items()]
+            return [future.result() for future in futures]
+
     def run_sync_query(self,
                        query: str,
                        ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(priority=EmsJobPriority.INTERACTIVE),
-                       job_id_prefix: str = None
+                       job_id_prefix: str = None,
+                       session_id: str = None,
+                       query_parameters: Union[Dict[str, Any], List[Any]] = None,
+                       deadline_seconds: float = None
                        ) -> Iterable:
+        """
+        query_parameters are bound to @name (dict) or ? (list) placeholders of the query. Values are either
+        EmsQueryParameters or plain Python values, lists and dicts whose BigQuery type is inferred.
+        If the query does not finish within deadline_seconds, its job is cancelled and JobDeadlineExceededError
+        is raised.
+        """
+        from google.api_core.exceptions import GoogleAPIError
+
         LOGGER.info("Sync query executed with priority: %s", ems_query_job_config.priority)
         try:
-            return self.__get_mapped_iterator(
-                self.__execute_query_job(
-                    query=query,
-                    ems_query_job_config=ems_query_job_config,
-                    job_id_prefix=job_id_prefix
-                ).result()
+            job = self.__execute_query_job(
+                query=query,
+                ems_query_job_config=ems_query_job_config,
+                job_id_prefix=job_id_prefix,
+                session_id=session_id,
+                query_parameters=query_parameters,
+                deadline_seconds=deadline_seconds
             )
+            try:
+                return self.__get_mapped_iterator(job.result(timeout=deadline_seconds))
+            except concurrent.futures.TimeoutError:
+                self.__cancel_after_deadline(job.job_id)
+                raise JobDeadlineExceededError(
+                    "Query | {} | did not finish in {} seconds, job {} cancelled!".format(query, deadline_seconds,
+                                                                                        job.job_id))
         except GoogleAPIError as e:
             raise EmsApiError("Error caused while running query | {} |: {}!".format(query, e.args[0]))
 
-    def wait_for_job_done(self, job_id: str, timeout_seconds: float) -> EmsJob:
+    @contextmanager
+    def session(self, job_id_prefix: str = None) -> Iterator[EmsBigquerySession]:
+        """
+        Creates a BigQuery session and yields an EmsBigquerySession whose queries all run inside it, so temporary
+        tables created by one query (CREATE TEMP TABLE, _SESSION.<table>) can be read by the following ones.
+        The session is aborted on exit, which drops its temporary tables.
+        """
+        from google.api_core.exceptions import GoogleAPIError
+
+        try:
+            job = self.__execute_query_job(query="SELECT 1",
+                                           ems_query_job_config=EmsQueryJobConfig(priority=EmsJobPriority.INTERACTIVE),
+                                           job_id_prefix=job_id_prefix,
+                                           create_session=True)
+            job.result()
+        except GoogleAPIError as e:
+            raise EmsApiError("Error caused while creating session: {}!".format(e.args[0]))
+        session_id = job.session_info.session_id
+        LOGGER.info("Session %s created in project %s", session_id, self.__project_id)
+        try:
+            yield EmsBigquerySession(self, session_id)
+        finally:
+            self.__abort_session(session_id)
+
+    def __abort_session(self, session_id: str) -> None:
+        from google.api_core.exceptions import GoogleAPIError
+
+        try:
+            self.__execute_query_job(query="CALL BQ.ABORT_SESSION()",
+                                     ems_query_job_config=EmsQueryJobConfig(priority=EmsJobPriority.INTERACTIVE),
+                                     session_id=session_id).result()
+            LOGGER.info("Session %s aborted in project %s", session_id, self.__project_id)
+        except GoogleAPIError as e:
+            LOGGER.warning("Could not abort session %s: %s", session_id, e)
+
+    def run_sync_upsert(self,
+                        load_config: EmsLoadJobConfig,
+                        key_columns: List[str],
+                        job_id_prefix: str = None,
+                        ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(
+                            priority=EmsJobPriority.INTERACTIVE),
+                        timeout_seconds: float = None,
+                        staging_table_expiration_seconds: float = 24 * 3600) -> str:
+        """
+        Upserts the files of load_config into its destination table: they are loaded into a staging table next to
+        the destination, merged into the destination on key_columns with a single MERGE statement, and the staging
+        table is dropped afterwards. The columns are taken from the schema of load_config.
+        The staging table expires after staging_table_expiration_seconds, so it is cleaned up even if the process
+        dies. When timeout_seconds passes, the running job is cancelled and the staging table is left to expire, as
+        the job may still read it until the cancellation takes effect.
+        Returns the id of the MERGE job.
+        """
+        from google.api_core.exceptions import GoogleAPIError
+        from google.cloud.bigquery import TableReference, DatasetReference
+
+        columns = [field["name"] for field in load_config.schema["fields"]]
+        unknown_keys = set(key_columns) - set(columns)
+        if not key_columns or unknown_keys:
+            raise ValueError(f"Key columns must be a non-empty subset of the schema columns, unknown: {unknown_keys}")
+
+        project_id = load_config.destination_project_id or self.__project_id
+        staging_table = f"{load_config.destination_table}_staging_{uuid.uuid4().hex}"
+        staging_reference = TableReference(DatasetReference(project_id, load_config.destination_dataset),
+                                           staging_table)
+        staging_config = EmsLoadJobConfig(schema=load_config.schema,
+                                          source_uri_template=load_config.source_uri_template,
+                                          skip_leading_rows=load_config.skip_leading_rows,
+                                          source_format=load_config.source_format,
+                                          destination_project_id=project_id,
+                                          destination_dataset=load_config.destination_dataset,
+                                          destination_table=staging_table,
+                                          create_disposition=EmsCreateDisposition.CREATE_NEVER,
+                                          write_disposition=EmsWriteDisposition.WRITE_APPEND,
+                                          labels=load_config.labels)
+        target = f"{project_id}.{load_config.destination_dataset}.{load_config.destination_table}"
+        merge_query = self.__build_merge_query(target,
+                                               f"{project_id}.{load_config.destination_dataset}.{staging_table}",
+                                               columns,
+                                               key_columns)
+        drop_staging_table = True
+        try:
+            self.__create_staging_table(staging_reference, load_config.schema, staging_table_expiration_seconds)
+            self.wait_for_job_done(self.run_async_load_job(job_id_prefix, staging_config), timeout_seconds,
+                                   cancel_on_timeout=True)
+            merge_job_id = self.run_async_query(merge_query, job_id_prefix, ems_query_job_config)
+            self.wait_for_job_done(merge_job_id, timeout_seconds, cancel_on_timeout=True)
+            return merge_job_id
+        except concurrent.futures.TimeoutError:
+            drop_staging_table = False
+            LOGGER.warning("Upsert into %s timed out, staging table %s is left to expire", target, staging_table)
+            raise
+        except GoogleAPIError as e:
+            raise EmsApiError("Error caused while upserting into {}: {}!".format(target, e.args[0]))
+        finally:
+            if drop_staging_table:
+                self.__bigquery_client.delete_table(staging_reference, not_found_ok=True)
+
+    def __create_staging_table(self, table_reference: "TableReference", schema: dict,
+                               expiration_seconds: float) -> None:
+        from google.cloud.bigquery import Table
+
+        expiration_time = datetime.now(timezone.utc).timestamp() + expiration_seconds
+        self.__bigquery_client.create_table(Table.from_api_repr({"tableReference": table_reference.to_api_repr(),
+                                                                 "schema": schema,
+                                                                 "expirationTime": str(int(expiration_time * 1000))}))
+
+    @staticmethod
+    def __build_merge_query(target: str, source: str, columns: List[str], key_columns: List[str]) -> str:
+        condition = " AND ".join(f"T.`{column}` = S.`{column}`" for column in key_columns)
+        updates = ", ".join(f"`{column}` = S.`{column}`" for column in columns if column not in key_columns)
+        column_list = ", ".join(f"`{column}`" for column in columns)
+        value_list = ", ".join(f"S.`{column}`" for column in columns)
+
+        query = f"MERGE `{target}` T USING `{source}` S ON {condition}"
+        if updates:
+            query += f" WHEN MATCHED THEN UPDATE SET {updates}"
+        return query + f" WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({value_list})"
+
+    def run_query_to_gcs(self,
+                         query: str,
+                         destination_uri: str,
+                         destination_format: DestinationFormat = DestinationFormat.CSV,
+                         compression: Compression = Compression.NONE,
+                         print_header: bool = True,
+                         field_delimiter: str = None,
+                         overwrite: bool = True,
+                         ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(
+                             priority=EmsJobPriority.INTERACTIVE),
+                         job_id_prefix: str = None,
+                         query_parameters: Union[Dict[str, Any], List[Any]] = None,
+                         storage_client: "EmsStorageClient" = None) -> List[str]:
+        """
+        Runs the query wrapped in EXPORT DATA, so BigQuery writes the result to GCS in parallel shards instead of
+        paging it through the API. destination_uri must be a gs:// URI with exactly one '*' wildcard, which BigQuery
+        replaces with the shard number. Returns the URIs of the written shards.
+        """
+        from google.api_core.exceptions import GoogleAPIError
+
+        if not destination_uri.startswith("gs://") or destination_uri.count("*") != 1:
+            raise ValueError("Destination URI must be a gs:// URI containing exactly one '*' wildcard!")
+
+        export_query = self.__build_export_query(query, destination_uri, destination_format, compression,
+                                                 print_header, field_delimiter, overwrite)
+        try:
+            self.__execute_query_job(query=export_query,
+                                     ems_query_job_config=ems_query_job_config,
+                                     job_id_prefix=job_id_prefix,
+                                     query_parameters=query_parameters).result()
+        except GoogleAPIError as e:
+            raise EmsApiError("Error caused while exporting query | {} |: {}!".format(query, e.args[0]))
+
+        bucket_name, blob_pattern = destination_uri[len("gs://"):].split("/", 1)
+        prefix, suffix = blob_pattern.split("*")
+        shard_pattern = re.compile(re.escape(prefix) + "[0-9]+" + re.escape(suffix))
+        storage_client = storage_client or self.__create_storage_client()
+        return [f"gs://{bucket_name}/{blob_name}"
+                for blob_name in sorted(storage_client.list_blob_names(bucket_name, prefix))
+                if shard_pattern.fullmatch(blob_name)]
+
+    def read_exported_rows(self,
+                           uris: List[str],
+                           destination_format: DestinationFormat = DestinationFormat.CSV,
+                           compression: Compression = Compression.NONE,
+                           field_delimiter: str = None,
+                           storage_client: "EmsStorageClient" = None,
+                           schema: dict = None) -> Iterator[dict]:
+        """
+        Streams the rows of the shards written by run_query_to_gcs, one shard at a time, see
+        ems_export_reader.read_export_stream. The schema for typing CSV values can be taken from get_query_schema.
+        """
+        storage_client = storage_client or self.__create_storage_client()
+        for uri in uris:
+            bucket_name, blob_name = uri[len("gs://"):].split("/", 1)
+            with storage_client.open_blob(bucket_name, blob_name) as stream:
+                yield from read_export_stream(stream, destination_format, compression, field_delimiter, schema)
+
+    def get_query_schema(self,
+                         query: str,
+                         query_parameters: Union[Dict[str, Any], List[Any]] = None) -> dict:
+        """
+        Returns the result schema of query from a dry run, in the format of EmsLoadJobConfig.schema.
+        """
+        from google.api_core.exceptions import GoogleAPIError
+        from google.cloud.bigquery import QueryJobConfig
+
+        job_config = QueryJobConfig(dry_run=True, use_query_cache=False, use_legacy_sql=False)
+        if query_parameters is not None:
+            job_config.query_parameters = [self.__create_query_parameter(parameter)
+                                           for parameter in to_ems_query_parameters(query_parameters)]
+        try:
+            job = self.__bigquery_client.query(query=query, job_config=job_config, location=self.__location)
+        except GoogleAPIError as e:
+            raise EmsApiError("Error caused while getting schema of query | {} |: {}!".format(query, e.args[0]))
+        return {"fields": [field.to_api_repr() for field in job.schema]}
+
+    def __create_storage_client(self) -> "EmsStorageClient":
+        from storage.ems_storage_client import EmsStorageClient
+
+        return EmsStorageClient(self.__project_id)
+
+    @staticmethod
+    def __build_export_query(query: str, destination_uri: str, destination_format: DestinationFormat,
+                             compression: Compression, print_header: bool, field_delimiter: str,
+                             overwrite: bool) -> str:
+        def literal(value: str) -> str:
+            return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+        export_format = "JSON" if destination_format == DestinationFormat.NEWLINE_DELIMITED_JSON \
+            else destination_format.value
+        options = [f"uri={literal(destination_uri)}",
+                   f"format={literal(export_format)}",
+                   f"overwrite={str(overwrite).lower()}"]
+        if destination_format == DestinationFormat.CSV:
+            options.append(f"header={str(print_header).lower()}")
+            if field_delimiter is not None:
+                options.append(f"field_delimiter={literal(field_delimiter)}")
+        if compression != Compression.NONE:
+            options.append(f"compression={literal(compression.value)}")
+        return f"EXPORT DATA OPTIONS({', '.join(options)}) AS {query.strip().rstrip(';')}"
+
+    def run_sync_query_buffered(self,
+                                query: str,
+                                ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(
+                                    priority=EmsJobPriority.INTERACTIVE),
+                                job_id_prefix: str = None,
+                                max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+                                spill_dir: str = None) -> EmsBufferedResult:
+        return EmsBufferedResult(self.run_sync_query(query, ems_query_job_config, job_id_prefix),
+                                 max_memory_bytes=max_memory_bytes,
+                                 spill_dir=spill_dir)
+
+    def run_sync_query_df(self,
+                          query: str,
+                          ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(
+                              priority=EmsJobPriority.INTERACTIVE),
+                          job_id_prefix: str = None,
+                          query_parameters: Union[Dict[str, Any], List[Any]] = None,
+                          chunk_size: int = None) -> Union["DataFrame", Iterator["DataFrame"]]:
+        """
+        Builds pandas DataFrames straight from the Arrow record batches of the result, see
+        bigquery.ems_dataframe.to_dataframe for the dtype of each BigQuery type. With chunk_size an iterator of
+        DataFrames of chunk_size rows is returned instead of a single DataFrame. Needs pandas and pyarrow.
+        """
+        from google.api_core.exceptions import GoogleAPIError
+
+        check_dataframe_dependencies()
+        try:
+            rows = self.__execute_query_job(query=query,
+                                            ems_query_job_config=ems_query_job_config,
+                                            job_id_prefix=job_id_prefix,
+                                            query_parameters=query_parameters).result()
+            if chunk_size is None:
+                return to_dataframe(rows.to_arrow(create_bqstorage_client=False))
+            return iter_dataframes(rows.to_arrow_iterable(), chunk_size)
+        except GoogleAPIError as e:
+            raise EmsApiError("Error caused while running query | {} |: {}!".format(query, e.args[0]))
+
+    def get_job(self, job_id: str) -> EmsJob:
         job = self.__bigquery_client.get_job(job_id, project=self.__project_id, location=self.__location)
-        job.result(timeout=timeout_seconds)
         return self.__convert_to_ems_job(job)
 
-    def __decorate_id_with_retry(self, job_id: str, job_prefix: str, retry_limit: int):
+    def wait_for_job_done(self, job_id: str, timeout_seconds: float, cancel_on_timeout: bool = False) -> EmsJob:
+        job = self.__bigquery_client.get_job(job_id, project=self.__project_id, location=self.__location)
+        try:
+            job.result(timeout=timeout_seconds)
+        except concurrent.futures.TimeoutError:
+            if cancel_on_timeout:
+                self.__cancel_after_deadline(job_id)
+            raise
+        return self.__convert_to_ems_job(job)
+
+    def cancel_job(self, job_id: str) -> EmsJob:
+        job = self.__bigquery_client.cancel_job(job_id, project=self.__project_id, location=self.__location)
+        LOGGER.info("Cancellation requested for job %s in project %s", job_id, self.__project_id)
+        return self.__convert_to_ems_job(job)
+
+    def cancel_jobs_with_prefix(self, job_prefix: str, min_creation_time: datetime, max_creation_time: datetime = None,
+                                max_result: int = None, all_users: bool = True) -> List[str]:
+        jobs = self.get_jobs_with_prefix(job_prefix, min_creation_time, max_creation_time, max_result,
+                                         all_users=all_users)
+        unfinished_job_ids = [job.job_id for job in jobs if job.state != EmsJobState.DONE]
+        for job_id in unfinished_job_ids:
+            self.cancel_job(job_id)
+        return unfinished_job_ids
+
+    def __cancel_after_deadline(self, job_id: str) -> None:
+        from google.api_core.exceptions import GoogleAPIError
+
+        try:
+            self.cancel_job(job_id)
+        except GoogleAPIError as e:
+            LOGGER.warning("Could not cancel job %s after its deadline passed: %s", job_id, e)
+
+    @staticmethod
+    def decorate_id_with_retry(job_id: str, job_prefix: str, retry_limit: int) -> str:
         retry_counter = 0
         if RETRY in job_id:
-            retry_counter = self.__get_retry_counter(job_id, job_prefix)
+            retry_counter = EmsBigqueryClient.__get_retry_counter(job_id, job_prefix)
         prefix_with_retry = job_prefix + RETRY + str(retry_counter + 1) + "-"
 
         if retry_counter >= retry_limit - 1:
             raise RetryLimitExceededError()
         return prefix_with_retry
 
-    def __get_retry_counter(self, job_id, job_id_prefix):
+    @staticmethod
+    def __get_retry_counter(job_id, job_id_prefix):
         regex = job_id_prefix + RETRY + "([0-9]+)-.+"
         return int(re.search(regex, job_id).group(1))
 
-    def __execute_query_job(self, query: str, ems_query_job_config: EmsQueryJobConfig, job_id_prefix=None) -> QueryJob:
+    def __execute_query_job(self, query: str, ems_query_job_config: EmsQueryJobConfig,
+                            job_id_prefix=None, session_id: str = None, create_session: bool = False,
+                            query_parameters: Union[Dict[str, Any], List[Any]] = None,
+                            deadline_seconds: float = None) -> "QueryJob":
+        from google.cloud.bigquery import DEFAULT_RETRY
+
+        job_config = self.__create_job_config(ems_query_job_config)
+        self.__set_session(job_config, session_id, create_session)
+        if deadline_seconds is not None:
+            job_config.job_timeout_ms = int(deadline_seconds * 1000)
+        job_config.query_parameters = [self.__create_query_parameter(parameter)
+                                       for parameter in to_ems_query_parameters(query_parameters)]
+        if ems_query_job_config.priority == EmsJobPriority.AUTO:
+            job_config.priority = self.__choose_priority(query, job_config,
+                                                         ems_query_job_config.latency_target_seconds).value
         return self.__bigquery_client.query(query=query,
-                                            job_config=(self.__create_job_config(ems_query_job_config)),
+                                            job_config=job_config,
                                             job_id_prefix=job_id_prefix,
                                             location=self.__location,
-                                            retry=bigquery.DEFAULT_RETRY.with_deadline(300))
+                                            retry=DEFAULT_RETRY.with_deadline(300))
+
+    def __choose_priority(self, query: str, job_config: "QueryJobConfig",
+                          latency_target_seconds: float = None) -> EmsJobPriority:
+        policy = self.__auto_priority_policy
+        with self.__in_flight_lock:
+            now = time.monotonic()
+            if self.__in_flight_counted_at is None or \
+                    now - self.__in_flight_counted_at >= policy.in_flight_refresh_seconds:
+                self.__in_flight_interactive_jobs = self.__count_in_flight_interactive_jobs(policy.max_interactive_jobs)
+                self.__in_flight_counted_at = now
+            in_flight_interactive_jobs = self.__in_flight_interactive_jobs
+        estimate = (lambda: self.__dry_run_bytes_processed(query, job_config)) \
+            if policy.estimate_bytes_with_dry_run else None
+        priority = policy.choose(in_flight_interactive_jobs, latency_target_seconds, estimate)
+        if priority == EmsJobPriority.INTERACTIVE:
+            with self.__in_flight_lock:
+                self.__in_flight_interactive_jobs += 1
+        LOGGER.info("AUTO priority resolved to %s with %s interactive jobs in flight",
+                    priority.value, in_flight_interactive_jobs)
+        return priority
+
+    def __count_in_flight_interactive_jobs(self, limit: int) -> int:
+        from google.cloud.bigquery import QueryJob
+
+        count = 0
+        for state in ("running", "pending"):
+            for job in self.__bigquery_client.list_jobs(all_users=True, state_filter=state,
+                                                        max_results=limit * IN_FLIGHT_SCAN_FACTOR):
+                if isinstance(job, QueryJob) and job.priority == EmsJobPriority.INTERACTIVE.value:
+                    count += 1
+                    if count >= limit:
+                        return count
+        return count
+
+    def __dry_run_bytes_processed(self, query: str, job_config: "QueryJobConfig") -> int:
+        from google.cloud.bigquery import QueryJobConfig
+
+        dry_run_config = QueryJobConfig.from_api_repr(job_config.to_api_repr())
+        dry_run_config.dry_run = True
+        dry_run_config.use_query_cache = False
+        dry_run_config.priority = EmsJobPriority.INTERACTIVE.value
+        job = self.__bigquery_client.query(query=query, job_config=dry_run_config, location=self.__location)
+        return job.total_bytes_processed or 0
+
+    @staticmethod
+    def __set_session(job_config: "QueryJobConfig", session_id: str, create_session: bool) -> None:
+        from google.cloud.bigquery import ConnectionProperty
+
+        if create_session:
+            job_config.create_session = True
+        if session_id is not None:
+            job_config.connection_properties = [ConnectionProperty("session_id", session_id)]
+
+    @staticmethod
+    def __create_query_parameter(parameter: EmsQueryParameter):
+        from google.cloud.bigquery import ScalarQueryParameter, ArrayQueryParameter, StructQueryParameter
+
+        if isinstance(parameter, EmsScalarQueryParameter):
+            return ScalarQueryParameter(parameter.name, parameter.type, parameter.value)
+        if isinstance(parameter, EmsArrayQueryParameter):
+            values = [EmsBigqueryClient.__create_query_parameter(value)
+                      if isinstance(value, EmsStructQueryParameter) else value
+                      for value in parameter.values]
+            return ArrayQueryParameter(parameter.name, parameter.array_type, values)
+        if isinstance(parameter, EmsStructQueryParameter):
+            return StructQueryParameter(parameter.name,
+                                        *[EmsBigqueryClient.__create_query_parameter(field)
+                                          for field in parameter.fields])
+        raise ValueError(f"Unsupported query parameter: {parameter!r}")
+
+    def __create_load_job_config(self, ems_load_job_config: EmsLoadJobConfig) -> "LoadJobConfig":
+        from google.cloud.bigquery import LoadJobConfig
+        from google.cloud.bigquery.schema import _parse_schema_resource
 
-    def __create_load_job_config(self, ems_load_job_config: EmsLoadJobConfig) -> LoadJobConfig:
         config = LoadJobConfig()
         config.labels = ems_load_job_config.labels
         config.create_disposition = ems_load_job_config.create_disposition.value
         config.write_disposition = ems_load_job_config.write_disposition.value
         config.schema = _parse_schema_resource(ems_load_job_config.schema)
         config.skip_leading_rows = ems_load_job_config.skip_leading_rows
+        config.source_format = ems_load_job_config.source_format.value
         return config
 
-    def __create_extract_job_config(self, ems_job_config: EmsExtractJobConfig) -> ExtractJobConfig:
+    def __create_extract_job_config(self, ems_job_config: EmsExtractJobConfig) -> "ExtractJobConfig":
+        from google.cloud.bigquery import ExtractJobConfig
+
         config = ExtractJobConfig()
 
         config.labels = ems_job_config.labels
@@ -296,14 +864,30 @@ class EmsBigqueryClient:
         config.print_header = ems_job_config.print_header
         return config
 
-    def __create_job_config(self, ems_query_job_config: EmsQueryJobConfig) -> QueryJobConfig:
+    def __create_copy_job_config(self, ems_job_config: EmsCopyJobConfig) -> "CopyJobConfig":
+        from google.cloud.bigquery import CopyJobConfig
+
+        config = CopyJobConfig()
+        config.labels = ems_job_config.labels
+        if ems_job_config.create_disposition is not None:
+            config.create_disposition = ems_job_config.create_disposition.value
+        if ems_job_config.write_disposition is not None:
+            config.write_disposition = ems_job_config.write_disposition.value
+        config.operation_type = ems_job_config.operation_type.value
+        if ems_job_config.destination_expiration_time is not None:
+            config.destination_expiration_time = self.__format_rfc3339(ems_job_config.destination_expiration_time)
+        return config
+
+    def __create_job_config(self, ems_query_job_config: EmsQueryJobConfig) -> "QueryJobConfig":
+        from google.cloud.bigquery import QueryJobConfig, TableReference, DatasetReference, TimePartitioning, \
+            RangePartitioning, PartitionRange
+
         job_config = QueryJobConfig()
         job_config.priority = ems_query_job_config.priority.value
         job_config.use_legacy_sql = False
         job_config.use_query_cache = ems_query_job_config.use_query_cache
         job_config.labels = ems_query_job_config.labels
         if ems_query_job_config.destination_table is not None:
-            job_config.time_partitioning = TimePartitioning("DAY")
             table_reference = TableReference(
                 DatasetReference(ems_query_job_config.destination_project_id or self.__project_id,
                                  ems_query_job_config.destination_dataset),
@@ -312,11 +896,22 @@ class EmsBigqueryClient:
             job_config.write_disposition = ems_query_job_config.write_disposition.value
             job_config.create_disposition = ems_query_job_config.create_disposition.value
         partitioning = ems_query_job_config.time_partitioning
+        range_partitioning = ems_query_job_config.range_partitioning
         if partitioning is not None:
             job_config.time_partitioning = TimePartitioning(partitioning.type.value,
                                                             partitioning.field,
                                                             partitioning.expiration_ms,
                                                             partitioning.require_partition_filter)
+        elif range_partitioning is None and ems_query_job_config.destination_table is not None:
+            # BigQuery rejects tables with both, so destination tables are only DAY partitioned by default
+            job_config.time_partitioning = TimePartitioning("DAY")
+        if range_partitioning is not None:
+            job_config.range_partitioning = RangePartitioning(PartitionRange(range_partitioning.start,
+                                                                             range_partitioning.end,
+                                                                             range_partitioning.interval),
+                                                              range_partitioning.field)
+        if ems_query_job_config.clustering_fields is not None:
+            job_config.clustering_fields = ems_query_job_config.clustering_fields
         if ems_query_job_config.table_definitions is not None:
             job_config.table_definitions = ems_query_job_config.table_definitions
         return job_config
@@ -329,3 +924,7 @@ class EmsBigqueryClient:
 
 class RetryLimitExceededError(Exception):
     pass
+
+
+class JobDeadlineExceededError(EmsApiError):
+    pass
@@ -0,0 +1,37 @@
+from typing import Any, Dict, Iterable, List, Union, TYPE_CHECKING
+
+from bigquery.job.config.ems_job_config import EmsJobPriority
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+
+if TYPE_CHECKING:
+    from bigquery.ems_bigquery_client import EmsBigqueryClient
+
+
+class EmsBigquerySession:
+
+    def __init__(self, client: "EmsBigqueryClient", session_id: str):
+        self.__client = client
+        self.__session_id = session_id
+
+    @property
+    def session_id(self) -> str:
+        return self.__session_id
+
+    def run_sync_query(self,
+                       query: str,
+                       ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(priority=EmsJobPriority.INTERACTIVE),
+                       job_id_prefix: str = None,
+                       query_parameters: Union[Dict[str, Any], List[Any]] = None) -> Iterable:
+        return self.__client.run_sync_query(query, ems_query_job_config, job_id_prefix,
+                                            session_id=self.__session_id,
+                                            query_parameters=query_parameters)
+
+    def run_async_query(self,
+                        query: str,
+                        job_id_prefix: str = None,
+                        ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(
+                            priority=EmsJobPriority.INTERACTIVE),
+                        query_parameters: Union[Dict[str, Any], List[Any]] = None) -> str:
+        return self.__client.run_async_query(query, job_id_prefix, ems_query_job_config,
+                                             session_id=self.__session_id,
+                                             query_parameters=query_parameters)
@@ -0,0 +1,207 @@
+import bisect
+import importlib.util
+import mmap
+import pickle
+import sys
+import tempfile
+from array import array
+from typing import Iterable, Iterator, List, Union
+
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_SPILL_BATCH_ROWS = 1024
+
+_PICKLE_SEGMENT = 0
+_ARROW_SEGMENT = 1
+
+
+class EmsBufferedResult:
+    """
+    Re-iterable, random-access buffer for query result rows.
+
+    Rows are kept in memory as value tuples until their estimated size, nested values included, reaches
+    max_memory_bytes. Every further row goes to a memory-mapped temporary file in segments of spill_batch_rows rows,
+    written as Arrow record batches when pyarrow is installed (ems-gcp-toolkit[pandas]) and pickled otherwise, or
+    when a segment's values have no Arrow type or hold dicts, which Arrow would turn into structs that gain the keys
+    of every other row in the segment. Column names are stored once, rows are turned back into dicts only
+    when they are accessed; the last segment read is kept decoded, so iteration decodes every segment once.
+    """
+
+    def __init__(self,
+                 rows: Iterable[dict],
+                 max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+                 spill_dir: str = None,
+                 spill_batch_rows: int = DEFAULT_SPILL_BATCH_ROWS):
+        if spill_batch_rows < 1:
+            raise ValueError("spill_batch_rows must be at least 1!")
+        self.__max_memory_bytes = max_memory_bytes
+        self.__spill_dir = spill_dir
+        self.__spill_batch_rows = spill_batch_rows
+        self.__use_arrow = importlib.util.find_spec("pyarrow") is not None
+        self.__columns = None
+        self.__memory_rows = []
+        self.__memory_bytes = 0
+        self.__pending_rows = []
+        self.__spill_file = None
+        self.__spill_map = None
+        self.__segment_offsets = array("Q", [0])
+        self.__segment_first_rows = array("Q", [0])
+        self.__segment_formats = bytearray()
+        self.__decoded_segment_index = None
+        self.__decoded_segment = None
+
+        for row in rows:
+            self.__append(row)
+        self.__seal()
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.__columns or [])
+
+    @property
+    def memory_row_count(self) -> int:
+        return len(self.__memory_rows)
+
+    @property
+    def spilled_row_count(self) -> int:
+        return self.__segment_first_rows[-1]
+
+    @property
+    def arrow_segment_count(self) -> int:
+        return self.__segment_formats.count(_ARROW_SEGMENT)
+
+    def __len__(self) -> int:
+        return self.memory_row_count + self.spilled_row_count
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(len(self)):
+            yield self.__get_row(index)
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[dict, List[dict]]:
+        if isinstance(item, slice):
+            return [self.__get_row(index) for index in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("EmsBufferedResult index out of range")
+        return self.__get_row(item)
+
+    def close(self) -> None:
+        self.__decoded_segment_index = None
+        self.__decoded_segment = None
+        if self.__spill_map is not None:
+            self.__spill_map.close()
+            self.__spill_map = None
+        if self.__spill_file is not None:
+            self.__spill_file.close()
+            self.__spill_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __append(self, row: dict) -> None:
+        if self.__columns is None:
+            self.__columns = tuple(row.keys())
+        values = tuple(row.values())
+
+        if self.__spill_file is None:
+            size = estimate_size(values)
+            if self.__memory_bytes + size <= self.__max_memory_bytes:
+                self.__memory_rows.append(values)
+                self.__memory_bytes += size
+                return
+            self.__spill_file = tempfile.TemporaryFile(dir=self.__spill_dir)
+
+        self.__pending_rows.append(values)
+        if len(self.__pending_rows) >= self.__spill_batch_rows:
+            self.__write_segment()
+
+    def __write_segment(self) -> None:
+        rows = self.__pending_rows
+        self.__pending_rows = []
+        segment = self.__to_arrow_segment(rows) if self.__use_arrow else None
+        if segment is None:
+            self.__spill_file.write(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+            self.__segment_formats.append(_PICKLE_SEGMENT)
+        else:
+            self.__spill_file.write(segment)
+            self.__segment_formats.append(_ARROW_SEGMENT)
+        self.__segment_offsets.append(self.__spill_file.tell())
+        self.__segment_first_rows.append(self.__segment_first_rows[-1] + len(rows))
+
+    def __to_arrow_segment(self, rows: list):
+        import pyarrow
+        import pyarrow.ipc
+
+        try:
+            batch = pyarrow.RecordBatch.from_arrays([pyarrow.array(column) for column in zip(*rows)],
+                                                    names=list(self.__columns))
+        except (pyarrow.ArrowException, TypeError, ValueError, OverflowError):
+            return None
+        if any(_contains_struct(column.type) for column in batch.columns):
+            return None
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+    def __seal(self) -> None:
+        if self.__pending_rows:
+            self.__write_segment()
+        if self.__spill_file is not None:
+            self.__spill_file.flush()
+            self.__spill_map = mmap.mmap(self.__spill_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __get_row(self, index: int) -> dict:
+        if index < len(self.__memory_rows):
+            values = self.__memory_rows[index]
+        else:
+            spill_index = index - len(self.__memory_rows)
+            segment_index = bisect.bisect_right(self.__segment_first_rows, spill_index) - 1
+            values = self.__read_segment(segment_index)[spill_index - self.__segment_first_rows[segment_index]]
+        return dict(zip(self.__columns, values))
+
+    def __read_segment(self, segment_index: int) -> list:
+        if self.__spill_map is None:
+            raise ValueError("EmsBufferedResult is closed")
+        if segment_index != self.__decoded_segment_index:
+            data = self.__spill_map[self.__segment_offsets[segment_index]:self.__segment_offsets[segment_index + 1]]
+            if self.__segment_formats[segment_index] == _ARROW_SEGMENT:
+                self.__decoded_segment = _read_arrow_segment(data)
+            else:
+                self.__decoded_segment = pickle.loads(data)
+            self.__decoded_segment_index = segment_index
+        return self.__decoded_segment
+
+
+def estimate_size(value) -> int:
+    """
+    Approximate memory use of a row value in bytes, including the items of containers.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+def _contains_struct(data_type) -> bool:
+    import pyarrow.types
+
+    if pyarrow.types.is_struct(data_type):
+        return True
+    if pyarrow.types.is_list(data_type) or pyarrow.types.is_large_list(data_type) \
+            or pyarrow.types.is_fixed_size_list(data_type):
+        return _contains_struct(data_type.value_type)
+    return False
+
+
+def _read_arrow_segment(data: bytes) -> list:
+    import pyarrow
+    import pyarrow.ipc
+
+    table = pyarrow.ipc.open_stream(pyarrow.py_buffer(data)).read_all()
+    return list(zip(*(column.to_pylist() for column in table.columns)))
@@ -0,0 +1,220 @@
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Callable, List, Optional
+
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.job.ems_job import EmsJob
+from bigquery.job.ems_job_state import EmsJobState
+
+LOGGER = logging.getLogger(__name__)
+
+# launch times are recorded by the local clock and compared with BigQuery job creation times
+JOB_LOOKUP_CLOCK_SKEW = timedelta(minutes=5)
+# ends the job id prefix of a step, so the jobs of step "load" are not found by the prefix of step "load-extra"
+STEP_SEPARATOR = "-"
+
+
+class EmsCheckpointStatus(Enum):
+    LAUNCHING = "LAUNCHING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+
+
+class EmsCheckpoint:
+
+    def __init__(self, step_name: str, status: EmsCheckpointStatus, job_id: str = None, updated: datetime = None):
+        self.__step_name = step_name
+        self.__status = status
+        self.__job_id = job_id
+        self.__updated = updated
+
+    @property
+    def step_name(self) -> str:
+        return self.__step_name
+
+    @property
+    def status(self) -> EmsCheckpointStatus:
+        return self.__status
+
+    @property
+    def job_id(self) -> Optional[str]:
+        return self.__job_id
+
+    @property
+    def updated(self) -> Optional[datetime]:
+        return self.__updated
+
+
+class EmsCheckpointStore:
+    """
+    Keeps pipeline checkpoints in a local SQLite file, keyed by job id prefix and step name. Every write is
+    committed immediately, so the store survives the process being killed at any point.
+    """
+
+    def __init__(self, path: str):
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__connection:
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS checkpoints ("
+                                      "job_id_prefix TEXT NOT NULL, "
+                                      "step_name TEXT NOT NULL, "
+                                      "status TEXT NOT NULL, "
+                                      "job_id TEXT, "
+                                      "updated TEXT NOT NULL, "
+                                      "PRIMARY KEY (job_id_prefix, step_name))")
+
+    def get(self, job_id_prefix: str, step_name: str) -> Optional[EmsCheckpoint]:
+        with self.__lock:
+            row = self.__connection.execute("SELECT step_name, status, job_id, updated FROM checkpoints "
+                                            "WHERE job_id_prefix = ? AND step_name = ?",
+                                            (job_id_prefix, step_name)).fetchone()
+        return None if row is None else self.__to_checkpoint(row)
+
+    def get_all(self, job_id_prefix: str) -> List[EmsCheckpoint]:
+        with self.__lock:
+            rows = self.__connection.execute("SELECT step_name, status, job_id, updated FROM checkpoints "
+                                             "WHERE job_id_prefix = ? ORDER BY updated, step_name",
+                                             (job_id_prefix,)).fetchall()
+        return [self.__to_checkpoint(row) for row in rows]
+
+    def mark_launching(self, job_id_prefix: str, step_name: str) -> None:
+        self.__save(job_id_prefix, step_name, EmsCheckpointStatus.LAUNCHING, None)
+
+    def mark_running(self, job_id_prefix: str, step_name: str, job_id: str) -> None:
+        self.__save(job_id_prefix, step_name, EmsCheckpointStatus.RUNNING, job_id)
+
+    def mark_done(self, job_id_prefix: str, step_name: str, job_id: str = None) -> None:
+        self.__save(job_id_prefix, step_name, EmsCheckpointStatus.DONE, job_id)
+
+    def clear(self, job_id_prefix: str) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.execute("DELETE FROM checkpoints WHERE job_id_prefix = ?", (job_id_prefix,))
+
+    def close(self) -> None:
+        self.__connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __save(self, job_id_prefix: str, step_name: str, status: EmsCheckpointStatus, job_id: str) -> None:
+        updated = datetime.now(timezone.utc).isoformat()
+        with self.__lock, self.__connection:
+            self.__connection.execute("INSERT OR REPLACE INTO checkpoints "
+                                      "(job_id_prefix, step_name, status, job_id, updated) VALUES (?, ?, ?, ?, ?)",
+                                      (job_id_prefix, step_name, status.value, job_id, updated))
+
+    @staticmethod
+    def __to_checkpoint(row: tuple) -> EmsCheckpoint:
+        step_name, status, job_id, updated = row
+        return EmsCheckpoint(step_name, EmsCheckpointStatus(status), job_id, datetime.fromisoformat(updated))
+
+
+class EmsCheckpointedPipeline:
+    """
+    Runs the steps of a pipeline so that a restarted process continues where the previous one stopped.
+
+    run_job launches a BigQuery job with the step's job id prefix and waits for it. Steps that already finished
+    are skipped, a job that was still in flight when the process died is re-attached and waited for, and a job that
+    failed meanwhile, or is not found any more, is launched again. If the process died after launching a job but
+    before its id was recorded, the job is looked up by the step's job id prefix instead of being launched twice.
+    run_step does the same for synchronous steps without a job, like Cloud SQL
+    imports, which are run again unless they finished.
+    """
+
+    def __init__(self,
+                 client: EmsBigqueryClient,
+                 store: EmsCheckpointStore,
+                 job_id_prefix: str,
+                 job_timeout_seconds: float = None,
+                 job_lookup_max_results: int = 1000):
+        self.__client = client
+        self.__store = store
+        self.__job_id_prefix = job_id_prefix
+        self.__job_timeout_seconds = job_timeout_seconds
+        self.__job_lookup_max_results = job_lookup_max_results
+
+    @property
+    def job_id_prefix(self) -> str:
+        return self.__job_id_prefix
+
+    @property
+    def completed_steps(self) -> List[str]:
+        return [checkpoint.step_name for checkpoint in self.__store.get_all(self.__job_id_prefix)
+                if checkpoint.status == EmsCheckpointStatus.DONE]
+
+    def run_job(self, step_name: str, launch: Callable[[str], str]) -> str:
+        """
+        launch gets the job id prefix of the step and has to return the id of the job it started, e.g.
+        lambda prefix: client.run_async_query(query, prefix). step_name must not contain the step separator "-".
+        """
+        if STEP_SEPARATOR in step_name:
+            raise ValueError(f"Step name {step_name} must not contain {STEP_SEPARATOR!r}!")
+        checkpoint = self.__store.get(self.__job_id_prefix, step_name)
+        if checkpoint is not None and checkpoint.status == EmsCheckpointStatus.DONE:
+            LOGGER.info("Step %s already done with job %s, skipping", step_name, checkpoint.job_id)
+            return checkpoint.job_id
+
+        job_id = None
+        job = None if checkpoint is None else self.__find_previous_job(step_name, checkpoint)
+        if job is not None:
+            if job.is_failed:
+                LOGGER.info("Job %s of step %s failed, launching it again", job.job_id, step_name)
+            else:
+                LOGGER.info("Re-attaching step %s to job %s in state %s", step_name, job.job_id, job.state.value)
+                job_id = job.job_id
+                if job.state == EmsJobState.DONE:
+                    self.__store.mark_done(self.__job_id_prefix, step_name, job_id)
+                    return job_id
+
+        if job_id is None:
+            self.__store.mark_launching(self.__job_id_prefix, step_name)
+            job_id = launch(self.__step_prefix(step_name))
+            self.__store.mark_running(self.__job_id_prefix, step_name, job_id)
+
+        self.__client.wait_for_job_done(job_id, self.__job_timeout_seconds)
+        self.__store.mark_done(self.__job_id_prefix, step_name, job_id)
+        return job_id
+
+    def run_step(self, step_name: str, action: Callable[[], None]) -> bool:
+        """
+        Returns False if the step was skipped because it finished in an earlier run.
+        """
+        checkpoint = self.__store.get(self.__job_id_prefix, step_name)
+        if checkpoint is not None and checkpoint.status == EmsCheckpointStatus.DONE:
+            LOGGER.info("Step %s already done, skipping", step_name)
+            return False
+        action()
+        self.__store.mark_done(self.__job_id_prefix, step_name)
+        return True
+
+    def reset(self) -> None:
+        self.__store.clear(self.__job_id_prefix)
+
+    def __find_previous_job(self, step_name: str, checkpoint: EmsCheckpoint) -> Optional[EmsJob]:
+        from google.api_core.exceptions import NotFound
+
+        if checkpoint.job_id is not None:
+            try:
+                return self.__client.get_job(checkpoint.job_id)
+            except NotFound:
+                LOGGER.info("Job %s of step %s not found, launching it again", checkpoint.job_id, step_name)
+                return None
+
+        jobs = self.__client.get_jobs_with_prefix(self.__step_prefix(step_name),
+                                                  checkpoint.updated - JOB_LOOKUP_CLOCK_SKEW,
+                                                  max_result=self.__job_lookup_max_results)
+        if not jobs:
+            LOGGER.info("No job was launched for step %s before the process stopped", step_name)
+            return None
+        job = max(jobs, key=lambda found_job: found_job.created)
+        LOGGER.info("Found job %s launched for step %s before the process stopped", job.job_id, step_name)
+        return job
+
+    def __step_prefix(self, step_name: str) -> str:
+        return f"{self.__job_id_prefix}{STEP_SEPARATOR}{step_name}{STEP_SEPARATOR}"
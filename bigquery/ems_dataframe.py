@@ -0,0 +1,64 @@
+import importlib.util
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from pyarrow import RecordBatch, Table
+
+MISSING_DEPENDENCY_MESSAGE = "DataFrame results need pandas and pyarrow, install ems-gcp-toolkit[pandas]!"
+
+
+def to_dataframe(table: "Table") -> "DataFrame":
+    """
+    BigQuery types are mapped as
+        INT64 -> Int64, BOOL -> boolean, STRING -> string (nullable pandas extension dtypes),
+        FLOAT64 -> float64, TIMESTAMP -> datetime64[UTC], DATETIME -> datetime64,
+        NUMERIC / BIGNUMERIC -> object of Decimal, DATE / TIME -> object of date / time,
+        BYTES -> object of bytes, ARRAY / STRUCT -> object of lists / dicts.
+    """
+    return table.to_pandas(types_mapper=_pandas_types().get, date_as_object=True)
+
+
+def iter_dataframes(record_batches: Iterable["RecordBatch"], chunk_size: int) -> Iterator["DataFrame"]:
+    """
+    Re-slices record batches of arbitrary size into DataFrames of chunk_size rows, only the last one can be shorter.
+    """
+    import pyarrow
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1!")
+
+    pending = []
+    pending_rows = 0
+    for batch in record_batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows < chunk_size:
+            continue
+        table = pyarrow.Table.from_batches(pending)
+        offset = 0
+        while pending_rows - offset >= chunk_size:
+            yield to_dataframe(table.slice(offset, chunk_size))
+            offset += chunk_size
+        pending = table.slice(offset).to_batches()
+        pending_rows -= offset
+
+    if pending_rows > 0:
+        yield to_dataframe(pyarrow.Table.from_batches(pending))
+
+
+def check_dataframe_dependencies() -> None:
+    if importlib.util.find_spec("pandas") is None or importlib.util.find_spec("pyarrow") is None:
+        raise ImportError(MISSING_DEPENDENCY_MESSAGE)
+
+
+def _pandas_types() -> dict:
+    import pandas
+    import pyarrow
+
+    return {
+        pyarrow.int64(): pandas.Int64Dtype(),
+        pyarrow.bool_(): pandas.BooleanDtype(),
+        pyarrow.string(): pandas.StringDtype(),
+        pyarrow.large_string(): pandas.StringDtype(),
+    }
@@ -0,0 +1,126 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from typing import IO, Any, Callable, Dict, Iterator, Optional
+
+from bigquery.job.config.ems_extract_job_config import Compression, DestinationFormat
+
+MISSING_PARQUET_MESSAGE = "Reading PARQUET exports needs pyarrow, install ems-gcp-toolkit[pandas]!"
+MISSING_AVRO_MESSAGE = "Reading AVRO exports needs fastavro, install ems-gcp-toolkit[avro]!"
+
+
+def read_export_stream(stream: IO[bytes],
+                       destination_format: DestinationFormat = DestinationFormat.CSV,
+                       compression: Compression = Compression.NONE,
+                       field_delimiter: str = None,
+                       schema: dict = None) -> Iterator[dict]:
+    """
+    Decodes one shard written by EXPORT DATA. CSV shards need a header row; with a schema in the format of
+    EmsLoadJobConfig.schema ({"fields": [{"name": ..., "type": ...}]}) their values, and the string encoded values
+    of JSON shards, are converted to Python types, empty CSV values become None. Without a schema CSV values stay
+    strings. AVRO and PARQUET shards carry their own types and compress internally, so compression only applies to
+    CSV and JSON shards.
+    """
+    if destination_format == DestinationFormat.PARQUET:
+        yield from _read_parquet(stream)
+        return
+    if destination_format == DestinationFormat.AVRO:
+        yield from _read_avro(stream)
+        return
+    if compression == Compression.GZIP:
+        stream = gzip.GzipFile(fileobj=stream)
+    elif compression != Compression.NONE:
+        raise ValueError(f"{destination_format.value} exports can only be GZIP compressed!")
+
+    converters = _converters(schema)
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    if destination_format == DestinationFormat.CSV:
+        rows = csv.DictReader(text, delimiter=field_delimiter or ",")
+        yield from (_convert_row(row, converters, empty_is_null=True) for row in rows)
+    else:
+        rows = (json.loads(line) for line in text if line.strip())
+        yield from (_convert_row(row, converters, empty_is_null=False) for row in rows)
+
+
+def _read_parquet(stream: IO[bytes]) -> Iterator[dict]:
+    try:
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(MISSING_PARQUET_MESSAGE) from error
+
+    for batch in pyarrow.parquet.ParquetFile(stream).iter_batches():
+        names = batch.schema.names
+        for values in zip(*(column.to_pylist() for column in batch.columns)):
+            yield dict(zip(names, values))
+
+
+def _read_avro(stream: IO[bytes]) -> Iterator[dict]:
+    try:
+        import fastavro
+    except ImportError as error:
+        raise ImportError(MISSING_AVRO_MESSAGE) from error
+
+    yield from fastavro.reader(stream)
+
+
+def _convert_row(row: Dict[str, Any], converters: Dict[str, Callable[[str], Any]], empty_is_null: bool) -> dict:
+    if not converters:
+        return row
+    converted = {}
+    for name, value in row.items():
+        converter = converters.get(name)
+        if isinstance(value, str) and converter is not None:
+            value = None if empty_is_null and value == "" else converter(value)
+        elif empty_is_null and value == "":
+            value = None
+        converted[name] = value
+    return converted
+
+
+def _converters(schema: Optional[dict]) -> Dict[str, Callable[[str], Any]]:
+    if schema is None:
+        return {}
+    return {field["name"]: _CONVERTERS.get(field["type"].upper(), str) for field in schema["fields"]
+            if field.get("mode", "NULLABLE").upper() != "REPEATED"}
+
+
+def _parse_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+
+def _parse_datetime(value: str) -> datetime:
+    value = value.replace("T", " ")
+    date_part, _, fraction = value.partition(".")
+    parsed = datetime.strptime(date_part, "%Y-%m-%d %H:%M:%S")
+    return parsed.replace(microsecond=int(fraction[:6].ljust(6, "0"))) if fraction else parsed
+
+
+def _parse_timestamp(value: str) -> datetime:
+    for suffix in (" UTC", "+00:00", "+00", "Z"):
+        if value.endswith(suffix):
+            value = value[:-len(suffix)]
+            break
+    return _parse_datetime(value).replace(tzinfo=timezone.utc)
+
+
+def _parse_time(value: str) -> time:
+    return _parse_datetime(f"1970-01-01 {value}").time()
+
+
+_CONVERTERS = {
+    "INTEGER": int,
+    "INT64": int,
+    "FLOAT": float,
+    "FLOAT64": float,
+    "NUMERIC": Decimal,
+    "BIGNUMERIC": Decimal,
+    "BOOLEAN": _parse_bool,
+    "BOOL": _parse_bool,
+    "DATE": date.fromisoformat,
+    "DATETIME": _parse_datetime,
+    "TIMESTAMP": _parse_timestamp,
+    "TIME": _parse_time,
+}
@@ -0,0 +1,213 @@
+import logging
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.job.config.ems_job_config import EmsJobPriority
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+
+LOGGER = logging.getLogger(__name__)
+
+
+class EmsQueryNodeStatus(Enum):
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    SKIPPED = "SKIPPED"
+
+
+class EmsQueryNode:
+
+    def __init__(self,
+                 name: str,
+                 query: str,
+                 query_config: EmsQueryJobConfig = EmsQueryJobConfig(priority=EmsJobPriority.INTERACTIVE),
+                 depends_on: List[str] = None):
+        if name is None or name.strip() == "":
+            raise ValueError("Node name cannot be None or empty string!")
+        self.__name = name
+        self.__query = query
+        self.__query_config = query_config
+        self.__depends_on = list(depends_on or [])
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def query(self) -> str:
+        return self.__query
+
+    @property
+    def query_config(self) -> EmsQueryJobConfig:
+        return self.__query_config
+
+    @property
+    def depends_on(self) -> List[str]:
+        return self.__depends_on
+
+
+class EmsQueryDagEvent:
+
+    def __init__(self, node_name: str, status: EmsQueryNodeStatus, job_id: str = None, error: Exception = None):
+        self.__node_name = node_name
+        self.__status = status
+        self.__job_id = job_id
+        self.__error = error
+
+    @property
+    def node_name(self) -> str:
+        return self.__node_name
+
+    @property
+    def status(self) -> EmsQueryNodeStatus:
+        return self.__status
+
+    @property
+    def job_id(self) -> Optional[str]:
+        return self.__job_id
+
+    @property
+    def error(self) -> Optional[Exception]:
+        return self.__error
+
+
+class EmsQueryDagExecutor:
+    """
+    Runs EmsQueryNodes in dependency order, at most max_parallelism jobs at a time.
+
+    Dependencies are the declared depends_on names plus every node whose destination table is referenced in the
+    query. After the first failure no new node is started; the remaining ones are reported as SKIPPED and resume()
+    continues from there, relaunching failed nodes with the -retry-N- job id naming of relaunch_failed_jobs.
+    """
+
+    def __init__(self,
+                 client: EmsBigqueryClient,
+                 max_parallelism: int = 8,
+                 job_timeout_seconds: float = None,
+                 max_attempts: int = 3):
+        if max_parallelism < 1:
+            raise ValueError("max_parallelism must be at least 1!")
+        self.__client = client
+        self.__max_parallelism = max_parallelism
+        self.__job_timeout_seconds = job_timeout_seconds
+        self.__max_attempts = max_attempts
+        self.__job_id_prefix = None
+        self.__nodes = OrderedDict()
+        self.__dependencies = {}
+        self.__job_ids = {}
+        self.__succeeded = set()
+        self.__failed = []
+
+    @property
+    def job_ids(self) -> Dict[str, str]:
+        return dict(self.__job_ids)
+
+    @property
+    def failed_nodes(self) -> List[str]:
+        return list(self.__failed)
+
+    def run(self, nodes: List[EmsQueryNode], job_id_prefix: str) -> Iterator[EmsQueryDagEvent]:
+        self.__nodes = OrderedDict()
+        for node in nodes:
+            if node.name in self.__nodes:
+                raise ValueError(f"Duplicate node name: {node.name}")
+            self.__nodes[node.name] = node
+        self.__dependencies = self.__resolve_dependencies()
+        self.__job_id_prefix = job_id_prefix
+        self.__job_ids = {}
+        self.__succeeded = set()
+        self.__failed = []
+        return self.__execute(self.__topological_order(), {})
+
+    def resume(self) -> Iterator[EmsQueryDagEvent]:
+        if self.__job_id_prefix is None:
+            raise ValueError("Nothing to resume, run the DAG first!")
+        remaining = [name for name in self.__topological_order() if name not in self.__succeeded]
+        retry_prefixes = {name: EmsBigqueryClient.decorate_id_with_retry(self.__job_ids[name],
+                                                                           self.__node_prefix(name),
+                                                                           self.__max_attempts)
+                          for name in remaining if name in self.__job_ids}
+        self.__failed = []
+        return self.__execute(remaining, retry_prefixes)
+
+    def __execute(self, order: List[str], retry_prefixes: Dict[str, str]) -> Iterator[EmsQueryDagEvent]:
+        pending = list(order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.__max_parallelism) as executor:
+            while pending or running:
+                if not self.__failed:
+                    for name in [name for name in pending if self.__is_ready(name)]:
+                        if len(running) >= self.__max_parallelism:
+                            break
+                        pending.remove(name)
+                        job_id_prefix = retry_prefixes.get(name, self.__node_prefix(name) + "-")
+                        running[executor.submit(self.__run_node, self.__nodes[name], job_id_prefix)] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    job_id, error = future.result()
+                    if job_id is not None:
+                        self.__job_ids[name] = job_id
+                    if error is None:
+                        self.__succeeded.add(name)
+                        yield EmsQueryDagEvent(name, EmsQueryNodeStatus.SUCCEEDED, job_id)
+                    else:
+                        LOGGER.error("Node %s failed with job %s: %s", name, job_id, error)
+                        self.__failed.append(name)
+                        yield EmsQueryDagEvent(name, EmsQueryNodeStatus.FAILED, job_id, error)
+
+        for name in pending:
+            yield EmsQueryDagEvent(name, EmsQueryNodeStatus.SKIPPED)
+
+    def __run_node(self, node: EmsQueryNode, job_id_prefix: str) -> Tuple[Optional[str], Optional[Exception]]:
+        job_id = None
+        try:
+            job_id = self.__client.run_async_query(node.query, job_id_prefix, node.query_config)
+            self.__client.wait_for_job_done(job_id, self.__job_timeout_seconds)
+            return job_id, None
+        except Exception as error:  # pylint: disable=broad-except
+            return job_id, error
+
+    def __is_ready(self, name: str) -> bool:
+        return all(dependency in self.__succeeded for dependency in self.__dependencies[name])
+
+    def __node_prefix(self, name: str) -> str:
+        return f"{self.__job_id_prefix}-{name}"
+
+    def __resolve_dependencies(self) -> Dict[str, List[str]]:
+        producers = [(name, self.__destination_pattern(node.query_config))
+                     for name, node in self.__nodes.items()
+                     if node.query_config.destination_table is not None]
+
+        dependencies = {}
+        for name, node in self.__nodes.items():
+            for dependency in node.depends_on:
+                if dependency not in self.__nodes:
+                    raise ValueError(f"Node {name} depends on unknown node {dependency}")
+            inferred = [producer for producer, pattern in producers
+                        if producer != name and pattern.search(node.query)]
+            dependencies[name] = list(OrderedDict.fromkeys(node.depends_on + inferred))
+        return dependencies
+
+    def __destination_pattern(self, config: EmsQueryJobConfig):
+        project_id = config.destination_project_id or self.__client.project_id
+        table = re.escape(f"{config.destination_dataset}.{config.destination_table}")
+        return re.compile(r"(?<![\w.-])(?:" + re.escape(project_id) + r"\.)?" + table + r"(?![\w-])")
+
+    def __topological_order(self) -> List[str]:
+        order = []
+        remaining = list(self.__nodes)
+        while remaining:
+            ready = [name for name in remaining
+                     if all(dependency in order for dependency in self.__dependencies[name])]
+            if not ready:
+                raise ValueError(f"Dependency cycle between nodes: {', '.join(remaining)}")
+            order.extend(ready)
+            remaining = [name for name in remaining if name not in ready]
+        return order
@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import logging
+import os
+import pickle
+import struct
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.ems_query_template import EmsQueryTemplate
+from bigquery.job.config.ems_job_config import EmsJobPriority
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PAGE_ROWS = 1000
+POLL_SECONDS = 0.05
+
+_PAGE_HEADER = struct.Struct("<Q")
+
+
+class EmsQueryFanout:
+    """
+    Runs one query template once per shard parameter set and merges the rows of the shards.
+
+    Every shard runs in a worker process with its own EmsBigqueryClient, so decoding the result rows uses every core
+    instead of competing for the GIL. Workers append their rows in pages of page_rows rows to a per-shard file in a
+    temporary directory under spill_dir, and the rows are yielded while the shards are still running: page by page as
+    they arrive, or, when sort_key is given, k-way merged by it, reading one page per shard at a time. In that case
+    every shard query has to return its rows ordered by the same key.
+    """
+
+    def __init__(self,
+                 client: EmsBigqueryClient,
+                 max_workers: int = None,
+                 executor: Executor = None,
+                 spill_dir: str = None,
+                 page_rows: int = DEFAULT_PAGE_ROWS):
+        if page_rows < 1:
+            raise ValueError("page_rows must be at least 1!")
+        self.__project_id = client.project_id
+        self.__location = client.location
+        self.__max_workers = max_workers
+        self.__executor = executor
+        self.__spill_dir = spill_dir
+        self.__page_rows = page_rows
+
+    def run(self,
+            template: Union[str, EmsQueryTemplate],
+            shard_parameters: List[Union[Dict[str, Any], List[Any]]],
+            job_id_prefix: str = None,
+            ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(priority=EmsJobPriority.INTERACTIVE),
+            sort_key: Callable[[dict], Any] = None) -> Iterator[dict]:
+        query = template.query if isinstance(template, EmsQueryTemplate) else template
+        if self.__executor is not None:
+            return self.__run(self.__executor, query, shard_parameters, job_id_prefix, ems_query_job_config, sort_key)
+        return self.__run_in_process_pool(query, shard_parameters, job_id_prefix, ems_query_job_config, sort_key)
+
+    def __run_in_process_pool(self, query: str, shard_parameters: List[Union[Dict[str, Any], List[Any]]],
+                              job_id_prefix: str, ems_query_job_config: EmsQueryJobConfig,
+                              sort_key: Callable[[dict], Any]) -> Iterator[dict]:
+        with ProcessPoolExecutor(max_workers=self.__max_workers) as executor:
+            yield from self.__run(executor, query, shard_parameters, job_id_prefix, ems_query_job_config, sort_key)
+
+    def __run(self, executor: Executor, query: str, shard_parameters: List[Union[Dict[str, Any], List[Any]]],
+              job_id_prefix: str, ems_query_job_config: EmsQueryJobConfig,
+              sort_key: Callable[[dict], Any]) -> Iterator[dict]:
+        with tempfile.TemporaryDirectory(prefix="ems-query-fanout-", dir=self.__spill_dir) as spill_dir:
+            shards = []
+            try:
+                for index, parameters in enumerate(shard_parameters):
+                    spill_path = os.path.join(spill_dir, f"shard{index}.pages")
+                    open(spill_path, "wb").close()
+                    future = executor.submit(_run_shard, self.__project_id, self.__location, query, parameters,
+                                             self.__shard_prefix(job_id_prefix, index), ems_query_job_config,
+                                             spill_path, self.__page_rows)
+                    shards.append(_ShardPages(spill_path, future))
+                LOGGER.info("%s query shards submitted", len(shards))
+
+                if sort_key is None:
+                    yield from self.__yield_pages_as_they_arrive(shards)
+                else:
+                    yield from heapq.merge(*[shard.rows() for shard in shards], key=sort_key)
+            finally:
+                for shard in shards:
+                    shard.close()
+
+    @staticmethod
+    def __yield_pages_as_they_arrive(shards: List["_ShardPages"]) -> Iterator[dict]:
+        running = list(shards)
+        while running:
+            waiting = False
+            for shard in list(running):
+                page = shard.next_page()
+                if page:
+                    yield from page
+                elif shard.exhausted:
+                    running.remove(shard)
+                else:
+                    waiting = True
+            if waiting:
+                wait([shard.future for shard in running], timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+
+    @staticmethod
+    def __shard_prefix(job_id_prefix: str, index: int) -> str:
+        return None if job_id_prefix is None else f"{job_id_prefix}-shard{index}-"
+
+
+class _ShardPages:
+    """
+    Reads the pages of one shard file while its worker is still appending to it.
+    """
+
+    def __init__(self, path: str, future: Future):
+        self.__file = open(path, "rb")
+        self.__future = future
+        self.__exhausted = False
+
+    @property
+    def future(self) -> Future:
+        return self.__future
+
+    @property
+    def exhausted(self) -> bool:
+        return self.__exhausted
+
+    def next_page(self) -> Optional[List[dict]]:
+        """
+        Returns the next complete page, or None if the worker has not written one yet. Once the worker is done and
+        every page is read, exhausted is set, or the error of the worker is raised.
+        """
+        done = self.__future.done()
+        page = self.__read_page()
+        if page is None and done:
+            self.__future.result()
+            self.__exhausted = True
+        return page
+
+    def rows(self) -> Iterator[dict]:
+        while not self.__exhausted:
+            page = self.next_page()
+            if page is not None:
+                yield from page
+            elif not self.__exhausted:
+                wait([self.__future], timeout=POLL_SECONDS)
+
+    def close(self) -> None:
+        self.__future.cancel()
+        self.__file.close()
+
+    def __read_page(self) -> Optional[List[dict]]:
+        position = self.__file.tell()
+        header = self.__file.read(_PAGE_HEADER.size)
+        if len(header) == _PAGE_HEADER.size:
+            size, = _PAGE_HEADER.unpack(header)
+            payload = self.__file.read(size)
+            if len(payload) == size:
+                return pickle.loads(payload)
+        self.__file.seek(position)
+        return None
+
+
+def _run_shard(project_id: str, location: str, query: str, query_parameters: Union[Dict[str, Any], List[Any]],
+               job_id_prefix: str, ems_query_job_config: EmsQueryJobConfig, spill_path: str, page_rows: int) -> int:
+    client = EmsBigqueryClient(project_id, location)
+    rows = client.run_sync_query(query,
+                                 ems_query_job_config=ems_query_job_config,
+                                 job_id_prefix=job_id_prefix,
+                                 query_parameters=query_parameters)
+    return _write_pages(rows, spill_path, page_rows)
+
+
+def _write_pages(rows: Iterable[dict], spill_path: str, page_rows: int) -> int:
+    row_count = 0
+    rows = iter(rows)
+    with open(spill_path, "ab") as spill_file:
+        for page in iter(lambda: list(itertools.islice(rows, page_rows)), []):
+            payload = pickle.dumps(page, protocol=pickle.HIGHEST_PROTOCOL)
+            spill_file.write(_PAGE_HEADER.pack(len(payload)) + payload)
+            spill_file.flush()
+            row_count += len(page)
+    return row_count
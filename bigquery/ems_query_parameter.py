@@ -0,0 +1,127 @@
+from abc import ABC
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, List, Union
+
+
+class EmsQueryParameter(ABC):
+
+    def __init__(self, name: str = None):
+        self.__name = name
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    def __eq__(self, other):
+        return type(self) is type(other) and repr(self) == repr(other)
+
+    def __hash__(self):
+        return hash(repr(self))
+
+
+class EmsScalarQueryParameter(EmsQueryParameter):
+
+    def __init__(self, name: str, value: Any, type_: str = None):
+        super(EmsScalarQueryParameter, self).__init__(name)
+        self.__value = value
+        self.__type = type_ or infer_scalar_type(value)
+
+    @property
+    def value(self) -> Any:
+        return self.__value
+
+    @property
+    def type(self) -> str:
+        return self.__type
+
+    def __repr__(self):
+        return f"EmsScalarQueryParameter({self.name!r}, {self.__value!r}, {self.__type!r})"
+
+
+class EmsArrayQueryParameter(EmsQueryParameter):
+
+    def __init__(self, name: str, values: List[Any], array_type: str = None):
+        super(EmsArrayQueryParameter, self).__init__(name)
+        self.__values = [EmsStructQueryParameter.from_dict(None, value) if isinstance(value, dict) else value
+                         for value in values]
+        if array_type is None:
+            if not self.__values:
+                raise ValueError("Cannot infer the type of an empty array, pass array_type explicitly!")
+            first = self.__values[0]
+            array_type = "STRUCT" if isinstance(first, EmsStructQueryParameter) else infer_scalar_type(first)
+        self.__array_type = array_type
+
+    @property
+    def values(self) -> List[Any]:
+        return self.__values
+
+    @property
+    def array_type(self) -> str:
+        return self.__array_type
+
+    def __repr__(self):
+        return f"EmsArrayQueryParameter({self.name!r}, {self.__values!r}, {self.__array_type!r})"
+
+
+class EmsStructQueryParameter(EmsQueryParameter):
+
+    def __init__(self, name: str, fields: List[EmsQueryParameter]):
+        super(EmsStructQueryParameter, self).__init__(name)
+        self.__fields = fields
+
+    @property
+    def fields(self) -> List[EmsQueryParameter]:
+        return self.__fields
+
+    @staticmethod
+    def from_dict(name: str, value: Dict[str, Any]) -> "EmsStructQueryParameter":
+        return EmsStructQueryParameter(name, [to_ems_query_parameter(field_name, field_value)
+                                              for field_name, field_value in value.items()])
+
+    def __repr__(self):
+        return f"EmsStructQueryParameter({self.name!r}, {self.__fields!r})"
+
+
+def infer_scalar_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "BOOL"
+    if isinstance(value, int):
+        return "INT64"
+    if isinstance(value, float):
+        return "FLOAT64"
+    if isinstance(value, Decimal):
+        return "NUMERIC"
+    if isinstance(value, str):
+        return "STRING"
+    if isinstance(value, bytes):
+        return "BYTES"
+    if isinstance(value, datetime):
+        return "TIMESTAMP" if value.tzinfo is not None else "DATETIME"
+    if isinstance(value, date):
+        return "DATE"
+    if isinstance(value, time):
+        return "TIME"
+    raise ValueError(f"Cannot infer query parameter type of {value!r}, pass the type explicitly!")
+
+
+def to_ems_query_parameter(name: Union[str, None], value: Any) -> EmsQueryParameter:
+    if isinstance(value, EmsQueryParameter):
+        return value
+    if isinstance(value, dict):
+        return EmsStructQueryParameter.from_dict(name, value)
+    if isinstance(value, (list, tuple)):
+        return EmsArrayQueryParameter(name, list(value))
+    return EmsScalarQueryParameter(name, value)
+
+
+def to_ems_query_parameters(parameters: Union[Dict[str, Any], List[Any], None]) -> List[EmsQueryParameter]:
+    """
+    Named parameters are given as a dict and are ordered by name, so equal parameters always produce the same
+    request. Positional parameters are given as a list. Plain Python values are wrapped with an inferred type.
+    """
+    if parameters is None:
+        return []
+    if isinstance(parameters, dict):
+        return [to_ems_query_parameter(name, parameters[name]) for name in sorted(parameters)]
+    return [to_ems_query_parameter(None, value) for value in parameters]
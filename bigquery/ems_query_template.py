@@ -0,0 +1,135 @@
+import hashlib
+import threading
+from typing import Any, Dict, List, Union
+
+from bigquery.ems_query_parameter import to_ems_query_parameters
+
+QUOTES = ("'''", '"""', "'", '"', "`")
+RAW_PREFIXES = ("r", "rb", "br")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Drops comments and collapses whitespace outside of string literals and quoted identifiers, so templates that
+    only differ in formatting end up as the same query text.
+    """
+    normalized = []
+    pending_space = False
+    index = 0
+    while index < len(query):
+        quote = next((quote for quote in QUOTES if query.startswith(quote, index)), None)
+        if quote is not None:
+            end = _find_literal_end(query, index + len(quote), quote, _is_raw_literal(query, index, quote))
+            if pending_space and normalized:
+                normalized.append(" ")
+            pending_space = False
+            normalized.append(query[index:end])
+            index = end
+        elif query.startswith("--", index) or query[index] == "#":
+            newline = query.find("\n", index)
+            index = len(query) if newline == -1 else newline
+            pending_space = True
+        elif query.startswith("/*", index):
+            comment_end = query.find("*/", index + 2)
+            index = len(query) if comment_end == -1 else comment_end + 2
+            pending_space = True
+        elif query[index].isspace():
+            pending_space = True
+            index += 1
+        else:
+            if pending_space and normalized:
+                normalized.append(" ")
+            pending_space = False
+            normalized.append(query[index])
+            index += 1
+    return "".join(normalized)
+
+
+def _is_raw_literal(query: str, quote_index: int, quote: str) -> bool:
+    if quote == "`":
+        return False
+    prefix_start = quote_index
+    while prefix_start > 0 and (query[prefix_start - 1].isalnum() or query[prefix_start - 1] == "_"):
+        prefix_start -= 1
+    return query[prefix_start:quote_index].lower() in RAW_PREFIXES
+
+
+def _find_literal_end(query: str, index: int, quote: str, raw: bool) -> int:
+    while index < len(query):
+        if query[index] == "\\" and not raw:
+            index += 2
+        elif query.startswith(quote, index):
+            return index + len(quote)
+        else:
+            index += 1
+    return len(query)
+
+
+class EmsQueryTemplate:
+
+    def __init__(self, name: str, query: str):
+        """
+        query is sent to BigQuery as it is, the normalized text only serves the fingerprint.
+        """
+        self.__name = name
+        self.__query = query
+        self.__normalized_query = normalize_query(query)
+        self.__fingerprint = hashlib.sha256(self.__normalized_query.encode("utf-8")).hexdigest()
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def query(self) -> str:
+        return self.__query
+
+    @property
+    def normalized_query(self) -> str:
+        return self.__normalized_query
+
+    @property
+    def fingerprint(self) -> str:
+        return self.__fingerprint
+
+    def cache_key(self, query_parameters: Union[Dict[str, Any], List[Any]] = None) -> str:
+        parameters = repr(to_ems_query_parameters(query_parameters))
+        return hashlib.sha256(f"{self.__fingerprint}:{parameters}".encode("utf-8")).hexdigest()
+
+
+class EmsQueryTemplateRegistry:
+
+    def __init__(self):
+        self.__templates = {}
+        self.__first_by_fingerprint = {}
+        self.__lock = threading.Lock()
+
+    def register(self, name: str, query: str) -> EmsQueryTemplate:
+        """
+        Templates with the same fingerprint all send the text registered first, so BigQuery sees the same query
+        text and can reuse its cached results. Registering a name again returns its existing template.
+        """
+        template = EmsQueryTemplate(name, query)
+        with self.__lock:
+            registered = self.__templates.get(name)
+            if registered is not None:
+                if registered.fingerprint != template.fingerprint:
+                    raise ValueError(f"Query template {name} is already registered with a different query!")
+                return registered
+            first = self.__first_by_fingerprint.setdefault(template.fingerprint, template)
+            if first is not template:
+                template = EmsQueryTemplate(name, first.query)
+            self.__templates[name] = template
+        return template
+
+    def get(self, name: str) -> EmsQueryTemplate:
+        try:
+            return self.__templates[name]
+        except KeyError:
+            raise KeyError(f"Query template {name} is not registered!")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__templates
+
+    def __len__(self) -> int:
+        return len(self.__templates)
@@ -0,0 +1,192 @@
+import logging
+from typing import List, Optional
+
+from bigquery.ems_api_error import EmsApiError
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.job.config.ems_job_config import EmsJobPriority
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+from bigquery.job.ems_job_state import EmsJobState
+
+LOGGER = logging.getLogger(__name__)
+
+MAX_SCRIPT_BYTES = 1024 * 1024
+TRANSACTION_STATEMENT_TYPES = ("BEGIN_TRANSACTION", "COMMIT_TRANSACTION", "ROLLBACK_TRANSACTION")
+BEGIN_TRANSACTION = "BEGIN TRANSACTION;\n"
+COMMIT_TRANSACTION = "COMMIT TRANSACTION;"
+
+
+class EmsStatementResult:
+
+    def __init__(self,
+                 statement: str,
+                 job_id: str = None,
+                 statement_type: str = None,
+                 num_dml_affected_rows: int = None,
+                 error_result: dict = None,
+                 rolled_back: bool = False):
+        self.__statement = statement
+        self.__job_id = job_id
+        self.__statement_type = statement_type
+        self.__num_dml_affected_rows = num_dml_affected_rows
+        self.__error_result = error_result
+        self.__rolled_back = rolled_back
+
+    @property
+    def statement(self) -> str:
+        return self.__statement
+
+    @property
+    def job_id(self) -> Optional[str]:
+        return self.__job_id
+
+    @property
+    def statement_type(self) -> Optional[str]:
+        return self.__statement_type
+
+    @property
+    def num_dml_affected_rows(self) -> Optional[int]:
+        return self.__num_dml_affected_rows
+
+    @property
+    def error_result(self) -> Optional[dict]:
+        return self.__error_result
+
+    @property
+    def rolled_back(self) -> bool:
+        """
+        True if the statement ran, but its transaction was rolled back, so its changes were not applied.
+        """
+        return self.__rolled_back
+
+    @property
+    def executed(self) -> bool:
+        return self.__job_id is not None
+
+    @property
+    def is_failed(self) -> bool:
+        return self.__error_result is not None
+
+
+class EmsStatementBatcher:
+    """
+    Collects DML statements and runs them as multi-statement scripts, each at most max_script_bytes long, instead of
+    one job per statement. With transactional=True every script is wrapped into a transaction, so a script either
+    applies all of its statements or none of them.
+
+    The result of every statement is read back from the child job BigQuery creates for it, matched by the script line
+    the statement starts at, or by its text. When a script fails, the statements after the failing one are reported
+    as not executed and EmsApiError is raised; in a transaction the executed statements are reported as rolled
+    back once the script job failed. If the script does not finish within job_timeout_seconds, the
+    concurrent.futures.TimeoutError of the wait is raised as it is, because the script may still commit.
+    """
+
+    def __init__(self,
+                 client: EmsBigqueryClient,
+                 job_id_prefix: str = None,
+                 transactional: bool = False,
+                 max_script_bytes: int = MAX_SCRIPT_BYTES,
+                 ems_query_job_config: EmsQueryJobConfig = EmsQueryJobConfig(priority=EmsJobPriority.INTERACTIVE),
+                 job_timeout_seconds: float = None):
+        self.__client = client
+        self.__job_id_prefix = job_id_prefix
+        self.__transactional = transactional
+        self.__max_script_bytes = max_script_bytes
+        self.__ems_query_job_config = ems_query_job_config
+        self.__job_timeout_seconds = job_timeout_seconds
+        self.__statements = []
+        self.__script_bytes = self.__wrapper_bytes()
+        self.__script_count = 0
+        self.__results = []
+
+    @property
+    def results(self) -> List[EmsStatementResult]:
+        return list(self.__results)
+
+    @property
+    def pending_statement_count(self) -> int:
+        return len(self.__statements)
+
+    def add(self, statement: str) -> None:
+        statement = statement.strip().rstrip(";").strip()
+        if not statement:
+            return
+        statement_bytes = len(statement.encode("utf-8")) + 2
+        if self.__wrapper_bytes() + statement_bytes > self.__max_script_bytes:
+            raise ValueError(f"Statement is longer than the {self.__max_script_bytes} bytes script limit!")
+        if self.__script_bytes + statement_bytes > self.__max_script_bytes:
+            self.flush()
+        self.__statements.append(statement)
+        self.__script_bytes += statement_bytes
+
+    def flush(self) -> List[EmsStatementResult]:
+        if not self.__statements:
+            return []
+        statements = self.__statements
+        self.__statements = []
+        self.__script_bytes = self.__wrapper_bytes()
+        return self.__run_script(statements)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+    def __run_script(self, statements: List[str]) -> List[EmsStatementResult]:
+        from google.api_core.exceptions import GoogleAPIError
+
+        script = "".join(statement + ";\n" for statement in statements)
+        if self.__transactional:
+            script = BEGIN_TRANSACTION + script + COMMIT_TRANSACTION
+        job_id_prefix = None if self.__job_id_prefix is None \
+            else f"{self.__job_id_prefix}-script{self.__script_count}-"
+        self.__script_count += 1
+
+        job_id = self.__client.run_async_query(script, job_id_prefix, self.__ems_query_job_config)
+        LOGGER.info("Script job %s submitted with %s statements", job_id, len(statements))
+        error = None
+        try:
+            self.__client.wait_for_job_done(job_id, self.__job_timeout_seconds)
+        except GoogleAPIError as e:
+            error = e
+
+        rolled_back = False
+        if error is not None and self.__transactional:
+            script_job = self.__client.get_job(job_id)
+            rolled_back = script_job.state == EmsJobState.DONE and script_job.is_failed
+        results = [EmsStatementResult(statement) for statement in statements]
+        for index, job in self.__match_child_jobs(statements, self.__client.get_child_jobs(job_id)):
+            results[index] = EmsStatementResult(statements[index], job.job_id, job.statement_type,
+                                                job.num_dml_affected_rows, job.error_result, rolled_back)
+        self.__results.extend(results)
+
+        if error is not None:
+            failed = next((result.statement for result in results if result.is_failed), None)
+            raise EmsApiError("Error caused while running script job {} at statement | {} |{}: {}!"
+                              .format(job_id, failed, ", transaction rolled back" if rolled_back else "", error))
+        return results
+
+    def __match_child_jobs(self, statements: List[str], child_jobs: list) -> List[tuple]:
+        start_lines = {}
+        line = 2 if self.__transactional else 1
+        for index, statement in enumerate(statements):
+            start_lines[line] = index
+            line += statement.count("\n") + 1
+
+        matched = []
+        unmatched = set(range(len(statements)))
+        for job in child_jobs:
+            if getattr(job, "statement_type", None) in TRANSACTION_STATEMENT_TYPES:
+                continue
+            index = start_lines.get(getattr(job, "script_start_line", None))
+            if index is None:
+                text = (getattr(job, "query", None) or "").strip().rstrip(";").strip()
+                index = next((index for index in sorted(unmatched) if statements[index] == text), None)
+            if index in unmatched:
+                unmatched.remove(index)
+                matched.append((index, job))
+        return matched
+
+    def __wrapper_bytes(self) -> int:
+        return len(BEGIN_TRANSACTION) + len(COMMIT_TRANSACTION) if self.__transactional else 0
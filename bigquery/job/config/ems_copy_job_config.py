@@ -0,0 +1,30 @@
+from datetime import datetime
+from enum import Enum
+
+from bigquery.job.config.ems_job_config import EmsJobConfig
+
+
+class EmsCopyOperationType(Enum):
+    COPY = "COPY"
+    SNAPSHOT = "SNAPSHOT"
+    RESTORE = "RESTORE"
+    CLONE = "CLONE"
+
+
+class EmsCopyJobConfig(EmsJobConfig):
+
+    def __init__(self,
+                 operation_type: EmsCopyOperationType = EmsCopyOperationType.COPY,
+                 destination_expiration_time: datetime = None,
+                 *args, **kwargs):
+        super(EmsCopyJobConfig, self).__init__(*args, **kwargs)
+        self.__operation_type = operation_type
+        self.__destination_expiration_time = destination_expiration_time
+
+    @property
+    def operation_type(self):
+        return self.__operation_type
+
+    @property
+    def destination_expiration_time(self):
+        return self.__destination_expiration_time
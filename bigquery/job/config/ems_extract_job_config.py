@@ -7,12 +7,14 @@ class DestinationFormat(Enum):
     CSV = "CSV"
     NEWLINE_DELIMITED_JSON = "NEWLINE_DELIMITED_JSON"
     AVRO = "AVRO"
+    PARQUET = "PARQUET"
 
 
 class Compression(Enum):
     GZIP = "GZIP"
     DEFLATE = "DEFLATE"
     SNAPPY = "SNAPPY"
+    ZSTD = "ZSTD"
     NONE = "NONE"
 
 
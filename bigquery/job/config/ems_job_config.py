@@ -16,6 +16,7 @@ class EmsCreateDisposition(Enum):
 class EmsJobPriority(Enum):
     INTERACTIVE = "INTERACTIVE"
     BATCH = "BATCH"
+    AUTO = "AUTO"
 
 
 class EmsJobConfig(ABC):
@@ -1,13 +1,24 @@
+from enum import Enum
+
 from bigquery.job.config.ems_job_config import EmsJobConfig
 
 
+class EmsSourceFormat(Enum):
+    CSV = "CSV"
+    NEWLINE_DELIMITED_JSON = "NEWLINE_DELIMITED_JSON"
+    AVRO = "AVRO"
+    PARQUET = "PARQUET"
+
+
 class EmsLoadJobConfig(EmsJobConfig):
     
-    def __init__(self, schema: dict, source_uri_template: str, skip_leading_rows: int = 0, *args, **kwargs):
+    def __init__(self, schema: dict, source_uri_template: str, skip_leading_rows: int = 0,
+                 source_format: EmsSourceFormat = EmsSourceFormat.CSV, *args, **kwargs):
         super(EmsLoadJobConfig, self).__init__(*args, **kwargs)
         self.__schema_json = schema
         self.__source_uri_template = source_uri_template
         self.__skip_leading_rows = skip_leading_rows
+        self.__source_format = source_format
         self.__validate(self.destination_project_id)
         self.__validate(self.destination_dataset)
         self.__validate(self.destination_table)
@@ -24,6 +35,10 @@ class EmsLoadJobConfig(EmsJobConfig):
     def skip_leading_rows(self):
         return self.__skip_leading_rows
 
+    @property
+    def source_format(self):
+        return self.__source_format
+
     @staticmethod
     def __validate(value):
         if value is None or value.strip() == "":
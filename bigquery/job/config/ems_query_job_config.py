@@ -1,10 +1,14 @@
 from enum import Enum
+from typing import List
 
 from bigquery.job.config.ems_job_config import EmsJobConfig, EmsJobPriority
 
 
 class EmsTimePartitioningType(Enum):
+    HOUR = "HOUR"
     DAY = "DAY"
+    MONTH = "MONTH"
+    YEAR = "YEAR"
 
 
 class EmsTimePartitioning:
@@ -38,17 +42,56 @@ class EmsTimePartitioning:
         return self.__require_partition_filter
 
 
+class EmsRangePartitioning:
+    def __init__(self,
+                 field: str,
+                 start: int,
+                 end: int,
+                 interval: int):
+        if interval <= 0 or end <= start:
+            raise ValueError("Range partitioning needs start < end and a positive interval!")
+        self.__field = field
+        self.__start = start
+        self.__end = end
+        self.__interval = interval
+
+    @property
+    def field(self):
+        return self.__field
+
+    @property
+    def start(self):
+        return self.__start
+
+    @property
+    def end(self):
+        return self.__end
+
+    @property
+    def interval(self):
+        return self.__interval
+
+
 class EmsQueryJobConfig(EmsJobConfig):
 
     def __init__(self,
                  priority: EmsJobPriority = EmsJobPriority.INTERACTIVE,
                  use_query_cache: bool = False,
                  time_partitioning: EmsTimePartitioning = None,
-                 *args, **kwargs):
+                 *args,
+                 range_partitioning: EmsRangePartitioning = None,
+                 clustering_fields: List[str] = None,
+                 latency_target_seconds: float = None,
+                 **kwargs):
         super(EmsQueryJobConfig, self).__init__(*args, **kwargs)
+        if time_partitioning is not None and range_partitioning is not None:
+            raise ValueError("Time partitioning and range partitioning cannot be used together!")
         self.__priority = priority
         self.__use_query_cache = use_query_cache
         self.__time_partitioning = time_partitioning
+        self.__range_partitioning = range_partitioning
+        self.__clustering_fields = clustering_fields
+        self.__latency_target_seconds = latency_target_seconds
 
     @property
     def priority(self):
@@ -61,3 +104,15 @@ class EmsQueryJobConfig(EmsJobConfig):
     @property
     def time_partitioning(self):
         return self.__time_partitioning
+
+    @property
+    def range_partitioning(self):
+        return self.__range_partitioning
+
+    @property
+    def clustering_fields(self):
+        return self.__clustering_fields
+
+    @property
+    def latency_target_seconds(self):
+        return self.__latency_target_seconds
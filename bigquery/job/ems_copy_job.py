@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import List, Union
+
+from bigquery.job.config.ems_copy_job_config import EmsCopyJobConfig
+from bigquery.job.ems_job import EmsJob
+from bigquery.job.ems_job_state import EmsJobState
+
+
+class EmsCopyJob(EmsJob):
+    def __init__(self,
+                 job_id: str,
+                 source_tables: List[str],
+                 destination_table: str,
+                 job_config: EmsCopyJobConfig,
+                 state: EmsJobState,
+                 error_result: Union[dict, None],
+                 created: datetime = None):
+        super(EmsCopyJob, self).__init__(job_id, state, error_result, created)
+
+        self.__source_tables = source_tables
+        self.__destination_table = destination_table
+        self.__job_config = job_config
+
+    @property
+    def source_tables(self) -> List[str]:
+        return self.__source_tables
+
+    @property
+    def destination_table(self) -> str:
+        return self.__destination_table
+
+    @property
+    def job_config(self) -> EmsCopyJobConfig:
+        return self.__job_config
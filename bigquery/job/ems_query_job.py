@@ -13,11 +13,17 @@ class EmsQueryJob(EmsJob):
                  query_config: EmsQueryJobConfig,
                  state: EmsJobState,
                  error_result: Union[dict, None],
-                 created: datetime = None):
+                 created: datetime = None,
+                 statement_type: str = None,
+                 num_dml_affected_rows: int = None,
+                 script_start_line: int = None):
         super(EmsQueryJob, self).__init__(job_id, state, error_result, created)
 
         self.__query = query
         self.__query_config = query_config
+        self.__statement_type = statement_type
+        self.__num_dml_affected_rows = num_dml_affected_rows
+        self.__script_start_line = script_start_line
 
     @property
     def query_config(self) -> EmsQueryJobConfig:
@@ -26,3 +32,18 @@ class EmsQueryJob(EmsJob):
     @property
     def query(self) -> str:
         return self.__query
+
+    @property
+    def statement_type(self) -> Union[str, None]:
+        return self.__statement_type
+
+    @property
+    def num_dml_affected_rows(self) -> Union[int, None]:
+        return self.__num_dml_affected_rows
+
+    @property
+    def script_start_line(self) -> Union[int, None]:
+        """
+        Line of the parent script, starting from 1, where the statement of a script child job starts.
+        """
+        return self.__script_start_line
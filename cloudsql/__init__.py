@@ -1,3 +1,24 @@
+import importlib
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)-12s %(levelname)-8s %(message)s")
+
+_LAZY_EXPORTS = {
+    "EmsCloudsqlClient": "cloudsql.ems_cloudsql_client",
+    "EmsCloudsqlClientError": "cloudsql.ems_cloudsql_client",
+    "EmsCloudsqlUtil": "cloudsql.ems_cloudsql_util",
+    "TempBucketDescriptor": "cloudsql.ems_cloudsql_util",
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
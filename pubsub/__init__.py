@@ -1,3 +1,36 @@
+import importlib
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)-12s %(levelname)-8s %(message)s")
+
+_LAZY_EXPORTS = {
+    "EmsBloomDeduplicator": "pubsub.ems_deduplicator",
+    "EmsCompression": "pubsub.ems_compression",
+    "EmsCompressionSettings": "pubsub.ems_compression",
+    "EmsFlowControlBehavior": "pubsub.ems_publish_flow_control",
+    "EmsLeaseManager": "pubsub.ems_lease_manager",
+    "EmsLruDeduplicator": "pubsub.ems_deduplicator",
+    "EmsMessage": "pubsub.ems_message",
+    "EmsMessageBatchSettings": "pubsub.ems_message_batcher",
+    "EmsPublishFlowControl": "pubsub.ems_publish_flow_control",
+    "EmsPublishManyFuture": "pubsub.ems_publish_future",
+    "EmsPublisherBatchSettings": "pubsub.ems_publisher_batch_settings",
+    "EmsPublisherClient": "pubsub.ems_publisher_client",
+    "EmsPullStream": "pubsub.ems_pull_stream",
+    "EmsSchemaRegistry": "pubsub.ems_schema_registry",
+    "EmsStreamingFuture": "pubsub.ems_streaming_future",
+    "EmsSubscriberClient": "pubsub.ems_subscriber_client",
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
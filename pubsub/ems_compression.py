@@ -0,0 +1,63 @@
+import gzip
+from enum import Enum
+
+try:
+    import zstandard
+except ImportError:  # zstandard is the optional zstd extra
+    zstandard = None
+
+# namespaced, so a standard content-encoding attribute set by other publishers is left alone
+CONTENT_ENCODING_ATTRIBUTE = "ems-content-encoding"
+
+MISSING_ZSTD_MESSAGE = "zstd compression needs zstandard, install ems-gcp-toolkit[zstd]!"
+
+
+class EmsCompression(Enum):
+    NONE = None
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+
+class EmsCompressionSettings:
+    """
+    Payloads of at least threshold_bytes are compressed with compression, smaller ones are not worth the overhead.
+    """
+
+    def __init__(self, compression: EmsCompression = EmsCompression.NONE, threshold_bytes: int = 1024):
+        self.__compression = compression
+        self.__threshold_bytes = threshold_bytes
+
+    @property
+    def compression(self) -> EmsCompression:
+        return self.__compression
+
+    @property
+    def threshold_bytes(self) -> int:
+        return self.__threshold_bytes
+
+
+def check_compression_dependencies(compression: EmsCompression) -> None:
+    if compression == EmsCompression.ZSTD and zstandard is None:
+        raise ImportError(MISSING_ZSTD_MESSAGE)
+
+
+def compress(data: bytes, compression: EmsCompression) -> bytes:
+    if compression == EmsCompression.GZIP:
+        return gzip.compress(data, compresslevel=6)
+    if compression == EmsCompression.ZSTD:
+        check_compression_dependencies(compression)
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def decompress(data: bytes, content_encoding: str = None) -> bytes:
+    """
+    Reverses compress for the ems-content-encoding attribute value of a message. None, identity and encodings
+    compress does not write leave the data as it is.
+    """
+    if content_encoding == EmsCompression.GZIP.value:
+        return gzip.decompress(data)
+    if content_encoding == EmsCompression.ZSTD.value:
+        check_compression_dependencies(EmsCompression.ZSTD)
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
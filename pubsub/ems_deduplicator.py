@@ -0,0 +1,152 @@
+import hashlib
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from pubsub.ems_message import EmsMessage
+
+
+class EmsDeduplicator(ABC):
+    """
+    Recognizes redelivered messages by their message id, or by the key_attribute attribute when it is given.
+
+    is_duplicate only checks a message and counts hits and misses, remember marks it as processed. Subscribers
+    remember a message only after it was handled successfully, so a failed message is still redelivered.
+    """
+
+    def __init__(self, key_attribute: str = None):
+        self.__key_attribute = key_attribute
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    @property
+    def hit_ratio(self) -> float:
+        checked = self.__hits + self.__misses
+        return self.__hits / checked if checked else 0.
+
+    def key(self, message: EmsMessage) -> str:
+        if self.__key_attribute is None:
+            return message.message_id
+        return message.attributes.get(self.__key_attribute)
+
+    def is_duplicate(self, message: EmsMessage) -> bool:
+        key = self.key(message)
+        with self.__lock:
+            duplicate = key is not None and self._contains(key)
+            if duplicate:
+                self.__hits += 1
+            else:
+                self.__misses += 1
+        return duplicate
+
+    def remember(self, message: EmsMessage) -> None:
+        self.remember_key(self.key(message))
+
+    def remember_key(self, key: str) -> None:
+        if key is not None:
+            with self.__lock:
+                self._add(key)
+
+    @abstractmethod
+    def _contains(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def _add(self, key: str) -> None:
+        pass
+
+
+class EmsLruDeduplicator(EmsDeduplicator):
+    """
+    Remembers the max_size most recently seen keys exactly.
+    """
+
+    def __init__(self, max_size: int = 100000, key_attribute: str = None):
+        super().__init__(key_attribute)
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1!")
+        self.__max_size = max_size
+        self.__keys = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def _contains(self, key: str) -> bool:
+        if key in self.__keys:
+            self.__keys.move_to_end(key)
+            return True
+        return False
+
+    def _add(self, key: str) -> None:
+        self.__keys[key] = None
+        self.__keys.move_to_end(key)
+        if len(self.__keys) > self.__max_size:
+            self.__keys.popitem(last=False)
+
+
+class EmsBloomDeduplicator(EmsDeduplicator):
+    """
+    Remembers keys seen in the last window_seconds to 2 * window_seconds in two rotating Bloom filters, each sized
+    for expected_items keys at false_positive_rate. Memory stays fixed, but a false positive drops a new message.
+    """
+
+    def __init__(self,
+                 expected_items: int = 1000000,
+                 false_positive_rate: float = 0.0001,
+                 window_seconds: float = 600,
+                 key_attribute: str = None):
+        super().__init__(key_attribute)
+        if expected_items < 1 or not 0 < false_positive_rate < 1:
+            raise ValueError("Bloom filter needs positive expected_items and a false_positive_rate in (0, 1)!")
+        self.__bit_count = int(math.ceil(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.__hash_count = max(1, int(round(self.__bit_count / expected_items * math.log(2))))
+        self.__window_seconds = window_seconds
+        self.__current = bytearray((self.__bit_count + 7) // 8)
+        self.__previous = bytearray(len(self.__current))
+        self.__window_started = time.monotonic()
+
+    @property
+    def bit_count(self) -> int:
+        return self.__bit_count
+
+    @property
+    def hash_count(self) -> int:
+        return self.__hash_count
+
+    def _contains(self, key: str) -> bool:
+        self.__rotate()
+        positions = self.__positions(key)
+        return self.__has_all(self.__current, positions) or self.__has_all(self.__previous, positions)
+
+    def _add(self, key: str) -> None:
+        self.__rotate()
+        for position in self.__positions(key):
+            self.__current[position >> 3] |= 1 << (position & 7)
+
+    def __rotate(self) -> None:
+        elapsed = time.monotonic() - self.__window_started
+        if elapsed < self.__window_seconds:
+            return
+        self.__previous = self.__current if elapsed < 2 * self.__window_seconds else bytearray(len(self.__current))
+        self.__current = bytearray(len(self.__current))
+        self.__window_started = time.monotonic()
+
+    def __positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.__bit_count for index in range(self.__hash_count)]
+
+    @staticmethod
+    def __has_all(bits: bytearray, positions) -> bool:
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in positions)
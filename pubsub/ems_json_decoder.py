@@ -0,0 +1,127 @@
+import dataclasses
+import functools
+import importlib
+import json
+import sys
+import typing
+from typing import Any, Callable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+JsonDecoder = Callable[[bytes], Any]
+
+MISSING_FAST_DECODER_MESSAGE = "A fast JSON decoder needs orjson or msgspec, install ems-gcp-toolkit[fast-json]!"
+
+# module, decoding function and error type of every fast decoder, in order of preference
+_FAST_DECODERS = (("orjson", "loads", "orjson", "JSONDecodeError"),
+                  ("msgspec.json", "decode", "msgspec", "DecodeError"))
+
+_decoder: JsonDecoder = None
+
+
+def get_json_decoder() -> JsonDecoder:
+    """
+    The decoder behind EmsMessage.data_json: json.loads of the standard library, unless another one was set with
+    set_json_decoder or use_fast_json_decoder.
+    """
+    return _decoder or json.loads
+
+
+def set_json_decoder(decoder: JsonDecoder = None) -> None:
+    """
+    Replaces the decoder used by every EmsMessage, None restores the default one.
+    """
+    global _decoder  # pylint: disable=global-statement
+    _decoder = decoder
+
+
+def use_fast_json_decoder() -> JsonDecoder:
+    """
+    Switches every EmsMessage to orjson, or msgspec if orjson is not installed, and returns the decoder. Invalid
+    payloads raise json.JSONDecodeError, a ValueError, like with the standard library. Unlike the standard library,
+    orjson rejects integers outside the 64-bit range, so payloads with larger numbers fail to decode with it.
+    """
+    decoder = _fast_decoder()
+    if decoder is None:
+        raise ImportError(MISSING_FAST_DECODER_MESSAGE)
+    set_json_decoder(decoder)
+    return decoder
+
+
+def decode_as(data: bytes, struct_type: Type[T], decoded: Any = None) -> T:
+    """
+    Decodes a JSON payload into struct_type, which is either a msgspec.Struct, decoded and validated straight from
+    the bytes, or a dataclass, filled from the decoded payload recursively for dataclass typed fields. Unknown keys
+    are ignored, a payload not matching struct_type raises ValueError. decoded can pass an already decoded payload.
+    """
+    if _is_msgspec_struct(struct_type):
+        msgspec = sys.modules["msgspec"]
+        try:
+            return importlib.import_module("msgspec.json").decode(data, type=struct_type)
+        except msgspec.DecodeError as error:
+            raise ValueError(f"Payload does not match {struct_type.__name__}: {error}!") from error
+    if not _is_dataclass_type(struct_type):
+        raise ValueError(f"{struct_type!r} is neither a dataclass nor a msgspec.Struct!")
+    return _to_dataclass(get_json_decoder()(data) if decoded is None else decoded, struct_type)
+
+
+def _fast_decoder() -> Optional[JsonDecoder]:
+    for module_name, function_name, error_module_name, error_name in _FAST_DECODERS:
+        try:
+            decode = getattr(importlib.import_module(module_name), function_name)
+            error_type = getattr(importlib.import_module(error_module_name), error_name)
+        except ImportError:
+            continue
+        return _raising_json_decode_error(decode, error_type)
+    return None
+
+
+def _raising_json_decode_error(decode: JsonDecoder, error_type: type) -> JsonDecoder:
+    @functools.wraps(decode)
+    def decode_json(data: bytes) -> Any:
+        try:
+            return decode(data)
+        except error_type as error:
+            if isinstance(error, json.JSONDecodeError):
+                raise
+            document = data.decode("utf-8", "replace") if isinstance(data, (bytes, bytearray)) else str(data)
+            raise json.JSONDecodeError(str(error), document, 0) from error
+    return decode_json
+
+
+def _is_msgspec_struct(struct_type: type) -> bool:
+    msgspec = sys.modules.get("msgspec")
+    if msgspec is None:
+        return False
+    return isinstance(struct_type, type) and issubclass(struct_type, msgspec.Struct)
+
+
+@functools.lru_cache(maxsize=None)
+def _init_fields(struct_type: type) -> Tuple[Tuple[str, Optional[type]], ...]:
+    """
+    The init fields of a dataclass with their type when that is a dataclass too, resolved once per type.
+    """
+    hints = typing.get_type_hints(struct_type)
+    return tuple((field.name, hints.get(field.name) if _is_dataclass_type(hints.get(field.name)) else None)
+                 for field in dataclasses.fields(struct_type) if field.init)
+
+
+def _is_dataclass_type(struct_type) -> bool:
+    return isinstance(struct_type, type) and dataclasses.is_dataclass(struct_type)
+
+
+def _to_dataclass(value: Any, struct_type: type):
+    if not isinstance(value, dict):
+        raise ValueError(f"Expected an object for {struct_type.__name__}, got {type(value).__name__}!")
+    arguments = {}
+    for name, nested_type in _init_fields(struct_type):
+        if name not in value:
+            continue
+        field_value = value[name]
+        if nested_type is not None and field_value is not None:
+            field_value = _to_dataclass(field_value, nested_type)
+        arguments[name] = field_value
+    try:
+        return struct_type(**arguments)
+    except TypeError as error:
+        raise ValueError(f"Payload does not match {struct_type.__name__}: {error}!") from error
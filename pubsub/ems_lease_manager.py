@@ -0,0 +1,192 @@
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+LOGGER = logging.getLogger(__name__)
+
+MIN_ACK_DEADLINE_SECONDS = 10
+MAX_ACK_DEADLINE_SECONDS = 600
+HISTOGRAM_WINDOW_SECONDS = 60
+HISTOGRAM_WINDOW_COUNT = 10
+
+
+class EmsProcessingTimeHistogram:
+    """
+    Counts processing times in whole seconds, clamped to the ack deadline range Pub/Sub accepts. Only the
+    observations of the last window_count windows of window_seconds are kept, so the percentiles follow the
+    current processing times instead of every time ever observed.
+    """
+
+    def __init__(self,
+                 min_seconds: int = MIN_ACK_DEADLINE_SECONDS,
+                 max_seconds: int = MAX_ACK_DEADLINE_SECONDS,
+                 window_seconds: float = HISTOGRAM_WINDOW_SECONDS,
+                 window_count: int = HISTOGRAM_WINDOW_COUNT):
+        if window_seconds <= 0 or window_count < 1:
+            raise ValueError("Histogram needs a positive window_seconds and at least one window!")
+        self.__min_seconds = min_seconds
+        self.__max_seconds = max_seconds
+        self.__window_seconds = window_seconds
+        self.__window_count = window_count
+        self.__windows = deque()
+
+    def __len__(self) -> int:
+        return sum(sum(counts.values()) for counts in self.__current_windows())
+
+    def add(self, seconds: float) -> None:
+        window = self.__current_window()
+        self.__expire(window)
+        if not self.__windows or self.__windows[-1][0] != window:
+            self.__windows.append((window, defaultdict(int)))
+        self.__windows[-1][1][min(max(int(math.ceil(seconds)), self.__min_seconds), self.__max_seconds)] += 1
+
+    def percentile(self, percent: float) -> int:
+        counts = defaultdict(int)
+        for window_counts in self.__current_windows():
+            for seconds, count in window_counts.items():
+                counts[seconds] += count
+        total = sum(counts.values())
+        if total == 0:
+            return self.__min_seconds
+        target = total * (100 - percent) / 100
+        seen = 0
+        for seconds in sorted(counts, reverse=True):
+            seen += counts[seconds]
+            if seen >= target:
+                return seconds
+        return self.__min_seconds
+
+    def __current_windows(self) -> List[Dict[int, int]]:
+        self.__expire(self.__current_window())
+        return [counts for _, counts in self.__windows]
+
+    def __current_window(self) -> int:
+        return int(time.monotonic() // self.__window_seconds)
+
+    def __expire(self, window: int) -> None:
+        while self.__windows and self.__windows[0][0] <= window - self.__window_count:
+            self.__windows.popleft()
+
+
+@dataclass
+class _Lease:
+    subscription: str
+    leased_at: float
+    expires_at: float
+
+
+# the leases, their histogram and the renewal thread share one condition, splitting them up would not make it simpler
+class EmsLeaseManager:  # pylint: disable=too-many-instance-attributes
+    """
+    Keeps extending the ack deadline of pulled messages until they are acked or nacked, at most for
+    max_lease_duration seconds. The deadline is the p99 of the processing times observed in the last ten minutes,
+    so short handlers get short leases and a crashed consumer's messages are redelivered quickly, while slow
+    handlers are not interrupted by redeliveries. Leases are renewed when half of their deadline passed, the
+    renewals that are due together are sent in one modify_ack_deadline call per subscription. The ack ids of
+    leases dropped at max_lease_duration are passed to on_expire.
+    """
+
+    def __init__(self,
+                 modify_ack_deadline: Callable[[str, List[str], int], None],
+                 max_lease_duration: float = 3600,
+                 on_expire: Callable[[List[str]], None] = None):
+        self.__modify_ack_deadline = modify_ack_deadline
+        self.__max_lease_duration = max_lease_duration
+        self.__on_expire = on_expire
+        self.__histogram = EmsProcessingTimeHistogram()
+        self.__leases: Dict[str, _Lease] = {}
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__closed = False
+
+    @property
+    def ack_deadline_seconds(self) -> int:
+        with self.__condition:
+            return self.__histogram.percentile(99)
+
+    @property
+    def leased_count(self) -> int:
+        return len(self.__leases)
+
+    def lease(self, subscription: str, ack_ids: List[str]) -> None:
+        if not ack_ids:
+            return
+        deadline = self.ack_deadline_seconds
+        now = time.monotonic()
+        with self.__condition:
+            for ack_id in ack_ids:
+                self.__leases[ack_id] = _Lease(subscription, now, now + deadline)
+            self.__start()
+            self.__condition.notify_all()
+        self.__send(subscription, ack_ids, deadline)
+
+    def release(self, ack_ids: List[str], record_processing_time: bool = True) -> None:
+        now = time.monotonic()
+        with self.__condition:
+            for ack_id in ack_ids:
+                lease = self.__leases.pop(ack_id, None)
+                if lease is not None and record_processing_time:
+                    self.__histogram.add(now - lease.leased_at)
+
+    def extend_due_leases(self) -> float:
+        """
+        Renews the leases whose deadline is more than half over and returns the seconds until the next renewal.
+        """
+        deadline = self.ack_deadline_seconds
+        now = time.monotonic()
+        due = defaultdict(list)
+        expired = []
+        with self.__condition:
+            for ack_id, lease in list(self.__leases.items()):
+                if now - lease.leased_at >= self.__max_lease_duration:
+                    LOGGER.warning("Lease of message %s reached %s seconds, not extending it further",
+                                   ack_id, self.__max_lease_duration)
+                    del self.__leases[ack_id]
+                    expired.append(ack_id)
+                elif lease.expires_at - now <= deadline / 2:
+                    lease.expires_at = now + deadline
+                    due[lease.subscription].append(ack_id)
+            wait_seconds = min((lease.expires_at - now - deadline / 2 for lease in self.__leases.values()),
+                               default=deadline / 2)
+        for subscription, ack_ids in due.items():
+            self.__send(subscription, ack_ids, deadline)
+        if expired and self.__on_expire is not None:
+            self.__on_expire(expired)
+        return max(wait_seconds, 0.1)
+
+    def close(self) -> None:
+        """
+        Stops extending leases and waits for the background thread to finish.
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__leases.clear()
+            self.__condition.notify_all()
+            thread = self.__thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def __start(self) -> None:
+        if self.__thread is None and not self.__closed:
+            self.__thread = threading.Thread(target=self.__maintain_leases, name="ems-lease-manager", daemon=True)
+            self.__thread.start()
+
+    def __maintain_leases(self) -> None:
+        while True:
+            wait_seconds = self.extend_due_leases()
+            with self.__condition:
+                if self.__closed:
+                    return
+                self.__condition.wait(wait_seconds)
+                if self.__closed:
+                    return
+
+    def __send(self, subscription: str, ack_ids: List[str], deadline: int) -> None:
+        try:
+            self.__modify_ack_deadline(subscription, ack_ids, deadline)
+        except Exception as error:
+            LOGGER.error("Extending the lease of %s messages on %s failed: %s", len(ack_ids), subscription, error)
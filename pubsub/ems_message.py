@@ -1,25 +1,60 @@
-import json
-from typing import Dict
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Type, TypeVar
+
+from pubsub.ems_compression import CONTENT_ENCODING_ATTRIBUTE, decompress
+from pubsub.ems_json_decoder import decode_as, get_json_decoder
+
+if TYPE_CHECKING:
+    from google.cloud.pubsub_v1.subscriber.message import Message
+
+T = TypeVar("T")
 
 
 class EmsMessage:
+    __slots__ = ("__data", "__payload", "__raw_data", "__attributes", "__ack_id", "__message_id", "__publish_time")
 
-    def __init__(self, ack_id: str, data: bytes, attributes: Dict[str, str]):
+    # the arguments are the fields of a received Pub/Sub message
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 ack_id: str,
+                 data: bytes,
+                 attributes: Dict[str, str],
+                 message_id: str = None,
+                 publish_time: datetime = None):
         self.__data = None
+        self.__payload = None
         self.__raw_data = data
         self.__attributes = attributes
         self.__ack_id = ack_id
+        self.__message_id = message_id
+        self.__publish_time = publish_time
+
+    @staticmethod
+    def from_subscriber_message(message: "Message") -> "EmsMessage":
+        return EmsMessage(message.ack_id, message.data, dict(message.attributes), message.message_id,
+                          message.publish_time)
 
     @property
     def data_json(self):
         if self.__data is None:
-            self.__data = json.loads(self.__raw_data)
+            self.__data = get_json_decoder()(self.data_raw)
 
         return self.__data
 
+    def data_as(self, struct_type: Type[T]) -> T:
+        """
+        Decodes the payload into a dataclass or msgspec.Struct, see pubsub.ems_json_decoder.decode_as.
+        """
+        return decode_as(self.data_raw, struct_type, self.__data)
+
     @property
     def data_raw(self):
-        return self.__raw_data
+        """
+        The payload, decompressed on first access if it was published compressed by EmsPublisherClient.
+        """
+        if self.__payload is None:
+            content_encoding = self.__attributes.get(CONTENT_ENCODING_ATTRIBUTE) if self.__attributes else None
+            self.__payload = decompress(self.__raw_data, content_encoding)
+        return self.__payload
 
     @property
     def attributes(self) -> Dict[str, str]:
@@ -28,3 +63,11 @@ class EmsMessage:
     @property
     def ack_id(self) -> str:
         return self.__ack_id
+
+    @property
+    def message_id(self) -> str:
+        return self.__message_id
+
+    @property
+    def publish_time(self) -> datetime:
+        return self.__publish_time
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, List
+
+from pubsub.ems_deduplicator import EmsDeduplicator
+from pubsub.ems_message import EmsMessage
+
+if TYPE_CHECKING:
+    from google.cloud.pubsub_v1.subscriber.message import Message
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_WAIT_SECONDS = 5.0
+
+
+class EmsMessageBatchSettings:
+    """
+    Batches have at most max_messages messages and max_bytes bytes, a batch is also closed max_wait seconds after
+    its first message arrived, so a partial batch is not held until its messages are redelivered.
+    """
+
+    def __init__(self, max_messages: int, max_bytes: int = None, max_wait: float = DEFAULT_MAX_WAIT_SECONDS):
+        if max_messages < 1:
+            raise ValueError("max_messages must be at least 1!")
+        if max_wait is None or max_wait <= 0:
+            raise ValueError("max_wait must be positive, partial batches would never be delivered otherwise!")
+        self.__max_messages = max_messages
+        self.__max_bytes = max_bytes
+        self.__max_wait = max_wait
+
+    @property
+    def max_messages(self) -> int:
+        return self.__max_messages
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def max_wait(self) -> float:
+        return self.__max_wait
+
+
+# the open batch shares its state and locks with the max_wait thread, splitting it up would not make it simpler
+class EmsMessageBatcher:  # pylint: disable=too-many-instance-attributes
+    """
+    Collects streaming pull messages into batches limited by EmsMessageBatchSettings. Batches are handed to
+    batch_callback one at a time; if it returns, every message of the batch is acked, if it raises, every message is
+    nacked. Until then the messages stay leased by the streaming pull, which keeps extending their ack deadline.
+    """
+
+    def __init__(self,
+                 batch_callback: Callable[[List[EmsMessage]], None],
+                 batch_settings: EmsMessageBatchSettings,
+                 deduplicator: EmsDeduplicator = None):
+        self.__batch_callback = batch_callback
+        self.__max_messages = batch_settings.max_messages
+        self.__max_bytes = batch_settings.max_bytes
+        self.__max_wait = batch_settings.max_wait
+        self.__deduplicator = deduplicator
+        self.__condition = threading.Condition()
+        self.__callback_lock = threading.Lock()
+        self.__messages = []
+        self.__bytes = 0
+        self.__opened_at = None
+        self.__closed = False
+        self.__timer = threading.Thread(target=self.__flush_expired_batches, daemon=True)
+        self.__timer.start()
+
+    def add(self, message: "Message") -> None:
+        if self.__deduplicator is not None and \
+                self.__deduplicator.is_duplicate(EmsMessage.from_subscriber_message(message)):
+            message.ack()
+            return
+        with self.__condition:
+            if self.__closed:
+                message.nack()
+                return
+            if not self.__messages:
+                self.__opened_at = time.monotonic()
+                self.__condition.notify_all()
+            self.__messages.append(message)
+            self.__bytes += message.size
+            full = len(self.__messages) >= self.__max_messages or \
+                (self.__max_bytes is not None and self.__bytes >= self.__max_bytes)
+            batch = self.__take_batch() if full else None
+        if batch:
+            self.__deliver(batch)
+
+    def flush(self) -> None:
+        with self.__condition:
+            batch = self.__take_batch()
+        if batch:
+            self.__deliver(batch)
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__closed = True
+            batch = self.__take_batch()
+            self.__condition.notify_all()
+        for message in batch:
+            message.nack()
+
+    def __take_batch(self) -> list:
+        batch = self.__messages
+        self.__messages = []
+        self.__bytes = 0
+        self.__opened_at = None
+        return batch
+
+    def __deliver(self, batch: list) -> None:
+        with self.__callback_lock:
+            ems_messages = [EmsMessage.from_subscriber_message(message) for message in batch]
+            try:
+                self.__batch_callback(ems_messages)
+            except Exception:
+                LOGGER.exception("Batch callback failed, nacking %s messages", len(batch))
+                for message in batch:
+                    message.nack()
+                return
+        for ems_message, message in zip(ems_messages, batch):
+            if self.__deduplicator is not None:
+                self.__deduplicator.remember(ems_message)
+            message.ack()
+
+    def __flush_expired_batches(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__closed and self.__opened_at is None:
+                    self.__condition.wait()
+                if self.__closed:
+                    return
+                remaining = self.__opened_at + self.__max_wait - time.monotonic()
+                if remaining > 0:
+                    self.__condition.wait(remaining)
+                    continue
+                batch = self.__take_batch()
+            self.__deliver(batch)
@@ -0,0 +1,107 @@
+import threading
+from enum import Enum
+
+
+class EmsFlowControlBehavior(Enum):
+    BLOCK = "BLOCK"
+    ERROR = "ERROR"
+    DROP = "DROP"
+
+
+class EmsPublishFlowControl:
+    """
+    Flow control settings of EmsPublisherClient, see EmsPublishFlowController. None means no limit.
+    """
+
+    def __init__(self,
+                 max_messages: int = None,
+                 max_bytes: int = None,
+                 behavior: EmsFlowControlBehavior = EmsFlowControlBehavior.BLOCK):
+        self.__max_messages = max_messages
+        self.__max_bytes = max_bytes
+        self.__behavior = behavior
+
+    @property
+    def max_messages(self) -> int:
+        return self.__max_messages
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def behavior(self) -> EmsFlowControlBehavior:
+        return self.__behavior
+
+
+class EmsPublishFlowController:
+    """
+    Bounds the messages and bytes handed to the publisher but not yet acknowledged by Pub/Sub. A message that does
+    not fit either waits for room (BLOCK), is rejected with FlowControlLimitExceededError (ERROR) or is discarded
+    (DROP). A single message larger than max_bytes is let through once nothing else is outstanding.
+    """
+
+    def __init__(self,
+                 max_messages: int = None,
+                 max_bytes: int = None,
+                 behavior: EmsFlowControlBehavior = EmsFlowControlBehavior.BLOCK):
+        self.__max_messages = max_messages
+        self.__max_bytes = max_bytes
+        self.__behavior = behavior
+        self.__condition = threading.Condition()
+        self.__outstanding_messages = 0
+        self.__outstanding_bytes = 0
+        self.__dropped_messages = 0
+
+    @property
+    def outstanding_messages(self) -> int:
+        return self.__outstanding_messages
+
+    @property
+    def outstanding_bytes(self) -> int:
+        return self.__outstanding_bytes
+
+    @property
+    def dropped_messages(self) -> int:
+        return self.__dropped_messages
+
+    def acquire(self, size: int) -> bool:
+        """
+        Returns False if the message has to be dropped.
+        """
+        with self.__condition:
+            if not self.__has_room(size):
+                if self.__behavior == EmsFlowControlBehavior.ERROR:
+                    raise FlowControlLimitExceededError(
+                        f"Publisher flow control limit exceeded with {self.__outstanding_messages} messages "
+                        f"and {self.__outstanding_bytes} bytes outstanding!")
+                if self.__behavior == EmsFlowControlBehavior.DROP:
+                    self.__dropped_messages += 1
+                    return False
+                self.__condition.wait_for(lambda: self.__has_room(size))
+            self.__outstanding_messages += 1
+            self.__outstanding_bytes += size
+            return True
+
+    def release(self, size: int) -> None:
+        with self.__condition:
+            self.__outstanding_messages -= 1
+            self.__outstanding_bytes -= size
+            self.__condition.notify_all()
+
+    def __has_room(self, size: int) -> bool:
+        if self.__outstanding_messages == 0:
+            return True
+        if self.__max_messages is not None and self.__outstanding_messages + 1 > self.__max_messages:
+            return False
+        if self.__max_bytes is not None and self.__outstanding_bytes + size > self.__max_bytes:
+            return False
+        return True
+
+
+class FlowControlLimitExceededError(Exception):
+    pass
+
+
+class MessageDroppedError(Exception):
+    pass
@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import Future
+from typing import List, Optional
+
+
+class EmsPublishResult:
+
+    def __init__(self, message_id: str = None, error: BaseException = None):
+        self.__message_id = message_id
+        self.__error = error
+
+    @property
+    def message_id(self) -> Optional[str]:
+        return self.__message_id
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self.__error
+
+    @property
+    def is_failed(self) -> bool:
+        return self.__error is not None
+
+
+class EmsPublishManyFuture(Future):
+    """
+    Completes once every message given to publish_many is either published or failed. The result is the list of
+    EmsPublishResults in the order of the messages, a failed message does not fail the whole future.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.__lock = threading.Lock()
+        self.__results = []
+        self.__pending = 0
+        self.__failed = 0
+        self.__sealed = False
+
+    @property
+    def published_count(self) -> int:
+        with self.__lock:
+            return sum(1 for result in self.__results if result is not None) - self.__failed
+
+    @property
+    def failed_count(self) -> int:
+        with self.__lock:
+            return self.__failed
+
+    def add(self, message_future: Future) -> None:
+        with self.__lock:
+            index = len(self.__results)
+            self.__results.append(None)
+            self.__pending += 1
+        message_future.add_done_callback(lambda future: self.__on_message_done(index, future))
+
+    def add_result(self, result: EmsPublishResult) -> None:
+        with self.__lock:
+            self.__results.append(result)
+            if result.is_failed:
+                self.__failed += 1
+
+    def seal(self) -> None:
+        with self.__lock:
+            self.__sealed = True
+            completed = self.__pending == 0
+        if completed:
+            self.__complete()
+
+    def __on_message_done(self, index: int, message_future: Future) -> None:
+        error = message_future.exception()
+        result = EmsPublishResult(error=error) if error is not None else EmsPublishResult(message_future.result())
+        with self.__lock:
+            self.__results[index] = result
+            self.__pending -= 1
+            if error is not None:
+                self.__failed += 1
+            completed = self.__sealed and self.__pending == 0
+        if completed:
+            self.__complete()
+
+    def __complete(self) -> None:
+        results: List[EmsPublishResult] = list(self.__results)
+        self.set_result(results)
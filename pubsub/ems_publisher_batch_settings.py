@@ -0,0 +1,31 @@
+class EmsPublisherBatchSettings:
+    """
+    Batching of EmsPublisherClient, settings left as None keep the client library defaults (100 messages, 1 MB,
+    10 ms). With enable_message_ordering, messages of the same ordering key are batched and delivered in order.
+    """
+
+    def __init__(self,
+                 max_messages: int = None,
+                 max_bytes: int = None,
+                 max_latency: float = None,
+                 enable_message_ordering: bool = False):
+        self.__max_messages = max_messages
+        self.__max_bytes = max_bytes
+        self.__max_latency = max_latency
+        self.__enable_message_ordering = enable_message_ordering
+
+    @property
+    def max_messages(self) -> int:
+        return self.__max_messages
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def max_latency(self) -> float:
+        return self.__max_latency
+
+    @property
+    def enable_message_ordering(self) -> bool:
+        return self.__enable_message_ordering
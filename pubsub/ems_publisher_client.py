@@ -1,19 +1,152 @@
 import logging
 from concurrent.futures import Future
+from typing import Dict, Iterable, Tuple, Union
 
 from google.api_core.exceptions import AlreadyExists, NotFound
 from google.cloud.pubsub_v1 import PublisherClient, SubscriberClient
+from google.cloud.pubsub_v1.types import BatchSettings, PublisherOptions
+
+from pubsub.ems_compression import CONTENT_ENCODING_ATTRIBUTE, EmsCompression, EmsCompressionSettings, \
+    check_compression_dependencies, compress
+from pubsub.ems_publish_flow_control import EmsPublishFlowControl, EmsPublishFlowController, MessageDroppedError
+from pubsub.ems_publish_future import EmsPublishManyFuture, EmsPublishResult
+from pubsub.ems_publisher_batch_settings import EmsPublisherBatchSettings
+from pubsub.ems_schema_registry import EmsSchemaRegistry
 
 LOGGER = logging.getLogger(__name__)
 
 
 class EmsPublisherClient:
 
-    def __init__(self):
-        self.__client = PublisherClient()
+    def __init__(self,
+                 batch_settings: EmsPublisherBatchSettings = None,
+                 flow_control: EmsPublishFlowControl = None,
+                 compression: EmsCompressionSettings = None,
+                 schema_registry: EmsSchemaRegistry = None):
+        """
+        Flow control limits the messages and bytes published but not yet acknowledged by Pub/Sub, by default
+        without limits. With compression, large payloads are compressed and marked with the ems-content-encoding
+        attribute, EmsMessage decompresses them on the subscriber side. A payload that would not shrink is
+        published as it is. schema_registry serves the schemas of publish_records, a new one is created if it is not
+        given.
+        """
+        batch_settings = batch_settings or EmsPublisherBatchSettings()
+        flow_control = flow_control or EmsPublishFlowControl()
+        self.__compression_settings = compression or EmsCompressionSettings()
+        check_compression_dependencies(self.__compression_settings.compression)
+        self.__schema_registry = schema_registry or EmsSchemaRegistry()
+        self.__topic_schemas = {}
+        self.__flow_controller = EmsPublishFlowController(flow_control.max_messages,
+                                                          flow_control.max_bytes,
+                                                          flow_control.behavior)
+        library_batch_settings = {"max_messages": batch_settings.max_messages,
+                                  "max_bytes": batch_settings.max_bytes,
+                                  "max_latency": batch_settings.max_latency}
+        self.__batch_settings = BatchSettings(**{key: value for key, value in library_batch_settings.items()
+                                                 if value is not None})
+        self.__publisher_options = PublisherOptions(enable_message_ordering=batch_settings.enable_message_ordering)
+        self.__client = PublisherClient(batch_settings=self.__batch_settings,
+                                        publisher_options=self.__publisher_options)
+
+    @property
+    def batch_settings(self) -> BatchSettings:
+        return self.__batch_settings
+
+    @property
+    def publisher_options(self) -> PublisherOptions:
+        return self.__publisher_options
+
+    @property
+    def outstanding_messages(self) -> int:
+        return self.__flow_controller.outstanding_messages
+
+    @property
+    def outstanding_bytes(self) -> int:
+        return self.__flow_controller.outstanding_bytes
+
+    @property
+    def dropped_messages(self) -> int:
+        return self.__flow_controller.dropped_messages
+
+    @property
+    def compression(self) -> EmsCompression:
+        return self.__compression_settings.compression
+
+    @property
+    def schema_registry(self) -> EmsSchemaRegistry:
+        return self.__schema_registry
 
     def publish(self, topic: str, data: bytes, **attrs) -> Future:
-        return self.__client.publish(topic=topic, data=data, **attrs)
+        return self.__publish(topic, *self.__compress(data, attrs))
+
+    def __publish(self, topic: str, data: bytes, attrs: dict) -> Future:
+        size = len(data) + sum(len(key) + len(value) for key, value in attrs.items())
+        if not self.__flow_controller.acquire(size):
+            dropped = Future()
+            dropped.set_exception(MessageDroppedError("Message dropped by publisher flow control!"))
+            return dropped
+        try:
+            future = self.__client.publish(topic=topic, data=data, **attrs)
+        except Exception:
+            self.__flow_controller.release(size)
+            raise
+        future.add_done_callback(lambda _: self.__flow_controller.release(size))
+        return future
+
+    def publish_many(self,
+                     topic: str,
+                     messages: Iterable[Union[bytes, Tuple[bytes, Dict[str, str]]]]) -> EmsPublishManyFuture:
+        """
+        messages are either payloads or (payload, attributes) tuples, they are handed to the client library's
+        batching one by one while the iterable is consumed.
+        """
+        return self.__publish_many(topic, messages, compress_payloads=True)
+
+    def publish_records(self, topic: str, records: Iterable, **attrs) -> EmsPublishManyFuture:
+        """
+        Encodes records with the schema and encoding of the topic, dicts for Avro, message instances or dicts for
+        protobuf, see EmsSchemaRegistry. The topic settings and the schema are fetched once, the records are
+        encoded in one pass and published uncompressed, as Pub/Sub validates them against the schema.
+        """
+        schema_name, encoding = self.__get_topic_schema(topic)
+        payloads = self.__schema_registry.encode_many(schema_name, records, encoding)
+        return self.__publish_many(topic, ((payload, attrs) for payload in payloads), compress_payloads=False)
+
+    def __publish_many(self,
+                       topic: str,
+                       messages: Iterable[Union[bytes, Tuple[bytes, Dict[str, str]]]],
+                       compress_payloads: bool) -> EmsPublishManyFuture:
+        aggregate_future = EmsPublishManyFuture()
+        for message in messages:
+            data, attributes = message if isinstance(message, tuple) else (message, {})
+            try:
+                if compress_payloads:
+                    data, attributes = self.__compress(data, attributes)
+                aggregate_future.add(self.__publish(topic, data, attributes))
+            except Exception as error:
+                # e.g. a stopped publisher, the error belongs to this message and the batch goes on
+                aggregate_future.add_result(EmsPublishResult(error=error))
+        aggregate_future.seal()
+        return aggregate_future
+
+    def __get_topic_schema(self, topic: str) -> Tuple[str, str]:
+        if topic not in self.__topic_schemas:
+            schema_settings = self.__client.api.get_topic(request={"topic": topic}).schema_settings
+            if not schema_settings.schema:
+                raise ValueError(f"Topic {topic} has no schema!")
+            self.__topic_schemas[topic] = (schema_settings.schema, schema_settings.encoding.name)
+        return self.__topic_schemas[topic]
+
+    def __compress(self, data: bytes, attrs: dict) -> Tuple[bytes, dict]:
+        compression = self.__compression_settings.compression
+        if compression == EmsCompression.NONE or len(data) < self.__compression_settings.threshold_bytes:
+            return data, attrs
+        if CONTENT_ENCODING_ATTRIBUTE in attrs:
+            raise ValueError(f"{CONTENT_ENCODING_ATTRIBUTE} attribute is reserved for compressed messages!")
+        compressed = compress(data, compression)
+        if len(compressed) >= len(data):
+            return data, attrs
+        return compressed, {**attrs, CONTENT_ENCODING_ATTRIBUTE: compression.value}
 
     def topic_create_if_not_exists(self, project_id: str, topic_name: str):
         topic_path = self.__client.api.topic_path(project_id, topic_name)
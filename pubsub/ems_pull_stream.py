@@ -0,0 +1,161 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterator, List, Union
+
+from google.api_core.exceptions import DeadlineExceeded
+
+from pubsub.ems_message import EmsMessage
+
+if TYPE_CHECKING:
+    from pubsub.ems_subscriber_client import EmsSubscriberClient
+
+LOGGER = logging.getLogger(__name__)
+
+
+# the pull threads, the ack thread and their shared queue and batch make up the state of one stream
+class EmsPullStream:  # pylint: disable=too-many-instance-attributes
+    """
+    Iterator over the messages of a subscription, fed by pulls_in_flight pull requests running in parallel.
+
+    Messages are acked through ack(), the ack ids are collected and sent in the background in requests of at most
+    ack_batch_size ids, at latest ack_max_delay seconds after the first one was collected. close() stops pulling,
+    sends the collected acks and nacks the messages that were pulled but not yielded yet.
+    """
+
+    # the subscription to pull from and the pull and ack batching options
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 subscriber: "EmsSubscriberClient",
+                 subscription: str,
+                 max_messages_per_pull: int = 100,
+                 pulls_in_flight: int = 4,
+                 ack_batch_size: int = 1000,
+                 ack_max_delay: float = 0.5):
+        if pulls_in_flight < 1:
+            raise ValueError("pulls_in_flight must be at least 1!")
+        self.__subscriber = subscriber
+        self.__subscription = subscription
+        self.__max_messages_per_pull = max_messages_per_pull
+        self.__ack_batch_size = ack_batch_size
+        self.__ack_max_delay = ack_max_delay
+        self.__messages = queue.Queue(maxsize=pulls_in_flight * max_messages_per_pull)
+        self.__closed = threading.Event()
+        self.__ack_condition = threading.Condition()
+        self.__ack_ids = []
+        self.__first_ack_at = None
+
+        self.__ack_thread = threading.Thread(target=self.__send_acks, daemon=True)
+        self.__ack_thread.start()
+        self.__pull_executor = ThreadPoolExecutor(max_workers=pulls_in_flight)
+        for _ in range(pulls_in_flight):
+            self.__pull_executor.submit(self.__pull_continuously)
+
+    def __iter__(self) -> Iterator[EmsMessage]:
+        return self
+
+    def __next__(self) -> EmsMessage:
+        while True:
+            if self.__closed.is_set():
+                raise StopIteration
+            try:
+                item = self.__messages.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if isinstance(item, Exception):
+                self.close()
+                raise item
+            return item
+
+    def ack(self, message: Union[EmsMessage, str]) -> None:
+        ack_id = message.ack_id if isinstance(message, EmsMessage) else message
+        with self.__ack_condition:
+            if not self.__ack_ids:
+                self.__first_ack_at = time.monotonic()
+            self.__ack_ids.append(ack_id)
+            if len(self.__ack_ids) >= self.__ack_batch_size or len(self.__ack_ids) == 1:
+                self.__ack_condition.notify_all()
+
+    def close(self) -> None:
+        if self.__closed.is_set():
+            return
+        self.__closed.set()
+        with self.__ack_condition:
+            self.__ack_condition.notify_all()
+        self.__pull_executor.shutdown(wait=True)
+        self.__ack_thread.join()
+        self.__nack_unyielded_messages()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __pull_continuously(self) -> None:
+        while not self.__closed.is_set():
+            try:
+                messages = list(self.__subscriber.pull(self.__subscription, self.__max_messages_per_pull))
+            except DeadlineExceeded:
+                continue
+            except Exception as error:
+                LOGGER.error("Pulling from %s failed: %s", self.__subscription, error)
+                self.__put(error)
+                return
+            for index, message in enumerate(messages):
+                if not self.__put(message):
+                    self.__nack([message.ack_id for message in messages[index:]])
+                    return
+
+    def __put(self, item) -> bool:
+        while not self.__closed.is_set():
+            try:
+                self.__messages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __send_acks(self) -> None:
+        while True:
+            with self.__ack_condition:
+                while not self.__closed.is_set() and not self.__is_ack_batch_ready():
+                    timeout = None if self.__first_ack_at is None \
+                        else self.__first_ack_at + self.__ack_max_delay - time.monotonic()
+                    self.__ack_condition.wait(timeout)
+                closed = self.__closed.is_set()
+                batch_size = len(self.__ack_ids) if closed else self.__ack_batch_size
+                ack_ids = self.__ack_ids[:batch_size]
+                self.__ack_ids = self.__ack_ids[batch_size:]
+                self.__first_ack_at = time.monotonic() if self.__ack_ids else None
+            for start in range(0, len(ack_ids), self.__ack_batch_size):
+                self.__acknowledge(ack_ids[start:start + self.__ack_batch_size])
+            if closed:
+                return
+
+    def __is_ack_batch_ready(self) -> bool:
+        if len(self.__ack_ids) >= self.__ack_batch_size:
+            return True
+        return self.__first_ack_at is not None and time.monotonic() - self.__first_ack_at >= self.__ack_max_delay
+
+    def __acknowledge(self, ack_ids: List[str]) -> None:
+        try:
+            self.__subscriber.acknowledge(self.__subscription, ack_ids)
+        except Exception as error:
+            LOGGER.error("Acknowledging %s messages on %s failed: %s", len(ack_ids), self.__subscription, error)
+
+    def __nack_unyielded_messages(self) -> None:
+        ack_ids = []
+        while True:
+            try:
+                item = self.__messages.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, EmsMessage):
+                ack_ids.append(item.ack_id)
+        self.__nack(ack_ids)
+
+    def __nack(self, ack_ids: List[str]) -> None:
+        if ack_ids:
+            self.__subscriber.modify_ack_deadline(self.__subscription, ack_ids, 0)
@@ -0,0 +1,193 @@
+import io
+import json
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from google.protobuf import json_format
+from google.pubsub_v1 import SchemaServiceClient
+from google.pubsub_v1.types import Schema
+
+from pubsub.ems_message import EmsMessage
+
+try:
+    import fastavro
+except ImportError:  # fastavro is the optional avro extra
+    fastavro = None
+
+SCHEMA_NAME_ATTRIBUTE = "googclient_schemaname"
+SCHEMA_ENCODING_ATTRIBUTE = "googclient_schemaencoding"
+SCHEMA_REVISION_ID_ATTRIBUTE = "googclient_schemarevisionid"
+
+BINARY = "BINARY"
+JSON = "JSON"
+
+MISSING_AVRO_MESSAGE = "Avro schemas need fastavro, install ems-gcp-toolkit[avro]!"
+
+_PROTOBUF_MESSAGE_PATTERN = re.compile(r"^\s*message\s+(\w+)", re.MULTILINE)
+
+
+class EmsSchemaCodec(ABC):
+    """
+    Encodes records to and decodes them from message payloads with one schema and encoding (BINARY or JSON).
+    The *_many methods handle a whole batch with the schema prepared only once.
+    """
+
+    def __init__(self, encoding: str):
+        if encoding not in (BINARY, JSON):
+            raise ValueError(f"Unsupported schema encoding: {encoding}!")
+        self._encoding = encoding
+
+    @property
+    def encoding(self) -> str:
+        return self._encoding
+
+    def encode(self, record) -> bytes:
+        return self.encode_many([record])[0]
+
+    def decode(self, payload: bytes):
+        return self.decode_many([payload])[0]
+
+    @abstractmethod
+    def encode_many(self, records: Iterable) -> List[bytes]:
+        pass
+
+    @abstractmethod
+    def decode_many(self, payloads: Iterable[bytes]) -> list:
+        pass
+
+
+class EmsAvroCodec(EmsSchemaCodec):
+    """
+    Records are dicts, the definition is the Avro schema JSON of the Pub/Sub schema resource.
+    """
+
+    def __init__(self, definition: str, encoding: str = BINARY):
+        super().__init__(encoding)
+        if fastavro is None:
+            raise ImportError(MISSING_AVRO_MESSAGE)
+        self.__schema = fastavro.parse_schema(json.loads(definition))
+
+    def encode_many(self, records: Iterable[Dict[str, Any]]) -> List[bytes]:
+        if self._encoding == JSON:
+            return [self.__encode_json(record) for record in records]
+        buffer = io.BytesIO()
+        payloads = []
+        for record in records:
+            fastavro.schemaless_writer(buffer, self.__schema, record)
+            payloads.append(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+        return payloads
+
+    def decode_many(self, payloads: Iterable[bytes]) -> List[Dict[str, Any]]:
+        if self._encoding == JSON:
+            return [next(fastavro.json_reader(io.StringIO(payload.decode("utf-8")), self.__schema))
+                    for payload in payloads]
+        return [fastavro.schemaless_reader(io.BytesIO(payload), self.__schema, None)
+                for payload in payloads]
+
+    def __encode_json(self, record: Dict[str, Any]) -> bytes:
+        buffer = io.StringIO()
+        fastavro.json_writer(buffer, self.__schema, [record])
+        return buffer.getvalue().strip().encode("utf-8")
+
+
+class EmsProtobufCodec(EmsSchemaCodec):
+    """
+    Records are instances of message_class or dicts of its fields, decoding returns message_class instances.
+    """
+
+    def __init__(self, message_class: type, encoding: str = BINARY):
+        super().__init__(encoding)
+        self.__message_class = message_class
+
+    def encode_many(self, records: Iterable) -> List[bytes]:
+        messages = [self.__message_class(**record) if isinstance(record, dict) else record for record in records]
+        if self._encoding == JSON:
+            return [json_format.MessageToJson(message).encode("utf-8") for message in messages]
+        return [message.SerializeToString() for message in messages]
+
+    def decode_many(self, payloads: Iterable[bytes]) -> list:
+        if self._encoding == JSON:
+            return [json_format.Parse(payload, self.__message_class()) for payload in payloads]
+        return [self.__message_class.FromString(payload) for payload in payloads]
+
+
+class EmsSchemaRegistry:
+    """
+    Fetches Pub/Sub schema resources once and caches them together with their codecs.
+
+    Protobuf definitions are not compiled at runtime, the generated message classes have to be passed in
+    protobuf_message_classes; the class whose name matches the top-level message of a definition is used for it.
+    """
+
+    def __init__(self, schema_client: SchemaServiceClient = None, protobuf_message_classes: Iterable[type] = ()):
+        self.__schema_client = schema_client
+        self.__protobuf_message_classes = {message_class.DESCRIPTOR.name: message_class
+                                           for message_class in protobuf_message_classes}
+        self.__lock = threading.Lock()
+        self.__schemas: Dict[str, Schema] = {}
+        self.__codecs: Dict[Tuple[str, str], EmsSchemaCodec] = {}
+
+    def get_schema(self, schema_name: str) -> Schema:
+        """
+        schema_name is a schema path, optionally suffixed with @<revision id>.
+        """
+        with self.__lock:
+            if schema_name not in self.__schemas:
+                if self.__schema_client is None:
+                    self.__schema_client = SchemaServiceClient()
+                self.__schemas[schema_name] = self.__schema_client.get_schema(request={"name": schema_name})
+            return self.__schemas[schema_name]
+
+    def get_codec(self, schema_name: str, encoding: str = BINARY) -> EmsSchemaCodec:
+        key = (schema_name, encoding)
+        codec = self.__codecs.get(key)
+        if codec is None:
+            codec = self.__create_codec(self.get_schema(schema_name), encoding)
+            with self.__lock:
+                codec = self.__codecs.setdefault(key, codec)
+        return codec
+
+    def encode_many(self, schema_name: str, records: Iterable, encoding: str = BINARY) -> List[bytes]:
+        return self.get_codec(schema_name, encoding).encode_many(records)
+
+    def decode_messages(self, messages: List[EmsMessage]) -> list:
+        """
+        Decodes messages by the schema attributes Pub/Sub sets on messages of topics with a schema, one pass per
+        schema revision and encoding. The records are returned in the order of the messages.
+        """
+        groups = defaultdict(list)
+        for index, message in enumerate(messages):
+            groups[self.__schema_key(message)].append(index)
+        records = [None] * len(messages)
+        for (schema_name, encoding), indices in groups.items():
+            decoded = self.get_codec(schema_name, encoding).decode_many(messages[index].data_raw for index in indices)
+            for index, record in zip(indices, decoded):
+                records[index] = record
+        return records
+
+    def __create_codec(self, schema: Schema, encoding: str) -> EmsSchemaCodec:
+        if schema.type_ == Schema.Type.AVRO:
+            return EmsAvroCodec(schema.definition, encoding)
+        if schema.type_ == Schema.Type.PROTOCOL_BUFFER:
+            match = _PROTOBUF_MESSAGE_PATTERN.search(schema.definition)
+            message_class = self.__protobuf_message_classes.get(match.group(1)) if match else None
+            if message_class is None:
+                raise ValueError(f"No protobuf message class registered for schema {schema.name}!")
+            return EmsProtobufCodec(message_class, encoding)
+        raise ValueError(f"Unsupported schema type of {schema.name}: {schema.type_}!")
+
+    @staticmethod
+    def __schema_key(message: EmsMessage) -> Tuple[str, str]:
+        attributes = message.attributes or {}
+        schema_name = attributes.get(SCHEMA_NAME_ATTRIBUTE)
+        if schema_name is None:
+            raise ValueError(f"Message {message.message_id} has no {SCHEMA_NAME_ATTRIBUTE} attribute!")
+        revision_id = attributes.get(SCHEMA_REVISION_ID_ATTRIBUTE)
+        if revision_id:
+            schema_name = f"{schema_name}@{revision_id}"
+        return schema_name, attributes.get(SCHEMA_ENCODING_ATTRIBUTE, BINARY)
@@ -1,9 +1,12 @@
-from google.cloud.pubsub_v1.subscriber.futures import StreamingPullFuture
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google.cloud.pubsub_v1.subscriber.futures import StreamingPullFuture
 
 
 class EmsStreamingFuture:
 
-    def __init__(self, streaming_pull_future: StreamingPullFuture):
+    def __init__(self, streaming_pull_future: "StreamingPullFuture"):
         self.__future = streaming_pull_future
 
     def result(self) -> str:
@@ -1,30 +1,153 @@
 import logging
-from typing import Callable, Iterator, List
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
 
 from google.api_core.exceptions import AlreadyExists, NotFound
 from google.cloud.pubsub_v1 import SubscriberClient
 from google.cloud.pubsub_v1.subscriber.message import Message
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+from google.cloud.pubsub_v1.types import FlowControl
 
+from pubsub.ems_deduplicator import EmsDeduplicator
+from pubsub.ems_lease_manager import EmsLeaseManager
+from pubsub.ems_message_batcher import EmsMessageBatcher, EmsMessageBatchSettings
+from pubsub.ems_pull_stream import EmsPullStream
+from pubsub.ems_schema_registry import EmsSchemaRegistry
 from pubsub.ems_streaming_future import EmsStreamingFuture
 from pubsub.ems_message import EmsMessage
 
 LOGGER = logging.getLogger(__name__)
 
+MAX_ACK_IDS_PER_REQUEST = 2500
+MAX_PENDING_KEYS = 100000
+
 
 class EmsSubscriberClient:
 
-    def __init__(self):
+    def __init__(self,
+                 extend_leases: bool = False,
+                 max_lease_duration: float = 3600,
+                 deduplicator: EmsDeduplicator = None,
+                 schema_registry: EmsSchemaRegistry = None):
+        """
+        With extend_leases the ack deadline of messages returned by pull is extended until they are acked or nacked
+        through this client, see EmsLeaseManager. subscribe manages leases on its own regardless of this setting.
+
+        With a deduplicator, messages it has already seen are acked and dropped before reaching any callback or
+        being returned by pull. A message is remembered once its callback returned, or once it is acknowledged
+        through this client when it came from pull. The keys of pulled messages waiting for their ack are dropped
+        when the messages are nacked or their lease expires, and at most MAX_PENDING_KEYS of them are kept: when
+        more messages are pending, the oldest ones are not remembered on ack and may be processed again.
+
+        schema_registry serves the schemas of decode_records, a new one is created if it is not given.
+        """
         self.__client = SubscriberClient()
+        self.__lease_manager = EmsLeaseManager(self.__modify_ack_deadline, max_lease_duration,
+                                               self.__pop_pending_keys) if extend_leases else None
+        self.__deduplicator = deduplicator
+        self.__pending_keys = OrderedDict()
+        self.__pending_keys_lock = threading.Lock()
+        self.__schema_registry = schema_registry or EmsSchemaRegistry()
+
+    def close(self) -> None:
+        """
+        Stops the lease manager and closes the underlying client, streaming pulls have to be cancelled before.
+        """
+        if self.__lease_manager is not None:
+            self.__lease_manager.close()
+        self.__client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
-    def subscribe(self, subscription: str, callback: Callable[[EmsMessage], None]) -> EmsStreamingFuture:
+    @property
+    def lease_manager(self) -> Optional[EmsLeaseManager]:
+        return self.__lease_manager
+
+    @property
+    def deduplicator(self) -> Optional[EmsDeduplicator]:
+        return self.__deduplicator
+
+    @property
+    def schema_registry(self) -> EmsSchemaRegistry:
+        return self.__schema_registry
+
+    def decode_records(self, messages: List[EmsMessage]) -> list:
+        """
+        Decodes messages of topics with an Avro or protobuf schema, see EmsSchemaRegistry.decode_messages.
+        """
+        return self.__schema_registry.decode_messages(messages)
+
+    # the flow control and scheduler options of SubscriberClient.subscribe
+    def subscribe(self,  # pylint: disable=too-many-arguments
+                  subscription: str,
+                  callback: Callable[[EmsMessage], None],
+                  max_messages: int = None,
+                  max_bytes: int = None,
+                  max_lease_duration: float = None,
+                  max_workers: int = None,
+                  executor: Executor = None) -> EmsStreamingFuture:
+        """
+        max_messages, max_bytes and max_lease_duration set the flow control of the streaming pull, None keeps the
+        client library default. Callbacks run on max_workers scheduler threads, or on the given ThreadPoolExecutor.
+        Any other executor, e.g. a ProcessPoolExecutor for CPU-bound callbacks, gets the callbacks submitted from
+        the scheduler threads, which wait for them; the callback has to be picklable then. The message is acked
+        once the callback returned.
+        """
         def callback_wrapper(message: Message) -> None:
-            callback(EmsMessage(message.ack_id, message.data, message.attributes))
+            ems_message = EmsMessage.from_subscriber_message(message)
+            if self.__deduplicator is not None and self.__deduplicator.is_duplicate(ems_message):
+                message.ack()
+                return
+            if dispatch_executor is None:
+                callback(ems_message)
+            else:
+                dispatch_executor.submit(callback, ems_message).result()
+            if self.__deduplicator is not None:
+                self.__deduplicator.remember(ems_message)
             message.ack()
 
+        dispatch_executor = None
+        if isinstance(executor, ThreadPoolExecutor):
+            scheduler_executor = executor
+        else:
+            dispatch_executor = executor
+            scheduler_executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers is not None else None
+
+        flow_control = {"max_messages": max_messages,
+                        "max_bytes": max_bytes,
+                        "max_lease_duration": max_lease_duration}
+        future = self.__client.subscribe(
+            subscription=subscription,
+            callback=callback_wrapper,
+            flow_control=FlowControl(**{key: value for key, value in flow_control.items() if value is not None}),
+            scheduler=ThreadScheduler(executor=scheduler_executor) if scheduler_executor is not None else None
+        )
+
+        return EmsStreamingFuture(future)
+
+    def subscribe_batched(self,
+                          subscription: str,
+                          batch_callback: Callable[[List[EmsMessage]], None],
+                          batch_settings: EmsMessageBatchSettings) -> EmsStreamingFuture:
+        """
+        Calls batch_callback with lists of messages limited by batch_settings. The whole batch is acked if the
+        callback returns and nacked if it raises; messages of an open batch stay leased in the meantime.
+        """
+        batcher = EmsMessageBatcher(batch_callback, batch_settings, self.__deduplicator)
+        flow_control = FlowControl(max_messages=max(FlowControl().max_messages, 2 * batch_settings.max_messages),
+                                   max_bytes=max(FlowControl().max_bytes, 2 * (batch_settings.max_bytes or 0)))
         future = self.__client.subscribe(
             subscription=subscription,
-            callback=callback_wrapper
+            callback=batcher.add,
+            flow_control=flow_control
         )
+        future.add_done_callback(lambda _: batcher.close())
 
         return EmsStreamingFuture(future)
 
@@ -38,13 +161,79 @@ class EmsSubscriberClient:
             "return_immediately": return_immediately
         }).received_messages
 
-        # pylint: disable=map-builtin-not-iterating
-        return map(lambda msg: EmsMessage(msg.ack_id, msg.message.data, msg.message.attributes), messages)
+        ems_messages = [EmsMessage(message.ack_id, message.message.data, dict(message.message.attributes),
+                                   message.message.message_id, message.message.publish_time)
+                        for message in messages]
+        if self.__deduplicator is not None:
+            ems_messages = self.__drop_duplicates(subscription, ems_messages)
+        if self.__lease_manager is not None:
+            self.__lease_manager.lease(subscription, [message.ack_id for message in ems_messages])
+        return iter(ems_messages)
+
+    def __drop_duplicates(self, subscription: str, messages: List[EmsMessage]) -> List[EmsMessage]:
+        unique, duplicate_ack_ids = [], []
+        for message in messages:
+            if self.__deduplicator.is_duplicate(message):
+                duplicate_ack_ids.append(message.ack_id)
+            else:
+                unique.append(message)
+        if duplicate_ack_ids:
+            self.__acknowledge(subscription, duplicate_ack_ids)
+        with self.__pending_keys_lock:
+            for message in unique:
+                self.__pending_keys[message.ack_id] = self.__deduplicator.key(message)
+            while len(self.__pending_keys) > MAX_PENDING_KEYS:
+                self.__pending_keys.popitem(last=False)
+        return unique
+
+    # the pull and ack batching options of EmsPullStream
+    def pull_stream(self,  # pylint: disable=too-many-arguments
+                    subscription: str,
+                    max_messages_per_pull: int = 100,
+                    pulls_in_flight: int = 4,
+                    ack_batch_size: int = 1000,
+                    ack_max_delay: float = 0.5) -> EmsPullStream:
+        return EmsPullStream(self, subscription, max_messages_per_pull, pulls_in_flight, ack_batch_size, ack_max_delay)
 
     def acknowledge(self,
                     subscription: str,
                     ack_ids: List[str]) -> None:
-        self.__client.api.acknowledge(request={"subscription": subscription, "ack_ids": ack_ids})
+        if self.__lease_manager is not None:
+            self.__lease_manager.release(ack_ids)
+        if self.__deduplicator is not None:
+            for key in self.__pop_pending_keys(ack_ids):
+                self.__deduplicator.remember_key(key)
+        self.__acknowledge(subscription, ack_ids)
+
+    def __acknowledge(self, subscription: str, ack_ids: List[str]) -> None:
+        for start in range(0, len(ack_ids), MAX_ACK_IDS_PER_REQUEST):
+            self.__client.api.acknowledge(request={"subscription": subscription,
+                                                   "ack_ids": ack_ids[start:start + MAX_ACK_IDS_PER_REQUEST]})
+
+    def modify_ack_deadline(self,
+                            subscription: str,
+                            ack_ids: List[str],
+                            ack_deadline_seconds: int) -> None:
+        """
+        A deadline of 0 nacks the messages, which also ends their lease.
+        """
+        if ack_deadline_seconds == 0:
+            if self.__lease_manager is not None:
+                self.__lease_manager.release(ack_ids, record_processing_time=False)
+            self.__pop_pending_keys(ack_ids)
+        self.__modify_ack_deadline(subscription, ack_ids, ack_deadline_seconds)
+
+    def __modify_ack_deadline(self, subscription: str, ack_ids: List[str], ack_deadline_seconds: int) -> None:
+        for start in range(0, len(ack_ids), MAX_ACK_IDS_PER_REQUEST):
+            self.__client.api.modify_ack_deadline(request={
+                "subscription": subscription,
+                "ack_ids": ack_ids[start:start + MAX_ACK_IDS_PER_REQUEST],
+                "ack_deadline_seconds": ack_deadline_seconds
+            })
+
+    def __pop_pending_keys(self, ack_ids: List[str]) -> List[str]:
+        with self.__pending_keys_lock:
+            return [self.__pending_keys.pop(ack_id) for ack_id in ack_ids if ack_id in self.__pending_keys]
 
     def create_subscription_if_not_exists(self, project_id: str, topic_name: str, subscription_name: str):
         topic_path = self.__client.api.topic_path(project_id, topic_name)
@@ -17,5 +17,12 @@ setup(
         "google-cloud-core>=2,<3",
         "googleapis-common-protos>=1.63.0,<2",
         "grpc-google-iam-v1==0.13.0"
-    ]
+    ],
+    extras_require={
+        "pandas": ["pandas>=1.1", "pyarrow>=3"],
+        "avro": ["fastavro>=1.4"],
+        "fast-json": ["orjson>=3"],
+        "msgspec": ["msgspec>=0.16"],
+        "zstd": ["zstandard>=0.15"]
+    }
 )
@@ -59,6 +59,14 @@ class EmsStorageClient:
                 return True
         return False
 
+    def list_blob_names(self, bucket_name: str, prefix: str = None) -> list:
+        return [blob.name for blob in self.__client.list_blobs(bucket_name, prefix=prefix)]
+
+    def open_blob(self, bucket_name: str, blob_name: str):
+        bucket = self.__client.bucket(bucket_name)
+        blob = bucket.blob(blob_name)
+        return blob.open("rb")
+
     def delete_blob(self, bucket_name: str, blob_name: str):
         bucket = self.__client.bucket(bucket_name)
         blob = bucket.blob(blob_name)
@@ -0,0 +1,24 @@
+import importlib.util
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+HAS_DATAFRAME_DEPENDENCIES = importlib.util.find_spec("pandas") is not None \
+                             and importlib.util.find_spec("pyarrow") is not None
+
+
+def create_table(row_count: int):
+    """
+    Arrow table with one column of every BigQuery type the DataFrame conversion maps, ids are null at even rows.
+    """
+    import pyarrow
+
+    return pyarrow.table({
+        "id": pyarrow.array([index if index % 2 else None for index in range(row_count)], pyarrow.int64()),
+        "flag": pyarrow.array([index % 3 == 0 for index in range(row_count)], pyarrow.bool_()),
+        "name": pyarrow.array([f"name{index}" for index in range(row_count)], pyarrow.string()),
+        "score": pyarrow.array([index / 2 for index in range(row_count)], pyarrow.float64()),
+        "created": pyarrow.array([datetime(2020, 1, 1, tzinfo=timezone.utc)] * row_count,
+                                 pyarrow.timestamp("us", tz="UTC")),
+        "amount": pyarrow.array([Decimal("1.5")] * row_count, pyarrow.decimal128(38, 9)),
+        "day": pyarrow.array([date(2020, 1, 1)] * row_count, pyarrow.date32()),
+    })
@@ -1,7 +1,7 @@
 from unittest import TestCase
 
 from bigquery.job.config.ems_job_config import EmsCreateDisposition, EmsWriteDisposition
-from bigquery.job.config.ems_load_job_config import EmsLoadJobConfig
+from bigquery.job.config.ems_load_job_config import EmsLoadJobConfig, EmsSourceFormat
 
 SCHEMA = {"fields": [{"type": "INT64", "name": "f"}]}
 
@@ -38,6 +38,9 @@ class TestEmsLoadJobConfig(TestCase):
     def test_source_uri_template(self):
         self.assertEqual(self.ems_load_job_config.source_uri_template, "gs://bucket_id/{blob_id}")
 
+    def test_source_format_defaultsToCsv(self):
+        self.assertEqual(self.ems_load_job_config.source_format, EmsSourceFormat.CSV)
+
     def test_destination_project_id_ifProjectIdIsNone_raisesValueError(self):
         with self.assertRaises(ValueError):
             EmsLoadJobConfig(destination_project_id=None, schema=SCHEMA, source_uri_template="")
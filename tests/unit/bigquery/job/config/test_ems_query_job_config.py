@@ -2,7 +2,7 @@ from unittest import TestCase
 
 from bigquery.job.config.ems_job_config import EmsJobPriority, EmsWriteDisposition, EmsCreateDisposition
 
-from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig, EmsRangePartitioning, EmsTimePartitioning
 
 
 class TestEmsQueryJobConfig(TestCase):
@@ -39,3 +39,39 @@ class TestEmsQueryJobConfig(TestCase):
 
     def test_labels(self):
         self.assertEqual(self.ems_query_job_config.labels, {"function_name": "blabla"})
+
+    def test_partitioning_and_clustering_defaultToNone(self):
+        self.assertIsNone(self.ems_query_job_config.time_partitioning)
+        self.assertIsNone(self.ems_query_job_config.range_partitioning)
+        self.assertIsNone(self.ems_query_job_config.clustering_fields)
+
+    def test_clustering_fields(self):
+        config = EmsQueryJobConfig(clustering_fields=["a", "b"])
+
+        self.assertEqual(config.clustering_fields, ["a", "b"])
+
+    def test_latency_target_seconds(self):
+        config = EmsQueryJobConfig(priority=EmsJobPriority.AUTO, latency_target_seconds=30)
+
+        self.assertEqual(config.priority, EmsJobPriority.AUTO)
+        self.assertEqual(config.latency_target_seconds, 30)
+        self.assertIsNone(self.ems_query_job_config.latency_target_seconds)
+
+    def test_rejectsTimeAndRangePartitioningTogether(self):
+        with self.assertRaises(ValueError):
+            EmsQueryJobConfig(time_partitioning=EmsTimePartitioning(),
+                              range_partitioning=EmsRangePartitioning("f", 0, 100, 10))
+
+    def test_rejectsInvalidRange(self):
+        with self.assertRaises(ValueError):
+            EmsRangePartitioning("f", 100, 0, 10)
+
+    def test_positionalArguments_keepTheirOriginalMeaning(self):
+        config = EmsQueryJobConfig(EmsJobPriority.BATCH, True, None, "project", "dataset", "table")
+
+        self.assertEqual(config.priority, EmsJobPriority.BATCH)
+        self.assertTrue(config.use_query_cache)
+        self.assertEqual(config.destination_project_id, "project")
+        self.assertEqual(config.destination_dataset, "dataset")
+        self.assertEqual(config.destination_table, "table")
+        self.assertIsNone(config.range_partitioning)
@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from bigquery.job.config.ems_copy_job_config import EmsCopyJobConfig, EmsCopyOperationType
+from bigquery.job.ems_copy_job import EmsCopyJob
+from bigquery.job.ems_job_state import EmsJobState
+
+COPY_JOB_CONFIG = EmsCopyJobConfig(EmsCopyOperationType.SNAPSHOT)
+
+
+class TestEmsCopyJob(TestCase):
+
+    def setUp(self):
+        self.expected_error_result = {"some": "error", "happened": "here"}
+        self.ems_copy_job = EmsCopyJob("test-job-id",
+                                       ["dummy-project-id.dummy-dataset.source-table"],
+                                       "dummy-project-id.dummy-dataset.destination-table",
+                                       COPY_JOB_CONFIG,
+                                       EmsJobState.DONE,
+                                       self.expected_error_result)
+
+    def test_state(self):
+        self.assertEqual(self.ems_copy_job.state, EmsJobState.DONE)
+
+    def test_job_id(self):
+        self.assertEqual(self.ems_copy_job.job_id, "test-job-id")
+
+    def test_tables(self):
+        self.assertEqual(self.ems_copy_job.source_tables, ["dummy-project-id.dummy-dataset.source-table"])
+        self.assertEqual(self.ems_copy_job.destination_table, "dummy-project-id.dummy-dataset.destination-table")
+
+    def test_job_config(self):
+        self.assertEqual(self.ems_copy_job.job_config.operation_type, EmsCopyOperationType.SNAPSHOT)
+
+    def test_is_failed(self):
+        self.assertTrue(self.ems_copy_job.is_failed)
+
+    def test_error_result(self):
+        self.assertEqual(self.ems_copy_job.error_result, self.expected_error_result)
@@ -32,3 +32,11 @@ class TestEmsQueryJob(TestCase):
 
     def test_error_result(self):
         self.assertEqual(self.ems_query_job.error_result,  self.expected_error_result)
+
+    def test_statement_statistics(self):
+        job = EmsQueryJob("test-job-id", "query", self.query_config, EmsJobState.DONE, None,
+                          statement_type="UPDATE", num_dml_affected_rows=42)
+
+        self.assertEqual(job.statement_type, "UPDATE")
+        self.assertEqual(job.num_dml_affected_rows, 42)
+        self.assertIsNone(self.ems_query_job.statement_type)
@@ -0,0 +1,36 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from bigquery.ems_auto_priority import EmsAutoPriorityPolicy
+from bigquery.job.config.ems_job_config import EmsJobPriority
+
+
+class TestEmsAutoPriorityPolicy(TestCase):
+
+    def setUp(self):
+        self.policy = EmsAutoPriorityPolicy(max_interactive_jobs=10,
+                                            batch_start_delay_seconds=60,
+                                            batch_bytes_threshold=1000)
+
+    def test_choose_returnsBatchWhenInteractiveJobsAreSaturated(self):
+        self.assertEqual(self.policy.choose(10, latency_target_seconds=1), EmsJobPriority.BATCH)
+
+    def test_choose_returnsInteractiveForLatencyTargetBelowBatchDelay(self):
+        estimate = Mock(return_value=10 ** 9)
+
+        self.assertEqual(self.policy.choose(0, 59, estimate), EmsJobPriority.INTERACTIVE)
+        estimate.assert_not_called()
+
+    def test_choose_returnsBatchForLatencyTargetAboveBatchDelay(self):
+        self.assertEqual(self.policy.choose(0, 60), EmsJobPriority.BATCH)
+
+    def test_choose_withoutLatencyTarget_decidesOnEstimatedBytes(self):
+        self.assertEqual(self.policy.choose(0, None, lambda: 1000), EmsJobPriority.BATCH)
+        self.assertEqual(self.policy.choose(0, None, lambda: 999), EmsJobPriority.INTERACTIVE)
+
+    def test_choose_withoutAnyHint_returnsInteractive(self):
+        self.assertEqual(self.policy.choose(0), EmsJobPriority.INTERACTIVE)
+
+    def test_rejectsNonPositiveMaxInteractiveJobs(self):
+        with self.assertRaises(ValueError):
+            EmsAutoPriorityPolicy(max_interactive_jobs=0)
@@ -1,31 +1,44 @@
-from datetime import datetime
+import concurrent.futures
+import gzip
+import io
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 from typing import Iterable
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 from unittest.mock import patch, Mock
 
 from google.api_core.exceptions import GoogleAPIError
 from google.cloud import bigquery
 from google.cloud.bigquery import QueryJob, QueryPriority, LoadJob, LoadJobConfig, SchemaField, ExtractJob, \
-    QueryJobConfig, TimePartitioning
+    QueryJobConfig, TimePartitioning, CopyJob, CopyJobConfig, RangePartitioning, PartitionRange, \
+    ScalarQueryParameter, ArrayQueryParameter, StructQueryParameter
+from google.cloud.bigquery.job import ScriptStatistics
 from google.cloud.bigquery.schema import _parse_schema_resource
 from google.cloud.bigquery.table import Row, TableReference
 
 from bigquery.ems_api_error import EmsApiError
-from bigquery.ems_bigquery_client import EmsBigqueryClient, RetryLimitExceededError
+from bigquery.ems_auto_priority import EmsAutoPriorityPolicy
+from bigquery.ems_bigquery_client import EmsBigqueryClient, JobDeadlineExceededError, RetryLimitExceededError
+from bigquery.ems_query_parameter import EmsArrayQueryParameter, EmsScalarQueryParameter
+from bigquery.job.config.ems_copy_job_config import EmsCopyJobConfig, EmsCopyOperationType
 from bigquery.job.config.ems_extract_job_config import EmsExtractJobConfig, Compression, DestinationFormat
-from bigquery.job.config.ems_job_config import EmsCreateDisposition, EmsWriteDisposition
-from bigquery.job.config.ems_load_job_config import EmsLoadJobConfig
-from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+from bigquery.job.config.ems_job_config import EmsCreateDisposition, EmsJobPriority, EmsWriteDisposition
+from bigquery.job.config.ems_load_job_config import EmsLoadJobConfig, EmsSourceFormat
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig, EmsRangePartitioning, EmsTimePartitioning, \
+    EmsTimePartitioningType
+from bigquery.job.ems_copy_job import EmsCopyJob
 from bigquery.job.ems_job_state import EmsJobState
 from bigquery.job.ems_load_job import EmsLoadJob
 from bigquery.job.ems_query_job import EmsQueryJob
+from tests.unit.bigquery.dataframe_helper import HAS_DATAFRAME_DEPENDENCIES, create_table
 
 DUMMY_TABLE_NAME = "my-project.mydataset.mytable"
 
 MIN_CREATION_TIME = datetime(1970, 4, 4)
 
 
-@patch("bigquery.ems_bigquery_client.bigquery")
+@patch("google.cloud.bigquery")
 class TestEmsBigqueryClient(TestCase):
     QUERY = "HELLO * BELLO"
     JOB_ID = "some-job-id"
@@ -37,6 +50,9 @@ class TestEmsBigqueryClient(TestCase):
         self.query_job_mock.create_disposition = None
         self.query_job_mock.write_disposition = None
         self.query_job_mock.time_partitioning = TimePartitioning("DAY", "a", None, None)
+        self.query_job_mock.range_partitioning = None
+        self.query_job_mock.clustering_fields = None
+        self.query_job_mock.script_statistics = None
 
         self.query_config = EmsQueryJobConfig(destination_project_id="some_destination_project_id",
                                               destination_dataset="some_dataset",
@@ -75,6 +91,48 @@ class TestEmsBigqueryClient(TestCase):
         arguments = self.client_mock.query.call_args_list[0][1]
         self.assertEqual(arguments["job_config"].destination.project, "some-project-id")
 
+    def test_run_async_query_setsTimePartitioningTypeAndClusteringFields(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        query_config = EmsQueryJobConfig(destination_dataset="some_dataset",
+                                         destination_table="some_table",
+                                         time_partitioning=EmsTimePartitioning(EmsTimePartitioningType.HOUR, "ts"),
+                                         clustering_fields=["customer_id", "event_type"])
+
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=query_config)
+
+        job_config = self.client_mock.query.call_args_list[0][1]["job_config"]
+        self.assertEqual(TimePartitioning("HOUR", "ts"), job_config.time_partitioning)
+        self.assertIsNone(job_config.range_partitioning)
+        self.assertEqual(["customer_id", "event_type"], job_config.clustering_fields)
+
+    def test_run_async_query_setsRangePartitioningInsteadOfDefaultDayPartitioning(self,
+                                                                                  bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        query_config = EmsQueryJobConfig(destination_dataset="some_dataset",
+                                         destination_table="some_table",
+                                         range_partitioning=EmsRangePartitioning("customer_id", 0, 1000, 10),
+                                         clustering_fields=["event_type"])
+
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=query_config)
+
+        job_config = self.client_mock.query.call_args_list[0][1]["job_config"]
+        self.assertIsNone(job_config.time_partitioning)
+        self.assertEqual(RangePartitioning(PartitionRange(0, 1000, 10), "customer_id"), job_config.range_partitioning)
+        self.assertEqual(["event_type"], job_config.clustering_fields)
+
+    def test_run_async_query_withClusteringOnly_keepsDefaultDayPartitioning(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        query_config = EmsQueryJobConfig(destination_dataset="some_dataset",
+                                         destination_table="some_table",
+                                         clustering_fields=["customer_id"])
+
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=query_config)
+
+        job_config = self.client_mock.query.call_args_list[0][1]["job_config"]
+        self.assertEqual(TimePartitioning("DAY"), job_config.time_partitioning)
+        self.assertIsNone(job_config.range_partitioning)
+        self.assertEqual(["customer_id"], job_config.clustering_fields)
+
     def test_run_async_query_usesCustomLocation(self, bigquery_module_patch: bigquery):
         ems_bigquery_client = self.__setup_client(bigquery_module_patch, location="WONDERLAND")
 
@@ -123,6 +181,7 @@ class TestEmsBigqueryClient(TestCase):
         self.assertEqual(job_config.create_disposition, EmsCreateDisposition.CREATE_IF_NEEDED.value)
         self.assertEqual(job_config.write_disposition, EmsWriteDisposition.WRITE_APPEND.value)
         self.assertEqual(job_config.labels, {"label1": "label1_value"})
+        self.assertEqual(job_config.source_format, "CSV")
 
         field1 = SchemaField("f1", "STRING")
         field2 = SchemaField("f2", "INTEGER", "REQUIRED")
@@ -165,6 +224,60 @@ class TestEmsBigqueryClient(TestCase):
         assert args["job_config"].labels == {"label1": "label1_value"}
         assert result_job_id == expected_job_id
 
+    def test_run_async_copy_job_submitsCopyJobAndReturnsJobIdWithProperConfig(self, bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+        copy_job_mock = Mock(CopyJob)
+        copy_job_mock.job_id = self.JOB_ID
+        self.client_mock.copy_table.return_value = copy_job_mock
+        ems_job_config = EmsCopyJobConfig(operation_type=EmsCopyOperationType.SNAPSHOT,
+                                          write_disposition=EmsWriteDisposition.WRITE_EMPTY,
+                                          labels={"label1": "label1_value"})
+
+        ems_bigquery_client = EmsBigqueryClient("some-project-id", "Emelet")
+        result_job_id = ems_bigquery_client.run_async_copy_job("prefix", DUMMY_TABLE_NAME, "p.d.snapshot",
+                                                               ems_job_config)
+
+        args = self.client_mock.copy_table.call_args_list[0][1]
+        self.assertEqual(args["sources"], [TableReference.from_string(DUMMY_TABLE_NAME)])
+        self.assertEqual(args["destination"], TableReference.from_string("p.d.snapshot"))
+        self.assertEqual(args["job_id_prefix"], "prefix")
+        self.assertEqual(args["location"], "Emelet")
+        self.assertIsInstance(args["job_config"], CopyJobConfig)
+        self.assertEqual(args["job_config"].operation_type, "SNAPSHOT")
+        self.assertEqual(args["job_config"].write_disposition, "WRITE_EMPTY")
+        self.assertEqual(args["job_config"].labels, {"label1": "label1_value"})
+        self.assertEqual(result_job_id, self.JOB_ID)
+
+    def test_run_async_copy_job_serializesDestinationExpirationTimeAsRfc3339(self, bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+        self.client_mock.copy_table.return_value = Mock(CopyJob, job_id=self.JOB_ID)
+        ems_job_config = EmsCopyJobConfig(operation_type=EmsCopyOperationType.SNAPSHOT,
+                                          destination_expiration_time=datetime(2030, 1, 2, 3, 4, 5))
+
+        EmsBigqueryClient("some-project-id").run_async_copy_job("prefix", DUMMY_TABLE_NAME, "p.d.snapshot",
+                                                                ems_job_config)
+
+        job_config = self.client_mock.copy_table.call_args_list[0][1]["job_config"]
+        self.assertEqual(job_config.destination_expiration_time, "2030-01-02T03:04:05.000000Z")
+        json.dumps(job_config.to_api_repr())
+
+    def test_run_async_copy_jobs_submitsOneJobPerTablePair(self, bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+
+        def copy_table(sources, destination, **kwargs):
+            copy_job_mock = Mock(CopyJob)
+            copy_job_mock.job_id = "job-" + destination.table_id
+            return copy_job_mock
+
+        self.client_mock.copy_table.side_effect = copy_table
+        table_mapping = {f"p.d.source{i}": f"p.d.destination{i}" for i in range(5)}
+
+        ems_bigquery_client = EmsBigqueryClient("some-project-id")
+        job_ids = ems_bigquery_client.run_async_copy_jobs("prefix", table_mapping)
+
+        self.assertEqual([f"job-destination{i}" for i in range(5)], job_ids)
+        self.assertEqual(5, self.client_mock.copy_table.call_count)
+
     def test_run_sync_query_submitsInteractiveQueryAndReturnsWithResultIterator(self, bigquery_module_patch: bigquery):
         ems_bigquery_client = self.__setup_client(bigquery_module_patch,
                                                   [
@@ -186,6 +299,54 @@ class TestEmsBigqueryClient(TestCase):
         assert result_rows[0] == {"int_column": 42, "str_column": "hello"}
         assert result_rows[1] == {"int_column": 1024, "str_column": "wonderland"}
 
+    def test_run_sync_query_passesNamedQueryParametersWithInferredTypes(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch, [])
+        created = datetime(2020, 1, 2, tzinfo=timezone.utc)
+
+        ems_bigquery_client.run_sync_query(self.QUERY, query_parameters={
+            "name": "alice",
+            "day": date(2020, 1, 2),
+            "created": created,
+            "amount": Decimal("1.5"),
+            "ids": [1, 2],
+            "address": {"city": "Budapest", "zip": 1111},
+            "score": EmsScalarQueryParameter("score", 5, "FLOAT64")
+        })
+
+        parameters = self.client_mock.query.call_args_list[0][1]["job_config"].query_parameters
+        self.assertEqual([
+            StructQueryParameter("address",
+                                 ScalarQueryParameter("city", "STRING", "Budapest"),
+                                 ScalarQueryParameter("zip", "INT64", 1111)),
+            ScalarQueryParameter("amount", "NUMERIC", Decimal("1.5")),
+            ScalarQueryParameter("created", "TIMESTAMP", created),
+            ScalarQueryParameter("day", "DATE", date(2020, 1, 2)),
+            ArrayQueryParameter("ids", "INT64", [1, 2]),
+            ScalarQueryParameter("name", "STRING", "alice"),
+            ScalarQueryParameter("score", "FLOAT64", 5)
+        ], parameters)
+
+    def test_run_async_query_passesPositionalQueryParameters(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+
+        ems_bigquery_client.run_async_query(self.QUERY, query_parameters=[
+            True, EmsArrayQueryParameter(None, [], "STRING"), [{"a": 1}]
+        ])
+
+        job_config = self.client_mock.query.call_args_list[0][1]["job_config"]
+        self.assertEqual([
+            ScalarQueryParameter(None, "BOOL", True),
+            ArrayQueryParameter(None, "STRING", []),
+            ArrayQueryParameter(None, "STRUCT", [StructQueryParameter(None, ScalarQueryParameter("a", "INT64", 1))])
+        ], job_config.query_parameters)
+        self.assertEqual("POSITIONAL", job_config.to_api_repr()["query"]["parameterMode"])
+
+    def test_run_sync_query_rejectsValuesWithUnknownType(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch, [])
+
+        with self.assertRaises(ValueError):
+            ems_bigquery_client.run_sync_query(self.QUERY, query_parameters={"nothing": None})
+
     def test_run_sync_query_wrapsGcpErrors(self, bigquery_module_patch: bigquery):
         ems_bigquery_client = self.__setup_client(bigquery_module_patch)
         self.client_mock.query.side_effect = GoogleAPIError("BOOM!")
@@ -205,6 +366,205 @@ class TestEmsBigqueryClient(TestCase):
 
         self.client_mock.query.assert_called_once()
 
+    def test_session_createsSessionPassesItsIdToQueriesAndAbortsIt(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch, [])
+        self.query_job_mock.session_info.session_id = "some-session-id"
+
+        with ems_bigquery_client.session("session-") as session:
+            session.run_sync_query("CREATE TEMP TABLE t AS SELECT 1 AS a")
+            session.run_async_query("SELECT * FROM _SESSION.t")
+
+        calls = [call[1] for call in self.client_mock.query.call_args_list]
+        self.assertEqual("some-session-id", session.session_id)
+        self.assertEqual(4, len(calls))
+        self.assertTrue(calls[0]["job_config"].create_session)
+        self.assertEqual("session-", calls[0]["job_id_prefix"])
+        for call in calls[1:]:
+            self.assertFalse(call["job_config"].create_session)
+            self.assertEqual([{"key": "session_id", "value": "some-session-id"}],
+                             [prop.to_api_repr() for prop in call["job_config"].connection_properties])
+        self.assertEqual("CALL BQ.ABORT_SESSION()", calls[3]["query"])
+
+    def test_session_isAbortedEvenIfBodyFails(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch, [])
+        self.query_job_mock.session_info.session_id = "some-session-id"
+
+        with self.assertRaises(RuntimeError):
+            with ems_bigquery_client.session():
+                raise RuntimeError("BOOM!")
+
+        self.assertEqual("CALL BQ.ABORT_SESSION()", self.client_mock.query.call_args_list[-1][1]["query"])
+
+    def test_run_sync_query_withoutSessionSetsNoConnectionProperties(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch, [])
+
+        ems_bigquery_client.run_sync_query(self.QUERY)
+
+        job_config = self.client_mock.query.call_args_list[0][1]["job_config"]
+        self.assertEqual([], job_config.connection_properties)
+        self.assertFalse(job_config.create_session)
+
+    def test_run_sync_upsert_loadsStagingTableMergesAndDropsIt(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_upsert_client(bigquery_module_patch)
+
+        merge_job_id = ems_bigquery_client.run_sync_upsert(self.__upsert_load_config(), ["id"], "upsert-")
+
+        load_arguments = self.client_mock.load_table_from_uri.call_args_list[0][1]
+        staging_table = load_arguments["destination"]
+        self.assertEqual("some-project-id", staging_table.project)
+        self.assertEqual("some_dataset", staging_table.dataset_id)
+        self.assertTrue(staging_table.table_id.startswith("target_staging_"))
+        self.assertEqual("gs://bucket/rows-*.json", load_arguments["source_uris"])
+        self.assertEqual("NEWLINE_DELIMITED_JSON", load_arguments["job_config"].source_format)
+        self.assertEqual("WRITE_APPEND", load_arguments["job_config"].write_disposition)
+        self.assertEqual("CREATE_NEVER", load_arguments["job_config"].create_disposition)
+        created_table = self.client_mock.create_table.call_args[0][0]
+        self.assertEqual(staging_table, created_table.reference)
+        self.assertEqual(["id", "name"], [field.name for field in created_table.schema])
+        self.assertGreater(created_table.expires, datetime.now(timezone.utc) + timedelta(hours=23))
+
+        query_arguments = self.client_mock.query.call_args_list[0][1]
+        self.assertEqual(
+            "MERGE `some-project-id.some_dataset.target` T "
+            f"USING `some-project-id.some_dataset.{staging_table.table_id}` S ON T.`id` = S.`id` "
+            "WHEN MATCHED THEN UPDATE SET `name` = S.`name` "
+            "WHEN NOT MATCHED THEN INSERT (`id`, `name`) VALUES (S.`id`, S.`name`)",
+            query_arguments["query"])
+        self.assertEqual("upsert-", query_arguments["job_id_prefix"])
+        self.assertIsNone(query_arguments["job_config"].destination)
+        self.assertEqual(self.JOB_ID, merge_job_id)
+        self.client_mock.delete_table.assert_called_once_with(staging_table, not_found_ok=True)
+
+    def test_run_sync_upsert_dropsStagingTableAndWrapsErrorsOnFailure(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_upsert_client(bigquery_module_patch)
+        self.query_job_mock.result.side_effect = GoogleAPIError("BOOM!")
+
+        with self.assertRaises(EmsApiError) as context:
+            ems_bigquery_client.run_sync_upsert(self.__upsert_load_config(), ["id"])
+
+        self.assertIn("BOOM!", context.exception.args[0])
+        self.client_mock.delete_table.assert_called_once()
+
+    def test_run_sync_upsert_cancelsJobAndKeepsStagingTableOnTimeout(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_upsert_client(bigquery_module_patch)
+        self.query_job_mock.result.side_effect = concurrent.futures.TimeoutError()
+        self.client_mock.cancel_job.return_value = self.query_job_mock
+
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            ems_bigquery_client.run_sync_upsert(self.__upsert_load_config(), ["id"], timeout_seconds=1)
+
+        self.client_mock.cancel_job.assert_called_once()
+        self.client_mock.delete_table.assert_not_called()
+
+    def test_run_sync_upsert_rejectsUnknownKeyColumns(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_upsert_client(bigquery_module_patch)
+
+        with self.assertRaises(ValueError):
+            ems_bigquery_client.run_sync_upsert(self.__upsert_load_config(), ["missing"])
+        self.client_mock.load_table_from_uri.assert_not_called()
+
+    def test_run_query_to_gcs_wrapsQueryInExportDataAndReturnsShardUris(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch, [])
+        storage_client = Mock()
+        storage_client.list_blob_names.return_value = ["export/rows-000000000001.csv.gz",
+                                                       "export/rows-000000000000.csv.gz",
+                                                       "export/rows-summary.txt"]
+
+        uris = ems_bigquery_client.run_query_to_gcs("SELECT * FROM t WHERE a = @a;",
+                                                    "gs://bucket/export/rows-*.csv.gz",
+                                                    compression=Compression.GZIP,
+                                                    field_delimiter="'",
+                                                    job_id_prefix="export-",
+                                                    query_parameters={"a": 1},
+                                                    storage_client=storage_client)
+
+        arguments = self.client_mock.query.call_args_list[0][1]
+        self.assertEqual("EXPORT DATA OPTIONS(uri='gs://bucket/export/rows-*.csv.gz', format='CSV', overwrite=true, "
+                         "header=true, field_delimiter='\\'', compression='GZIP') AS SELECT * FROM t WHERE a = @a",
+                         arguments["query"])
+        self.assertEqual("export-", arguments["job_id_prefix"])
+        self.assertEqual([ScalarQueryParameter("a", "INT64", 1)], arguments["job_config"].query_parameters)
+        storage_client.list_blob_names.assert_called_once_with("bucket", "export/rows-")
+        self.assertEqual(["gs://bucket/export/rows-000000000000.csv.gz",
+                          "gs://bucket/export/rows-000000000001.csv.gz"], uris)
+
+    def test_run_query_to_gcs_usesJsonFormatWithoutCsvOptions(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch, [])
+        storage_client = Mock()
+        storage_client.list_blob_names.return_value = []
+
+        ems_bigquery_client.run_query_to_gcs(self.QUERY, "gs://bucket/rows-*.json",
+                                             destination_format=DestinationFormat.NEWLINE_DELIMITED_JSON,
+                                             overwrite=False,
+                                             storage_client=storage_client)
+
+        self.assertEqual(f"EXPORT DATA OPTIONS(uri='gs://bucket/rows-*.json', format='JSON', overwrite=false) "
+                         f"AS {self.QUERY}",
+                         self.client_mock.query.call_args_list[0][1]["query"])
+
+    def test_run_query_to_gcs_rejectsUriWithoutSingleWildcard(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch, [])
+
+        with self.assertRaises(ValueError):
+            ems_bigquery_client.run_query_to_gcs(self.QUERY, "gs://bucket/rows.csv", storage_client=Mock())
+        self.client_mock.query.assert_not_called()
+
+    def test_read_exported_rows_decodesCsvAndJsonShards(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        blobs = {"a.csv.gz": gzip.compress(b"id,name\n1,alice\n"),
+                 "b.csv.gz": gzip.compress(b"id,name\n2,bob\n"),
+                 "c.json": b'{"id": 3}\n\n{"id": 4}\n'}
+        storage_client = Mock()
+        storage_client.open_blob.side_effect = lambda bucket_name, blob_name: io.BytesIO(blobs[blob_name])
+
+        csv_rows = ems_bigquery_client.read_exported_rows(["gs://bucket/a.csv.gz", "gs://bucket/b.csv.gz"],
+                                                          compression=Compression.GZIP,
+                                                          storage_client=storage_client)
+        json_rows = ems_bigquery_client.read_exported_rows(["gs://bucket/c.json"],
+                                                           DestinationFormat.NEWLINE_DELIMITED_JSON,
+                                                           storage_client=storage_client)
+
+        self.assertEqual([{"id": "1", "name": "alice"}, {"id": "2", "name": "bob"}], list(csv_rows))
+        self.assertEqual([{"id": 3}, {"id": 4}], list(json_rows))
+
+    def test_read_exported_rows_typesCsvValuesWithSchema(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        storage_client = Mock()
+        storage_client.open_blob.return_value = io.BytesIO(b"id,name\n1,\n")
+        schema = {"fields": [{"name": "id", "type": "INT64"}, {"name": "name", "type": "STRING"}]}
+
+        rows = ems_bigquery_client.read_exported_rows(["gs://bucket/a.csv"], storage_client=storage_client,
+                                                      schema=schema)
+
+        self.assertEqual([{"id": 1, "name": None}], list(rows))
+        storage_client.open_blob.assert_called_once_with("bucket", "a.csv")
+
+    def test_get_query_schema_returnsSchemaOfDryRun(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.query_job_mock.schema = [SchemaField("id", "INT64"), SchemaField("name", "STRING", mode="REQUIRED")]
+
+        schema = ems_bigquery_client.get_query_schema(self.QUERY, {"id": 1})
+
+        job_config = self.client_mock.query.call_args[1]["job_config"]
+        self.assertTrue(job_config.dry_run)
+        self.assertEqual(1, len(job_config.query_parameters))
+        self.assertEqual(["id", "name"], [field["name"] for field in schema["fields"]])
+        self.assertEqual("REQUIRED", schema["fields"][1]["mode"])
+
+    def test_run_sync_query_buffered_returnsReiterableResult(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch,
+                                                  [
+                                                      Row((42, "hello"), {"int_column": 0, "str_column": 1}),
+                                                      Row((1024, "wonderland"), {"int_column": 0, "str_column": 1})
+                                                  ]
+                                                  )
+
+        with ems_bigquery_client.run_sync_query_buffered(self.QUERY, max_memory_bytes=0) as result:
+            self.assertEqual(2, len(result))
+            self.assertEqual(list(result), list(result))
+            self.assertEqual({"int_column": 1024, "str_column": "wonderland"}, result[1])
+        self.client_mock.query.assert_called_once()
+
     def test_get_job_list_returnWithEmptyIterator(self, bigquery_module_patch: bigquery):
         bigquery_module_patch.Client.return_value = self.client_mock
         self.client_mock.list_jobs.return_value = []
@@ -235,6 +595,24 @@ class TestEmsBigqueryClient(TestCase):
         assert result[0].is_failed is False
         assert isinstance(result[0].query_config, EmsQueryJobConfig)
 
+    def test_get_job_list_convertsPartitioningAndClustering(self, bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+        job = self.__create_query_job_mock("123", False)
+        job.time_partitioning = None
+        job.range_partitioning = RangePartitioning(PartitionRange(0, 1000, 10), "customer_id")
+        job.clustering_fields = ["customer_id"]
+        self.client_mock.list_jobs.return_value = [job]
+
+        ems_bigquery_client = EmsBigqueryClient("some-project-id")
+        query_config = list(ems_bigquery_client.get_job_list())[0].query_config
+
+        self.assertIsNone(query_config.time_partitioning)
+        self.assertEqual("customer_id", query_config.range_partitioning.field)
+        self.assertEqual((0, 1000, 10), (query_config.range_partitioning.start,
+                                         query_config.range_partitioning.end,
+                                         query_config.range_partitioning.interval))
+        self.assertEqual(["customer_id"], query_config.clustering_fields)
+
     def test_get_job_list_returnWithEmsLoadJobIterator(self, bigquery_module_patch: bigquery):
         bigquery_module_patch.Client.return_value = self.client_mock
         load_job_mock = Mock(LoadJob)
@@ -272,6 +650,25 @@ class TestEmsBigqueryClient(TestCase):
         self.assertEqual(expected_schema, result_job.load_config.schema)
         self.assertEqual("gs://some-bucket-id/some-blob-id", result_job.load_config.source_uri_template)
 
+    def test_get_job_list_returnWithEmsCopyJobIterator(self, bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+        self.client_mock.list_jobs.return_value = [self.__create_copy_job_mock("123", False)]
+
+        ems_bigquery_client = EmsBigqueryClient("some-project-id")
+        result = list(ems_bigquery_client.get_job_list())
+
+        self.assertEqual(1, len(result))
+        result_job = result[0]
+        self.assertIsInstance(result_job, EmsCopyJob)
+        self.assertEqual("123", result_job.job_id)
+        self.assertEqual([DUMMY_TABLE_NAME], result_job.source_tables)
+        self.assertEqual("my-project.mydataset.mytable_copy", result_job.destination_table)
+        self.assertEqual(EmsCopyOperationType.SNAPSHOT, result_job.job_config.operation_type)
+        self.assertEqual(EmsWriteDisposition.WRITE_EMPTY, result_job.job_config.write_disposition)
+        self.assertEqual(datetime(2030, 1, 2, 3, 4, 5, 120000, tzinfo=timezone.utc),
+                         result_job.job_config.destination_expiration_time)
+        self.assertFalse(result_job.is_failed)
+
     def test_get_job_list_returnsJobWithEmsQueryJobConfigWithoutDestination(self, bigquery_module_patch: bigquery):
         bigquery_module_patch.Client.return_value = self.client_mock
         self.query_job_mock.job_id = "123"
@@ -411,6 +808,21 @@ class TestEmsBigqueryClient(TestCase):
         self.assertEqual(arguments["job_config"].print_header, job.print_header)
         self.assertEqual(arguments["job_config"].labels, {"label1": "label1_value"})
 
+    def test_relaunch_failed_jobs_startsCopyJob(self, bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+        self.client_mock.list_jobs.return_value = [self.__create_copy_job_mock("prefixed-some-job-id", True)]
+
+        ems_bigquery_client = EmsBigqueryClient("some-project-id", "valhalla")
+        ems_bigquery_client.relaunch_failed_jobs("prefixed", MIN_CREATION_TIME)
+
+        arguments = self.client_mock.copy_table.call_args_list[0][1]
+        self.assertEqual("prefixed-retry-1-", arguments["job_id_prefix"])
+        self.assertEqual(arguments["sources"], [TableReference.from_string(DUMMY_TABLE_NAME)])
+        self.assertEqual(arguments["destination"], TableReference.from_string("my-project.mydataset.mytable_copy"))
+        self.assertEqual(arguments["location"], "valhalla")
+        self.assertEqual(arguments["job_config"].operation_type, "SNAPSHOT")
+        self.assertEqual(arguments["job_config"].labels, {"label1": "label1_value"})
+
     def test_relaunch_failed_jobs_startsNewJobForAllFailedJobs(self, bigquery_module_patch: bigquery):
         bigquery_module_patch.Client.return_value = self.client_mock
         first_job = self.__create_query_job_mock("prefixed-query", True)
@@ -464,6 +876,61 @@ class TestEmsBigqueryClient(TestCase):
         self.assertRaises(RetryLimitExceededError,
                           ems_bigquery_client.relaunch_failed_jobs, "prefixed", MIN_CREATION_TIME)
 
+    @skipUnless(HAS_DATAFRAME_DEPENDENCIES, "pandas and pyarrow are not installed")
+    def test_run_sync_query_df_buildsDataframeFromArrow(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.query_job_mock.result.return_value.to_arrow.return_value = create_table(3)
+
+        dataframe = ems_bigquery_client.run_sync_query_df(self.QUERY)
+
+        self.assertEqual(len(dataframe), 3)
+        self.assertEqual(str(dataframe["id"].dtype), "Int64")
+        self.query_job_mock.result.return_value.to_arrow.assert_called_once_with(create_bqstorage_client=False)
+
+    @skipUnless(HAS_DATAFRAME_DEPENDENCIES, "pandas and pyarrow are not installed")
+    def test_run_sync_query_df_withChunkSize_yieldsChunks(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.query_job_mock.result.return_value.to_arrow_iterable.return_value = iter(create_table(5).to_batches())
+
+        chunks = list(ems_bigquery_client.run_sync_query_df(self.QUERY, chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+
+    def test_run_sync_query_df_withoutPandas_raisesImportError(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+
+        with patch("bigquery.ems_dataframe.importlib.util.find_spec", return_value=None):
+            with self.assertRaises(ImportError):
+                ems_bigquery_client.run_sync_query_df(self.QUERY)
+
+        self.client_mock.query.assert_not_called()
+
+    def test_get_child_jobs_returnsStatementJobsInExecutionOrder(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        first = self.__create_query_job_mock("script_job_0", False, datetime(2020, 1, 1, 0, 0, 1))
+        first.statement_type = "DELETE"
+        first.num_dml_affected_rows = 3
+        first.script_statistics = ScriptStatistics({"stackFrames": [{"startLine": 2, "startColumn": 1}]})
+        second = self.__create_query_job_mock("script_job_1", False, datetime(2020, 1, 1, 0, 0, 2))
+        self.client_mock.list_jobs.return_value = [second, first]
+
+        jobs = ems_bigquery_client.get_child_jobs("parent")
+
+        self.client_mock.list_jobs.assert_called_once_with(parent_job="parent")
+        self.assertEqual([job.job_id for job in jobs], ["script_job_0", "script_job_1"])
+        self.assertEqual((jobs[0].statement_type, jobs[0].num_dml_affected_rows), ("DELETE", 3))
+        self.assertEqual([job.script_start_line for job in jobs], [2, None])
+
+    def test_get_job_returnsConvertedJob(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.client_mock.get_job.return_value = self.__create_query_job_mock("job_id", False)
+
+        job = ems_bigquery_client.get_job("job_id")
+
+        self.client_mock.get_job.assert_called_once_with("job_id", project="some-project-id", location="EU")
+        self.assertIsInstance(job, EmsQueryJob)
+        self.assertEqual(job.job_id, "job_id")
+
     def test_wait_for_job_done_delegatesCallToOriginalJob(self, bigquery_module_patch: bigquery):
         bigquery_module_patch.Client.return_value = self.client_mock
         self.client_mock.get_job.return_value = self.query_job_mock
@@ -482,6 +949,166 @@ class TestEmsBigqueryClient(TestCase):
         self.assertEqual(job.job_id, "1234")
         self.assertEqual(job.state, EmsJobState.DONE)
 
+    def test_wait_for_job_done_cancelsJobOnTimeoutIfRequested(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.client_mock.get_job.return_value = self.query_job_mock
+        self.query_job_mock.result.side_effect = concurrent.futures.TimeoutError()
+        self.client_mock.cancel_job.return_value = self.__create_query_job_mock("job_id", False)
+
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            ems_bigquery_client.wait_for_job_done("job_id", 1., cancel_on_timeout=True)
+
+        self.client_mock.cancel_job.assert_called_once_with("job_id", project="some-project-id", location="EU")
+
+    def test_wait_for_job_done_leavesJobRunningOnTimeoutByDefault(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.client_mock.get_job.return_value = self.query_job_mock
+        self.query_job_mock.result.side_effect = concurrent.futures.TimeoutError()
+
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            ems_bigquery_client.wait_for_job_done("job_id", 1.)
+
+        self.client_mock.cancel_job.assert_not_called()
+
+    def test_cancel_job_returnsConvertedJob(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.client_mock.cancel_job.return_value = self.__create_query_job_mock("job_id", False)
+
+        job = ems_bigquery_client.cancel_job("job_id")
+
+        self.client_mock.cancel_job.assert_called_once_with("job_id", project="some-project-id", location="EU")
+        self.assertIsInstance(job, EmsQueryJob)
+        self.assertEqual(job.job_id, "job_id")
+
+    def test_cancel_jobs_with_prefix_cancelsOnlyUnfinishedJobs(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        running_job = self.__create_query_job_mock("prefix-running", False)
+        running_job.state = "RUNNING"
+        pending_job = self.__create_query_job_mock("prefix-pending", False)
+        pending_job.state = "PENDING"
+        done_job = self.__create_query_job_mock("prefix-done", False)
+        other_job = self.__create_query_job_mock("other-running", False)
+        other_job.state = "RUNNING"
+        self.client_mock.list_jobs.return_value = [running_job, pending_job, done_job, other_job]
+        self.client_mock.cancel_job.return_value = running_job
+
+        cancelled = ems_bigquery_client.cancel_jobs_with_prefix("prefix", MIN_CREATION_TIME)
+
+        self.assertEqual(cancelled, ["prefix-running", "prefix-pending"])
+        self.assertEqual([call[0][0] for call in self.client_mock.cancel_job.call_args_list],
+                         ["prefix-running", "prefix-pending"])
+
+    def test_run_async_query_setsServerSideTimeoutFromDeadline(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+
+        ems_bigquery_client.run_async_query(self.QUERY, deadline_seconds=1.5)
+
+        job_config = self.client_mock.query.call_args[1]["job_config"]
+        self.assertEqual(job_config.job_timeout_ms, "1500")
+
+    def test_run_async_query_withoutDeadline_doesNotSetTimeout(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+
+        ems_bigquery_client.run_async_query(self.QUERY)
+
+        job_config = self.client_mock.query.call_args[1]["job_config"]
+        self.assertIsNone(job_config.job_timeout_ms)
+
+    def test_run_sync_query_cancelsJobWhenDeadlinePasses(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.query_job_mock.result.side_effect = concurrent.futures.TimeoutError()
+        self.client_mock.cancel_job.return_value = self.__create_query_job_mock(self.JOB_ID, False)
+
+        with self.assertRaises(JobDeadlineExceededError) as context:
+            ems_bigquery_client.run_sync_query(self.QUERY, deadline_seconds=2)
+
+        self.query_job_mock.result.assert_called_once_with(timeout=2)
+        self.client_mock.cancel_job.assert_called_once_with(self.JOB_ID, project="some-project-id", location="EU")
+        self.assertIn(self.JOB_ID, context.exception.args[0])
+        self.assertEqual(self.client_mock.query.call_args[1]["job_config"].job_timeout_ms, "2000")
+
+    def test_run_async_query_withAutoPriority_choosesBatchForLargeDryRun(self, bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+        self.client_mock.query.return_value = self.query_job_mock
+        policy = EmsAutoPriorityPolicy(estimate_bytes_with_dry_run=True)
+        ems_bigquery_client = EmsBigqueryClient("some-project-id", auto_priority_policy=policy)
+        self.client_mock.list_jobs.return_value = []
+        self.query_job_mock.total_bytes_processed = 10 * 1024 ** 4
+
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=EmsQueryJobConfig(EmsJobPriority.AUTO))
+
+        dry_run_config = self.client_mock.query.call_args_list[0][1]["job_config"]
+        job_config = self.client_mock.query.call_args_list[1][1]["job_config"]
+        self.assertTrue(dry_run_config.dry_run)
+        self.assertEqual(dry_run_config.priority, "INTERACTIVE")
+        self.assertEqual(job_config.priority, "BATCH")
+        self.assertFalse(job_config.dry_run)
+
+    def test_run_async_query_withAutoPriority_choosesInteractiveForLatencyTarget(self,
+                                                                                  bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.client_mock.list_jobs.return_value = []
+        config = EmsQueryJobConfig(EmsJobPriority.AUTO, latency_target_seconds=5)
+
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=config)
+
+        self.client_mock.query.assert_called_once()
+        self.assertEqual(self.client_mock.query.call_args[1]["job_config"].priority, "INTERACTIVE")
+
+    def test_run_async_query_withAutoPriority_skipsDryRunByDefault(self, bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        self.client_mock.list_jobs.return_value = []
+
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=EmsQueryJobConfig(EmsJobPriority.AUTO))
+
+        self.client_mock.query.assert_called_once()
+        self.assertEqual(self.client_mock.query.call_args[1]["job_config"].priority, "INTERACTIVE")
+
+    def test_run_async_query_withAutoPriority_reusesInFlightCountAndAddsOwnJobs(self,
+                                                                               bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+        self.client_mock.query.return_value = self.query_job_mock
+        ems_bigquery_client = EmsBigqueryClient("some-project-id",
+                                                auto_priority_policy=EmsAutoPriorityPolicy(max_interactive_jobs=2))
+        self.client_mock.list_jobs.side_effect = [[self.__create_query_job_mock("running", False)], []]
+        config = EmsQueryJobConfig(EmsJobPriority.AUTO, latency_target_seconds=5)
+
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=config)
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=config)
+
+        priorities = [call[1]["job_config"].priority for call in self.client_mock.query.call_args_list]
+        self.assertEqual(["INTERACTIVE", "BATCH"], priorities)
+        self.assertEqual([call[1] for call in self.client_mock.list_jobs.call_args_list],
+                         [{"all_users": True, "state_filter": state, "max_results": 20}
+                          for state in ("running", "pending")])
+
+    def test_run_async_query_withAutoPriority_choosesBatchWhenInteractiveIsSaturated(self,
+                                                                                      bigquery_module_patch: bigquery):
+        bigquery_module_patch.Client.return_value = self.client_mock
+        self.client_mock.query.return_value = self.query_job_mock
+        ems_bigquery_client = EmsBigqueryClient("some-project-id",
+                                                auto_priority_policy=EmsAutoPriorityPolicy(max_interactive_jobs=1))
+        self.client_mock.list_jobs.return_value = [self.__create_query_job_mock("running", False)]
+        config = EmsQueryJobConfig(EmsJobPriority.AUTO, latency_target_seconds=5)
+
+        ems_bigquery_client.run_async_query(self.QUERY, ems_query_job_config=config)
+
+        self.assertEqual(self.client_mock.query.call_args[1]["job_config"].priority, "BATCH")
+
+    def test_get_in_flight_job_counts_countsRunningAndPendingQueryJobsByPriority(self,
+                                                                                  bigquery_module_patch: bigquery):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        interactive_job = self.__create_query_job_mock("interactive", False)
+        batch_job = self.__create_query_job_mock("batch", False)
+        batch_job.priority = "BATCH"
+        self.client_mock.list_jobs.side_effect = [[interactive_job, batch_job], [interactive_job]]
+
+        counts = ems_bigquery_client.get_in_flight_job_counts()
+
+        self.assertEqual(counts, {EmsJobPriority.INTERACTIVE: 2, EmsJobPriority.BATCH: 1})
+        self.assertEqual([call[1]["state_filter"] for call in self.client_mock.list_jobs.call_args_list],
+                         ["running", "pending"])
+
     def __create_query_job_mock(self, job_id: str, has_error: bool, created: datetime = datetime.now()):
         error_result = {'reason': 'someReason', 'location': 'query', 'message': 'error occurred'}
         query_job_mock = Mock(QueryJob)
@@ -496,6 +1123,9 @@ class TestEmsBigqueryClient(TestCase):
         query_job_mock.error_result = error_result if has_error else None
         query_job_mock.created = created
         query_job_mock.time_partitioning = TimePartitioning("DAY", "a", None, None)
+        query_job_mock.range_partitioning = None
+        query_job_mock.clustering_fields = None
+        query_job_mock.script_statistics = None
 
         return query_job_mock
 
@@ -515,6 +1145,42 @@ class TestEmsBigqueryClient(TestCase):
         extract_job_mock.created = created
         return extract_job_mock
 
+    def __setup_upsert_client(self, bigquery_module_patch):
+        ems_bigquery_client = self.__setup_client(bigquery_module_patch)
+        load_job_mock = Mock(LoadJob)
+        load_job_mock.job_id = "load-job-id"
+        self.client_mock.load_table_from_uri.return_value = load_job_mock
+        self.client_mock.get_job.return_value = self.query_job_mock
+        self.query_job_mock.state = "DONE"
+        self.query_job_mock.destination = None
+        return ems_bigquery_client
+
+    @staticmethod
+    def __upsert_load_config():
+        schema = {"fields": [{"type": "INT64", "name": "id"}, {"type": "STRING", "name": "name"}]}
+        return EmsLoadJobConfig(schema=schema,
+                                source_uri_template="gs://bucket/rows-*.json",
+                                source_format=EmsSourceFormat.NEWLINE_DELIMITED_JSON,
+                                destination_project_id="some-project-id",
+                                destination_dataset="some_dataset",
+                                destination_table="target")
+
+    def __create_copy_job_mock(self, job_id: str, has_error: bool):
+        error_result = {'reason': 'someReason', 'location': 'query', 'message': 'error occurred'}
+        copy_job_mock = Mock(CopyJob)
+        copy_job_mock.job_id = job_id
+        copy_job_mock.sources = [TableReference.from_string(DUMMY_TABLE_NAME)]
+        copy_job_mock.destination = TableReference.from_string(DUMMY_TABLE_NAME + "_copy")
+        copy_job_mock.configuration = CopyJobConfig(operation_type="SNAPSHOT",
+                                                    destination_expiration_time="2030-01-02T03:04:05.12Z")
+        copy_job_mock.labels = {"label1": "label1_value"}
+        copy_job_mock.create_disposition = None
+        copy_job_mock.write_disposition = "WRITE_EMPTY"
+        copy_job_mock.state = "DONE"
+        copy_job_mock.error_result = error_result if has_error else None
+        copy_job_mock.created = datetime.now()
+        return copy_job_mock
+
     def __setup_client(self, bigquery_module_patch, return_value=None, location=None):
         project_id = "some-project-id"
         bigquery_module_patch.Client.return_value = self.client_mock
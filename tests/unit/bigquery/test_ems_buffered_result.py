@@ -0,0 +1,101 @@
+import importlib.util
+from datetime import datetime
+from decimal import Decimal
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from bigquery.ems_buffered_result import EmsBufferedResult, estimate_size
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+ROWS = [{"id": i, "name": f"name-{i}", "created": datetime(2020, 1, 1 + i % 28)} for i in range(100)]
+NESTED_ROWS = [{"id": i, "amount": Decimal("1.50"), "tags": [f"tag-{i}", None], "payload": {"key": i, "raw": b"x"}}
+               for i in range(50)]
+
+
+class TestEmsBufferedResult(TestCase):
+
+    def test_len_countsRowsInMemoryAndOnDisk(self):
+        with EmsBufferedResult(iter(ROWS), max_memory_bytes=1000) as result:
+            self.assertEqual(100, len(result))
+            self.assertGreater(result.memory_row_count, 0)
+            self.assertGreater(result.spilled_row_count, 0)
+            self.assertEqual(100, result.memory_row_count + result.spilled_row_count)
+
+    def test_iter_canBeRepeated(self):
+        with EmsBufferedResult(iter(ROWS), max_memory_bytes=1000) as result:
+            self.assertEqual(ROWS, list(result))
+            self.assertEqual(ROWS, list(result))
+
+    def test_getitem_supportsIndexesAndSlices(self):
+        with EmsBufferedResult(iter(ROWS), max_memory_bytes=1000) as result:
+            self.assertEqual(ROWS[0], result[0])
+            self.assertEqual(ROWS[-1], result[-1])
+            self.assertEqual(ROWS[5:80:7], result[5:80:7])
+            self.assertEqual(ROWS[::-1], result[::-1])
+            with self.assertRaises(IndexError):
+                _ = result[100]
+
+    def test_keepsEverythingInMemoryWithinBudget(self):
+        with EmsBufferedResult(iter(ROWS)) as result:
+            self.assertEqual(0, result.spilled_row_count)
+            self.assertEqual(["id", "name", "created"], result.columns)
+            self.assertEqual(ROWS[42], result[42])
+
+    def test_emptyResult(self):
+        result = EmsBufferedResult(iter([]), max_memory_bytes=0)
+
+        self.assertEqual(0, len(result))
+        self.assertEqual([], list(result))
+        self.assertEqual([], result.columns)
+
+    def test_close_preventsReadingSpilledRows(self):
+        result = EmsBufferedResult(iter(ROWS), max_memory_bytes=0)
+        result.close()
+
+        with self.assertRaises(ValueError):
+            _ = result[0]
+
+    def test_spilledSegmentsRoundTripAndAreReadInAnyOrder(self):
+        with EmsBufferedResult(iter(NESTED_ROWS), max_memory_bytes=0, spill_batch_rows=8) as result:
+            self.assertEqual(50, result.spilled_row_count)
+            self.assertEqual(NESTED_ROWS, list(result))
+            self.assertEqual(NESTED_ROWS[::-3], result[::-3])
+
+    @skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_spill_writesArrowRecordBatchesWhenPyarrowIsInstalled(self):
+        with EmsBufferedResult(iter(ROWS), max_memory_bytes=0, spill_batch_rows=30) as result:
+            self.assertEqual(4, result.arrow_segment_count)
+            self.assertEqual(ROWS, list(result))
+
+    @skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_spill_picklesSegmentsWithoutArrowType(self):
+        rows = [{"value": 1}, {"value": "mixed"}, {"value": 2}]
+
+        with EmsBufferedResult(iter(rows), max_memory_bytes=0, spill_batch_rows=2) as result:
+            self.assertEqual(1, result.arrow_segment_count)
+            self.assertEqual(rows, list(result))
+
+    @skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_spill_keepsDictsWithDifferentKeysAsTheyAre(self):
+        rows = [{"id": 1, "payload": {"a": 1}, "items": [{"b": 2}]},
+                {"id": 2, "payload": {"b": "x"}, "items": [{"c": 3}]},
+                {"id": 3, "payload": None, "items": []}]
+
+        with EmsBufferedResult(iter(rows), max_memory_bytes=0) as result:
+            self.assertEqual(0, result.arrow_segment_count)
+            self.assertEqual(rows, list(result))
+
+    def test_spill_picklesSegmentsWithoutPyarrow(self):
+        with patch("bigquery.ems_buffered_result.importlib.util.find_spec", return_value=None):
+            result = EmsBufferedResult(iter(ROWS), max_memory_bytes=0, spill_batch_rows=30)
+
+        with result:
+            self.assertEqual(0, result.arrow_segment_count)
+            self.assertEqual(ROWS, list(result))
+
+    def test_estimate_size_countsNestedValues(self):
+        flat = estimate_size(("a",))
+        nested = estimate_size(({"key": ["x" * 1000]},))
+
+        self.assertGreater(nested, flat + 1000)
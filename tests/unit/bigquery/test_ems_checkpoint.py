@@ -0,0 +1,169 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from unittest import TestCase
+from unittest.mock import Mock
+
+from google.api_core.exceptions import NotFound
+
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.ems_checkpoint import EmsCheckpointedPipeline, EmsCheckpointStatus, EmsCheckpointStore
+from bigquery.job.ems_job_state import EmsJobState
+from bigquery.job.ems_query_job import EmsQueryJob
+
+
+class TestEmsCheckpointStore(TestCase):
+
+    def test_checkpointsSurviveReopeningTheStore(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoints.db")
+            with EmsCheckpointStore(path) as store:
+                store.mark_running("nightly", "load", "job-1")
+                store.mark_done("nightly", "extract", "job-2")
+
+            with EmsCheckpointStore(path) as store:
+                load = store.get("nightly", "load")
+                extract = store.get("nightly", "extract")
+
+        self.assertEqual((load.status, load.job_id), (EmsCheckpointStatus.RUNNING, "job-1"))
+        self.assertEqual((extract.status, extract.job_id), (EmsCheckpointStatus.DONE, "job-2"))
+
+    def test_checkpointsAreKeyedByJobIdPrefix(self):
+        store = EmsCheckpointStore(":memory:")
+        store.mark_done("nightly", "load", "job-1")
+
+        self.assertIsNone(store.get("hourly", "load"))
+        self.assertEqual([checkpoint.step_name for checkpoint in store.get_all("nightly")], ["load"])
+
+        store.clear("nightly")
+        self.assertEqual(store.get_all("nightly"), [])
+
+
+class TestEmsCheckpointedPipeline(TestCase):
+
+    def setUp(self):
+        self.client_mock = Mock(EmsBigqueryClient)
+        self.store = EmsCheckpointStore(":memory:")
+        self.pipeline = EmsCheckpointedPipeline(self.client_mock, self.store, "nightly", job_timeout_seconds=60)
+        self.launch = Mock(side_effect=lambda prefix: prefix + "new")
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_run_job_launchesWaitsAndRecordsJob(self):
+        job_id = self.pipeline.run_job("load", self.launch)
+
+        self.assertEqual(job_id, "nightly-load-new")
+        self.launch.assert_called_once_with("nightly-load-")
+        self.client_mock.wait_for_job_done.assert_called_once_with("nightly-load-new", 60)
+        self.assertEqual(self.pipeline.completed_steps, ["load"])
+
+    def test_run_job_skipsCompletedStep(self):
+        self.store.mark_done("nightly", "load", "old-job")
+
+        job_id = self.pipeline.run_job("load", self.launch)
+
+        self.assertEqual(job_id, "old-job")
+        self.launch.assert_not_called()
+        self.client_mock.get_job.assert_not_called()
+
+    def test_run_job_reattachesInFlightJob(self):
+        self.store.mark_running("nightly", "load", "old-job")
+        self.client_mock.get_job.return_value = self.__job("old-job", EmsJobState.RUNNING)
+
+        job_id = self.pipeline.run_job("load", self.launch)
+
+        self.assertEqual(job_id, "old-job")
+        self.launch.assert_not_called()
+        self.client_mock.wait_for_job_done.assert_called_once_with("old-job", 60)
+        self.assertEqual(self.store.get("nightly", "load").status, EmsCheckpointStatus.DONE)
+
+    def test_run_job_marksJobFinishedWhileProcessWasDownAsDone(self):
+        self.store.mark_running("nightly", "load", "old-job")
+        self.client_mock.get_job.return_value = self.__job("old-job", EmsJobState.DONE)
+
+        self.assertEqual(self.pipeline.run_job("load", self.launch), "old-job")
+        self.client_mock.wait_for_job_done.assert_not_called()
+
+    def test_run_job_relaunchesFailedInFlightJob(self):
+        self.store.mark_running("nightly", "load", "old-job")
+        self.client_mock.get_job.return_value = self.__job("old-job", EmsJobState.DONE, {"reason": "boom"})
+
+        job_id = self.pipeline.run_job("load", self.launch)
+
+        self.assertEqual(job_id, "nightly-load-new")
+        self.assertEqual(self.store.get("nightly", "load").job_id, "nightly-load-new")
+
+    def test_run_job_relaunchesJobThatIsNotFound(self):
+        self.store.mark_running("nightly", "load", "old-job")
+        self.client_mock.get_job.side_effect = NotFound("old-job")
+
+        job_id = self.pipeline.run_job("load", self.launch)
+
+        self.assertEqual(job_id, "nightly-load-new")
+        self.launch.assert_called_once_with("nightly-load-")
+
+    def test_run_job_recordsLaunchBeforeCallingLaunch(self):
+        def launch(prefix):
+            self.assertEqual(self.store.get("nightly", "load").status, EmsCheckpointStatus.LAUNCHING)
+            return prefix + "new"
+
+        self.pipeline.run_job("load", launch)
+
+        self.client_mock.get_jobs_with_prefix.assert_not_called()
+
+    def test_run_job_reattachesJobLaunchedBeforeItsIdWasRecorded(self):
+        self.store.mark_launching("nightly", "load")
+        launched_at = self.store.get("nightly", "load").updated
+        self.client_mock.get_jobs_with_prefix.return_value = [
+            self.__job("nightly-load-first", EmsJobState.DONE, {"reason": "boom"}, datetime(2030, 1, 1, 1)),
+            self.__job("nightly-load-second", EmsJobState.RUNNING, created=datetime(2030, 1, 1, 2)),
+        ]
+
+        job_id = self.pipeline.run_job("load", self.launch)
+
+        self.assertEqual(job_id, "nightly-load-second")
+        self.launch.assert_not_called()
+        prefix, min_creation_time = self.client_mock.get_jobs_with_prefix.call_args[0]
+        self.assertEqual(prefix, "nightly-load-")
+        self.assertLess(min_creation_time, launched_at)
+        self.assertEqual(self.client_mock.get_jobs_with_prefix.call_args[1], {"max_result": 1000})
+        self.client_mock.wait_for_job_done.assert_called_once_with("nightly-load-second", 60)
+
+    def test_run_job_launchesWhenNoJobWasLaunchedBeforeCrash(self):
+        self.store.mark_launching("nightly", "load")
+        self.client_mock.get_jobs_with_prefix.return_value = []
+
+        self.assertEqual(self.pipeline.run_job("load", self.launch), "nightly-load-new")
+
+    def test_run_job_leavesStepRunningWhenWaitFails(self):
+        self.client_mock.wait_for_job_done.side_effect = RuntimeError("crash")
+
+        with self.assertRaises(RuntimeError):
+            self.pipeline.run_job("load", self.launch)
+
+        self.assertEqual(self.store.get("nightly", "load").status, EmsCheckpointStatus.RUNNING)
+
+    def test_run_job_rejectsStepNameContainingSeparator(self):
+        with self.assertRaises(ValueError):
+            self.pipeline.run_job("load-extra", self.launch)
+
+        self.launch.assert_not_called()
+        self.assertIsNone(self.store.get("nightly", "load-extra"))
+
+    def test_run_step_runsActionOnlyOnce(self):
+        action = Mock()
+
+        self.assertTrue(self.pipeline.run_step("import", action))
+        self.assertFalse(self.pipeline.run_step("import", action))
+
+        action.assert_called_once_with()
+
+    @staticmethod
+    def __job(job_id: str, state: EmsJobState, error_result: dict = None, created: datetime = None) -> EmsQueryJob:
+        job = Mock(EmsQueryJob)
+        job.job_id = job_id
+        job.created = None if created is None else created.replace(tzinfo=timezone.utc)
+        job.state = state
+        job.is_failed = error_result is not None
+        return job
@@ -0,0 +1,41 @@
+from datetime import date
+from decimal import Decimal
+from unittest import TestCase, skipUnless
+
+from bigquery.ems_dataframe import iter_dataframes, to_dataframe
+from tests.unit.bigquery.dataframe_helper import HAS_DATAFRAME_DEPENDENCIES, create_table
+
+
+@skipUnless(HAS_DATAFRAME_DEPENDENCIES, "pandas and pyarrow are not installed")
+class TestEmsDataframe(TestCase):
+
+    def test_to_dataframe_mapsBigqueryTypesExplicitly(self):
+        dataframe = to_dataframe(create_table(4))
+
+        self.assertEqual(str(dataframe["id"].dtype), "Int64")
+        self.assertEqual(str(dataframe["flag"].dtype), "boolean")
+        self.assertEqual(dataframe["name"].dtype.name, "string")
+        self.assertEqual(str(dataframe["score"].dtype), "float64")
+        self.assertIn("UTC", str(dataframe["created"].dtype))
+        self.assertEqual(dataframe["amount"][0], Decimal("1.5"))
+        self.assertEqual(dataframe["day"][0], date(2020, 1, 1))
+        self.assertTrue(dataframe["id"].isna()[0])
+        self.assertEqual(dataframe["id"][1], 1)
+
+    def test_iter_dataframes_yieldsFixedSizeChunks(self):
+        batches = create_table(10).to_batches(max_chunksize=3)
+
+        chunks = list(iter_dataframes(batches, 4))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 2])
+        self.assertEqual(list(chunks[1]["name"]), ["name4", "name5", "name6", "name7"])
+
+    def test_iter_dataframes_splitsBatchesLargerThanChunk(self):
+        chunks = list(iter_dataframes(create_table(7).to_batches(), 3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(list(chunks[2]["name"]), ["name6"])
+
+    def test_iter_dataframes_rejectsNonPositiveChunkSize(self):
+        with self.assertRaises(ValueError):
+            list(iter_dataframes([], 0))
@@ -0,0 +1,86 @@
+import gzip
+import importlib.util
+import io
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from unittest import TestCase, skipUnless
+
+from bigquery.ems_export_reader import read_export_stream
+from bigquery.job.config.ems_extract_job_config import Compression, DestinationFormat
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+HAS_FASTAVRO = importlib.util.find_spec("fastavro") is not None
+
+SCHEMA = {"fields": [{"name": "id", "type": "INT64"},
+                     {"name": "price", "type": "NUMERIC"},
+                     {"name": "ratio", "type": "FLOAT64"},
+                     {"name": "active", "type": "BOOL"},
+                     {"name": "day", "type": "DATE"},
+                     {"name": "at", "type": "TIMESTAMP"},
+                     {"name": "local", "type": "DATETIME"},
+                     {"name": "clock", "type": "TIME"},
+                     {"name": "name", "type": "STRING"}]}
+
+CSV_SHARD = (b"id,price,ratio,active,day,at,local,clock,name\n"
+             b"1,1.50,0.25,true,2020-01-02,2020-01-02 03:04:05.5 UTC,2020-01-02T03:04:05,03:04:05.123,alice\n"
+             b"2,,,false,,,,,\n")
+
+TYPED_ROWS = [
+    {"id": 1, "price": Decimal("1.50"), "ratio": 0.25, "active": True, "day": date(2020, 1, 2),
+     "at": datetime(2020, 1, 2, 3, 4, 5, 500000, tzinfo=timezone.utc), "local": datetime(2020, 1, 2, 3, 4, 5),
+     "clock": time(3, 4, 5, 123000), "name": "alice"},
+    {"id": 2, "price": None, "ratio": None, "active": False, "day": None, "at": None, "local": None, "clock": None,
+     "name": None},
+]
+
+
+class TestEmsExportReader(TestCase):
+
+    def test_csv_withSchema_convertsValues(self):
+        rows = list(read_export_stream(io.BytesIO(gzip.compress(CSV_SHARD)), compression=Compression.GZIP,
+                                       schema=SCHEMA))
+
+        self.assertEqual(TYPED_ROWS, rows)
+
+    def test_csv_withoutSchema_keepsStrings(self):
+        rows = list(read_export_stream(io.BytesIO(b"id;name\n1;alice\n"), field_delimiter=";"))
+
+        self.assertEqual([{"id": "1", "name": "alice"}], rows)
+
+    def test_json_withSchema_convertsStringEncodedValues(self):
+        shard = b'{"id": "3", "price": "2.5", "active": true, "name": ""}\n'
+
+        rows = list(read_export_stream(io.BytesIO(shard), DestinationFormat.NEWLINE_DELIMITED_JSON, schema=SCHEMA))
+
+        self.assertEqual([{"id": 3, "price": Decimal("2.5"), "active": True, "name": ""}], rows)
+
+    def test_rejectsCompressionNotSupportedForTextFormats(self):
+        with self.assertRaises(ValueError):
+            list(read_export_stream(io.BytesIO(b""), compression=Compression.SNAPPY))
+
+    @skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_parquet_yieldsTypedRows(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        sink = io.BytesIO()
+        pyarrow.parquet.write_table(pyarrow.table({"id": [1, 2], "name": ["alice", None]}), sink,
+                                    compression="SNAPPY")
+        sink.seek(0)
+
+        rows = list(read_export_stream(sink, DestinationFormat.PARQUET, Compression.SNAPPY))
+
+        self.assertEqual([{"id": 1, "name": "alice"}, {"id": 2, "name": None}], rows)
+
+    @skipUnless(HAS_FASTAVRO, "fastavro is not installed")
+    def test_avro_yieldsTypedRows(self):
+        import fastavro
+
+        schema = {"type": "record", "name": "Row", "fields": [{"name": "id", "type": "long"}]}
+        sink = io.BytesIO()
+        fastavro.writer(sink, schema, [{"id": 1}, {"id": 2}], codec="deflate")
+        sink.seek(0)
+
+        rows = list(read_export_stream(sink, DestinationFormat.AVRO, Compression.DEFLATE))
+
+        self.assertEqual([{"id": 1}, {"id": 2}], rows)
@@ -0,0 +1,104 @@
+import threading
+from unittest import TestCase
+from unittest.mock import Mock
+
+from bigquery.ems_api_error import EmsApiError
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.ems_query_dag import EmsQueryDagExecutor, EmsQueryNode, EmsQueryNodeStatus
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+
+
+class TestEmsQueryDagExecutor(TestCase):
+
+    def setUp(self):
+        self.client_mock = Mock(EmsBigqueryClient)
+        self.client_mock.project_id = "some-project-id"
+        self.client_mock.run_async_query.side_effect = lambda query, prefix, config: prefix + "job"
+        self.failing_job_ids = set()
+        self.client_mock.wait_for_job_done.side_effect = self.__wait_for_job_done
+
+    def test_run_executesNodesInDependencyOrder(self):
+        nodes = [EmsQueryNode("c", "SELECT 3", depends_on=["b"]),
+                 EmsQueryNode("b", "SELECT 2", depends_on=["a"]),
+                 EmsQueryNode("a", "SELECT 1")]
+
+        events = list(EmsQueryDagExecutor(self.client_mock).run(nodes, "nightly"))
+
+        self.assertEqual(["a", "b", "c"], [event.node_name for event in events])
+        self.assertTrue(all(event.status == EmsQueryNodeStatus.SUCCEEDED for event in events))
+        self.assertEqual("nightly-a-job", events[0].job_id)
+
+    def test_run_infersDependenciesFromDestinationTables(self):
+        producer_config = EmsQueryJobConfig(destination_dataset="ds", destination_table="intermediate")
+        nodes = [EmsQueryNode("consumer", "SELECT * FROM `some-project-id.ds.intermediate`"),
+                 EmsQueryNode("unrelated", "SELECT * FROM `ds.intermediate_other`"),
+                 EmsQueryNode("producer", "SELECT 1", producer_config)]
+
+        events = list(EmsQueryDagExecutor(self.client_mock, max_parallelism=1).run(nodes, "p"))
+
+        self.assertEqual(["unrelated", "producer", "consumer"], [event.node_name for event in events])
+
+    def test_run_respectsMaxParallelism(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def wait_for_job_done(job_id, timeout):
+            with lock:
+                running.append(job_id)
+                peak.append(len(running))
+            threading.Event().wait(0.01)
+            with lock:
+                running.remove(job_id)
+
+        self.client_mock.wait_for_job_done.side_effect = wait_for_job_done
+        nodes = [EmsQueryNode(f"n{i}", "SELECT 1") for i in range(10)]
+
+        events = list(EmsQueryDagExecutor(self.client_mock, max_parallelism=3).run(nodes, "p"))
+
+        self.assertEqual(10, len(events))
+        self.assertLessEqual(max(peak), 3)
+
+    def test_run_skipsRemainingNodesAfterFailure(self):
+        self.failing_job_ids.add("p-b-job")
+        nodes = [EmsQueryNode("a", "SELECT 1"),
+                 EmsQueryNode("b", "SELECT 2", depends_on=["a"]),
+                 EmsQueryNode("c", "SELECT 3", depends_on=["b"])]
+        executor = EmsQueryDagExecutor(self.client_mock)
+
+        events = list(executor.run(nodes, "p"))
+
+        self.assertEqual([("a", EmsQueryNodeStatus.SUCCEEDED),
+                          ("b", EmsQueryNodeStatus.FAILED),
+                          ("c", EmsQueryNodeStatus.SKIPPED)],
+                         [(event.node_name, event.status) for event in events])
+        self.assertIsInstance(events[1].error, EmsApiError)
+        self.assertEqual(["b"], executor.failed_nodes)
+
+    def test_resume_relaunchesFailedNodeWithRetryPrefix(self):
+        self.failing_job_ids.add("p-b-job")
+        nodes = [EmsQueryNode("a", "SELECT 1"),
+                 EmsQueryNode("b", "SELECT 2", depends_on=["a"]),
+                 EmsQueryNode("c", "SELECT 3", depends_on=["b"])]
+        executor = EmsQueryDagExecutor(self.client_mock)
+        list(executor.run(nodes, "p"))
+
+        events = list(executor.resume())
+
+        self.assertEqual(["b", "c"], [event.node_name for event in events])
+        self.assertEqual("p-b-retry-1-job", events[0].job_id)
+        self.assertEqual("p-c-job", events[1].job_id)
+        self.assertEqual([], executor.failed_nodes)
+
+    def test_run_rejectsCyclesAndUnknownDependencies(self):
+        executor = EmsQueryDagExecutor(self.client_mock)
+
+        with self.assertRaises(ValueError):
+            executor.run([EmsQueryNode("a", "SELECT 1", depends_on=["b"]),
+                          EmsQueryNode("b", "SELECT 2", depends_on=["a"])], "p")
+        with self.assertRaises(ValueError):
+            executor.run([EmsQueryNode("a", "SELECT 1", depends_on=["missing"])], "p")
+
+    def __wait_for_job_done(self, job_id, timeout):
+        if job_id in self.failing_job_ids:
+            raise EmsApiError("job failed")
@@ -0,0 +1,106 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import TestCase, skipUnless
+from unittest.mock import Mock, patch
+
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.ems_query_fanout import EmsQueryFanout
+from bigquery.ems_query_template import EmsQueryTemplate
+
+SHARD_ROWS = {
+    1: [{"id": 1}, {"id": 4}, {"id": 7}],
+    2: [{"id": 2}, {"id": 5}],
+    3: [{"id": 3}, {"id": 6}, {"id": 8}],
+}
+
+
+@patch("bigquery.ems_query_fanout.EmsBigqueryClient")
+class TestEmsQueryFanout(TestCase):
+
+    def setUp(self):
+        self.client_mock = Mock(EmsBigqueryClient)
+        self.client_mock.project_id = "some-project-id"
+        self.client_mock.location = "EU"
+        self.executor = ThreadPoolExecutor(max_workers=3)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_run_mergesRowsOfEveryShard(self, client_class_patch):
+        self.__setup_shards(client_class_patch)
+        fanout = EmsQueryFanout(self.client_mock, executor=self.executor)
+
+        rows = list(fanout.run("SELECT * FROM t WHERE shard = @shard", [{"shard": 1}, {"shard": 2}, {"shard": 3}]))
+
+        self.assertCountEqual([row["id"] for row in rows], range(1, 9))
+        client_class_patch.assert_called_with("some-project-id", "EU")
+
+    def test_run_withSortKey_kWayMergesOrderedShards(self, client_class_patch):
+        self.__setup_shards(client_class_patch)
+        fanout = EmsQueryFanout(self.client_mock, executor=self.executor)
+
+        rows = fanout.run("SELECT * FROM t WHERE shard = @shard ORDER BY id",
+                          [{"shard": 3}, {"shard": 1}, {"shard": 2}],
+                          sort_key=lambda row: row["id"])
+
+        self.assertEqual([row["id"] for row in rows], list(range(1, 9)))
+
+    def test_run_usesTemplateQueryAndShardJobIdPrefixes(self, client_class_patch):
+        self.__setup_shards(client_class_patch)
+        fanout = EmsQueryFanout(self.client_mock, executor=self.executor)
+        template = EmsQueryTemplate("shards", "SELECT *\n  FROM t\n  WHERE shard = @shard")
+
+        list(fanout.run(template, [{"shard": 1}, {"shard": 2}], job_id_prefix="backfill"))
+
+        run_sync_query = client_class_patch.return_value.run_sync_query
+        self.assertEqual({call[0][0] for call in run_sync_query.call_args_list}, {template.query})
+        self.assertCountEqual([call[1]["job_id_prefix"] for call in run_sync_query.call_args_list],
+                              ["backfill-shard0-", "backfill-shard1-"])
+
+    def test_run_withSortKey_yieldsRowsBeforeShardsFinish(self, client_class_patch):
+        first_row_merged = threading.Event()
+
+        def rows(query, **kwargs):
+            shard = kwargs["query_parameters"]["shard"]
+            yield from SHARD_ROWS[shard][:1]
+            self.assertTrue(first_row_merged.wait(timeout=10))
+            yield from SHARD_ROWS[shard][1:]
+
+        client_class_patch.return_value.run_sync_query.side_effect = rows
+        fanout = EmsQueryFanout(self.client_mock, executor=self.executor, page_rows=1)
+
+        merged = fanout.run("SELECT * FROM t WHERE shard = @shard ORDER BY id",
+                            [{"shard": 1}, {"shard": 2}, {"shard": 3}],
+                            sort_key=lambda row: row["id"])
+
+        self.assertEqual({"id": 1}, next(merged))
+        first_row_merged.set()
+        self.assertEqual([row["id"] for row in merged], list(range(2, 9)))
+
+    def test_run_raisesErrorOfFailedShard(self, client_class_patch):
+        client_class_patch.return_value.run_sync_query.side_effect = RuntimeError("shard failed")
+        fanout = EmsQueryFanout(self.client_mock, executor=self.executor)
+
+        with self.assertRaises(RuntimeError):
+            list(fanout.run("SELECT * FROM t WHERE shard = @shard", [{"shard": 1}, {"shard": 2}]))
+
+    @skipUnless("fork" in multiprocessing.get_all_start_methods(), "forked workers inherit the patched client")
+    def test_run_inProcessPool_streamsPagesOfEveryShard(self, client_class_patch):
+        self.__setup_shards(client_class_patch)
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("fork")) as executor:
+            fanout = EmsQueryFanout(self.client_mock, executor=executor, page_rows=2)
+
+            unsorted_rows = list(fanout.run("SELECT * FROM t WHERE shard = @shard",
+                                            [{"shard": 1}, {"shard": 2}, {"shard": 3}]))
+            sorted_rows = list(fanout.run("SELECT * FROM t WHERE shard = @shard ORDER BY id",
+                                          [{"shard": 1}, {"shard": 2}, {"shard": 3}],
+                                          sort_key=lambda row: row["id"]))
+
+        self.assertCountEqual([row["id"] for row in unsorted_rows], range(1, 9))
+        self.assertEqual([row["id"] for row in sorted_rows], list(range(1, 9)))
+
+    @staticmethod
+    def __setup_shards(client_class_patch):
+        client_class_patch.return_value.run_sync_query.side_effect = \
+            lambda query, **kwargs: iter(SHARD_ROWS[kwargs["query_parameters"]["shard"]])
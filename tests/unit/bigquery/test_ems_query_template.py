@@ -0,0 +1,79 @@
+from unittest import TestCase
+
+from bigquery.ems_query_parameter import EmsScalarQueryParameter
+from bigquery.ems_query_template import EmsQueryTemplate, EmsQueryTemplateRegistry, normalize_query
+
+
+class TestEmsQueryTemplate(TestCase):
+
+    def test_normalize_query_collapsesWhitespaceAndDropsComments(self):
+        query = """
+            SELECT id,   name -- the name
+            FROM `p.d.t`  /* block
+            comment */ WHERE name = @name  # trailing
+        """
+
+        self.assertEqual("SELECT id, name FROM `p.d.t` WHERE name = @name", normalize_query(query))
+
+    def test_normalize_query_keepsLiteralsUntouched(self):
+        query = "SELECT 'a  --  b', \"c\\\"  d\", '''e\n  f''' FROM `my  table`"
+
+        self.assertEqual(query, normalize_query(query))
+
+    def test_fingerprint_isEqualForDifferentlyFormattedTemplates(self):
+        first = EmsQueryTemplate("q", "SELECT *\n  FROM t\n  WHERE id = @id")
+        second = EmsQueryTemplate("q", "SELECT * FROM t WHERE id = @id -- by id")
+
+        self.assertEqual(first.normalized_query, second.normalized_query)
+        self.assertEqual(first.fingerprint, second.fingerprint)
+
+    def test_normalize_query_treatsBackslashInRawLiteralsAsText(self):
+        query = r"""SELECT r'C:\', '  a  --b  ', RB"x\", br'''y\'''"""
+
+        self.assertEqual(query, normalize_query(query))
+
+    def test_query_isTheOriginalText(self):
+        query = "SELECT 'a  b'  -- comment\nFROM t"
+
+        self.assertEqual(query, EmsQueryTemplate("q", query).query)
+
+    def test_cache_key_dependsOnParameters(self):
+        template = EmsQueryTemplate("q", "SELECT * FROM t WHERE id = @id AND tag IN UNNEST(@tags)")
+
+        key = template.cache_key({"id": 1, "tags": ["a", "b"]})
+
+        self.assertEqual(key, template.cache_key({"tags": ["a", "b"], "id": 1}))
+        self.assertEqual(key, template.cache_key({"id": EmsScalarQueryParameter("id", 1), "tags": ["a", "b"]}))
+        self.assertNotEqual(key, template.cache_key({"id": 2, "tags": ["a", "b"]}))
+        self.assertNotEqual(key, template.cache_key({"id": "1", "tags": ["a", "b"]}))
+
+    def test_registry_registersAndReturnsTemplates(self):
+        registry = EmsQueryTemplateRegistry()
+
+        template = registry.register("by_id", "SELECT * FROM t WHERE id = @id")
+        registry.register("by_id", "SELECT *  FROM t WHERE id = @id")
+
+        self.assertIn("by_id", registry)
+        self.assertEqual(1, len(registry))
+        self.assertEqual(template.fingerprint, registry.get("by_id").fingerprint)
+
+    def test_registry_keepsFirstTextOfFingerprint(self):
+        registry = EmsQueryTemplateRegistry()
+
+        first = registry.register("by_id", "SELECT * FROM t WHERE id = @id")
+        again = registry.register("by_id", "SELECT *\n  FROM t\n  WHERE id = @id")
+        other_name = registry.register("by_id_2", "SELECT * FROM t  WHERE id = @id -- same")
+
+        self.assertIs(first, again)
+        self.assertEqual("SELECT * FROM t WHERE id = @id", registry.get("by_id").query)
+        self.assertEqual("SELECT * FROM t WHERE id = @id", other_name.query)
+        self.assertEqual("by_id_2", other_name.name)
+
+    def test_registry_rejectsConflictingTemplates(self):
+        registry = EmsQueryTemplateRegistry()
+        registry.register("by_id", "SELECT * FROM t WHERE id = @id")
+
+        with self.assertRaises(ValueError):
+            registry.register("by_id", "SELECT * FROM t WHERE other_id = @id")
+        with self.assertRaises(KeyError):
+            registry.get("missing")
@@ -0,0 +1,181 @@
+import concurrent.futures
+from unittest import TestCase
+from unittest.mock import Mock
+
+from google.api_core.exceptions import BadRequest
+
+from bigquery.ems_api_error import EmsApiError
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.ems_statement_batcher import EmsStatementBatcher
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+from bigquery.job.ems_job_state import EmsJobState
+from bigquery.job.ems_query_job import EmsQueryJob
+
+
+class TestEmsStatementBatcher(TestCase):
+
+    def setUp(self):
+        self.client_mock = Mock(EmsBigqueryClient)
+        self.client_mock.run_async_query.side_effect = lambda script, prefix, config: f"{prefix}job"
+        self.client_mock.get_child_jobs.side_effect = self.__child_jobs
+        self.scripts = {}
+
+    def test_flush_runsStatementsAsOneScript(self):
+        batcher = EmsStatementBatcher(self.client_mock, job_id_prefix="cleanup")
+        batcher.add("DELETE FROM t WHERE id = 1;")
+        batcher.add("UPDATE t SET x = 2 WHERE id = 2")
+
+        results = batcher.flush()
+
+        self.client_mock.run_async_query.assert_called_once()
+        script = self.client_mock.run_async_query.call_args[0][0]
+        self.assertEqual(script, "DELETE FROM t WHERE id = 1;\nUPDATE t SET x = 2 WHERE id = 2;\n")
+        self.assertEqual([result.num_dml_affected_rows for result in results], [1, 1])
+        self.assertEqual([result.job_id for result in results], ["child0", "child1"])
+        self.assertEqual(batcher.pending_statement_count, 0)
+
+    def test_add_startsNewScriptWhenSizeLimitIsReached(self):
+        statement = "DELETE FROM t WHERE id = 1"
+        batcher = EmsStatementBatcher(self.client_mock, job_id_prefix="cleanup",
+                                      max_script_bytes=2 * (len(statement) + 2))
+
+        with batcher:
+            for _ in range(5):
+                batcher.add(statement)
+
+        self.assertEqual([call[0][1] for call in self.client_mock.run_async_query.call_args_list],
+                         ["cleanup-script0-", "cleanup-script1-", "cleanup-script2-"])
+        self.assertEqual(len(batcher.results), 5)
+
+    def test_add_rejectsStatementLongerThanLimit(self):
+        batcher = EmsStatementBatcher(self.client_mock, max_script_bytes=10)
+
+        with self.assertRaises(ValueError):
+            batcher.add("DELETE FROM t WHERE id = 1")
+
+    def test_flush_withTransaction_wrapsScriptAndSkipsTransactionChildJobs(self):
+        batcher = EmsStatementBatcher(self.client_mock, transactional=True,
+                                      ems_query_job_config=EmsQueryJobConfig())
+        batcher.add("DELETE FROM t WHERE id = 1")
+
+        results = batcher.flush()
+
+        script = self.client_mock.run_async_query.call_args[0][0]
+        self.assertTrue(script.startswith("BEGIN TRANSACTION;\n"))
+        self.assertTrue(script.endswith("COMMIT TRANSACTION;"))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].statement_type, "DELETE")
+
+    def test_flush_whenScriptFails_reportsExecutedAndFailedStatements(self):
+        self.client_mock.wait_for_job_done.side_effect = BadRequest("boom")
+        self.client_mock.get_child_jobs.side_effect = lambda job_id: [
+            self.__job("child0", "UPDATE", 1, start_line=1),
+            self.__job("child1", "UPDATE", None, {"message": "bad"}, start_line=2),
+        ]
+        batcher = EmsStatementBatcher(self.client_mock)
+        for index in range(3):
+            batcher.add(f"UPDATE t SET x = {index} WHERE TRUE")
+
+        with self.assertRaises(EmsApiError) as context:
+            batcher.flush()
+
+        self.assertIn("UPDATE t SET x = 1 WHERE TRUE", context.exception.args[0])
+        self.assertEqual([result.executed for result in batcher.results], [True, True, False])
+        self.assertEqual([result.is_failed for result in batcher.results], [False, True, False])
+        self.assertEqual([result.rolled_back for result in batcher.results], [False, False, False])
+
+    def test_flush_withTransaction_whenScriptFails_reportsExecutedStatementsAsRolledBack(self):
+        self.client_mock.wait_for_job_done.side_effect = BadRequest("boom")
+        self.client_mock.get_child_jobs.side_effect = lambda job_id: [
+            self.__job("begin", "BEGIN_TRANSACTION", None, start_line=1),
+            self.__job("child0", "UPDATE", 1, start_line=2),
+            self.__job("child1", "UPDATE", None, {"message": "bad"}, start_line=3),
+            self.__job("rollback", "ROLLBACK_TRANSACTION", None),
+        ]
+        self.client_mock.get_job.return_value = self.__job("job", None, None, {"message": "bad"})
+        batcher = EmsStatementBatcher(self.client_mock, transactional=True)
+        for index in range(3):
+            batcher.add(f"UPDATE t SET x = {index} WHERE TRUE")
+
+        with self.assertRaises(EmsApiError) as context:
+            batcher.flush()
+
+        self.assertIn("transaction rolled back", context.exception.args[0])
+        self.assertEqual([result.job_id for result in batcher.results], ["child0", "child1", None])
+        self.assertEqual([result.rolled_back for result in batcher.results], [True, True, False])
+
+    def test_flush_withTransaction_whenScriptJobIsNotDone_doesNotReportRollback(self):
+        self.client_mock.wait_for_job_done.side_effect = BadRequest("boom")
+        self.client_mock.get_job.return_value = EmsQueryJob("job", "", EmsQueryJobConfig(), EmsJobState.RUNNING, None)
+        batcher = EmsStatementBatcher(self.client_mock, transactional=True)
+        batcher.add("UPDATE t SET x = 1 WHERE TRUE")
+
+        with self.assertRaises(EmsApiError) as context:
+            batcher.flush()
+
+        self.assertNotIn("transaction rolled back", context.exception.args[0])
+        self.assertEqual([result.rolled_back for result in batcher.results], [False])
+
+    def test_flush_whenWaitTimesOut_raisesTimeoutWithoutReportingResults(self):
+        self.client_mock.wait_for_job_done.side_effect = concurrent.futures.TimeoutError()
+        batcher = EmsStatementBatcher(self.client_mock, transactional=True, job_timeout_seconds=1)
+        batcher.add("UPDATE t SET x = 1 WHERE TRUE")
+
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            batcher.flush()
+
+        self.assertEqual(batcher.results, [])
+        self.client_mock.get_child_jobs.assert_not_called()
+
+    def test_flush_matchesChildJobsByStartLineWhenCreationTimesTie(self):
+        self.client_mock.get_child_jobs.side_effect = lambda job_id: [
+            self.__job("second", "UPDATE", 2, start_line=3),
+            self.__job("first", "DELETE", 1, start_line=1),
+        ]
+        batcher = EmsStatementBatcher(self.client_mock)
+        batcher.add("DELETE FROM t\nWHERE id = 1")
+        batcher.add("UPDATE t SET x = 2 WHERE id = 2")
+
+        results = batcher.flush()
+
+        self.assertEqual([result.job_id for result in results], ["first", "second"])
+        self.assertEqual([result.statement_type for result in results], ["DELETE", "UPDATE"])
+
+    def test_flush_withoutScriptStatistics_matchesChildJobsByStatementText(self):
+        self.client_mock.get_child_jobs.side_effect = lambda job_id: [
+            self.__job("second", "UPDATE", 2, query="UPDATE t SET x = 2 WHERE id = 2"),
+            self.__job("first", "DELETE", 1, query="DELETE FROM t WHERE id = 1"),
+            self.__job("third", "DELETE", 3, query="DELETE FROM t WHERE id = 1;"),
+        ]
+        batcher = EmsStatementBatcher(self.client_mock)
+        batcher.add("DELETE FROM t WHERE id = 1")
+        batcher.add("UPDATE t SET x = 2 WHERE id = 2")
+        batcher.add("DELETE FROM t WHERE id = 1")
+
+        results = batcher.flush()
+
+        self.assertEqual([result.job_id for result in results], ["first", "second", "third"])
+
+    def test_flush_withoutStatements_doesNotRunJob(self):
+        self.assertEqual(EmsStatementBatcher(self.client_mock).flush(), [])
+        self.client_mock.run_async_query.assert_not_called()
+
+    def __child_jobs(self, job_id: str):
+        script = self.client_mock.run_async_query.call_args[0][0]
+        jobs = []
+        first_statement_line = 2 if script.startswith("BEGIN TRANSACTION") else 1
+        for line, statement in enumerate(script.rstrip(";\n").split(";\n"), start=1):
+            if statement.startswith("BEGIN TRANSACTION"):
+                jobs.append(self.__job("begin", "BEGIN_TRANSACTION", None, start_line=line))
+            elif statement.startswith("COMMIT TRANSACTION"):
+                jobs.append(self.__job("commit", "COMMIT_TRANSACTION", None, start_line=line))
+            else:
+                jobs.append(self.__job(f"child{line - first_statement_line}", "DELETE", 1, start_line=line))
+        return jobs
+
+    @staticmethod
+    def __job(job_id: str, statement_type: str, affected_rows: int, error_result: dict = None, query: str = "",
+              start_line: int = None) -> EmsQueryJob:
+        return EmsQueryJob(job_id, query, EmsQueryJobConfig(), EmsJobState.DONE, error_result,
+                           statement_type=statement_type, num_dml_affected_rows=affected_rows,
+                           script_start_line=start_line)
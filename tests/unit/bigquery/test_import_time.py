@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+IMPORT_BENCHMARK = """
+import sys
+import time
+
+start = time.perf_counter()
+import bigquery
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.job.config.ems_query_job_config import EmsQueryJobConfig
+elapsed = time.perf_counter() - start
+
+print(elapsed)
+print(",".join(name for name in ("google.cloud.bigquery.client", "grpc") if name in sys.modules))
+"""
+
+SDK_AFTER_TOOLKIT = """
+import bigquery
+from bigquery.ems_bigquery_client import EmsBigqueryClient
+from bigquery.ems_checkpoint import EmsCheckpointedPipeline
+import google.api_core.exceptions
+import google.cloud.bigquery
+
+print(google.cloud.bigquery.Client.__name__, google.api_core.exceptions.NotFound.__name__)
+"""
+
+
+class TestImportTime(TestCase):
+    MAX_IMPORT_SECONDS = 0.5
+
+    def test_import_bigquery_staysWithinBudgetAndDefersGoogleDependencies(self):
+        output = subprocess.run([sys.executable, "-c", IMPORT_BENCHMARK],
+                                cwd=REPO_ROOT,
+                                check=True,
+                                stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout.splitlines()
+        elapsed, loaded_modules = float(output[0]), output[1]
+
+        self.assertEqual("", loaded_modules)
+        self.assertLess(elapsed, self.MAX_IMPORT_SECONDS)
+
+    def test_import_sdk_afterToolkit_resolvesItsAttributes(self):
+        output = subprocess.run([sys.executable, "-c", SDK_AFTER_TOOLKIT],
+                                cwd=REPO_ROOT,
+                                check=True,
+                                stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+
+        self.assertEqual("Client NotFound", output.strip())
+
+    def test_bigquery_package_exportsClientLazily(self):
+        import bigquery
+        from bigquery.ems_bigquery_client import EmsBigqueryClient
+
+        self.assertIs(bigquery.EmsBigqueryClient, EmsBigqueryClient)
+        self.assertIn("EmsBigqueryClient", dir(bigquery))
+        with self.assertRaises(AttributeError):
+            getattr(bigquery, "NoSuchThing")
@@ -0,0 +1,41 @@
+import importlib.util
+from unittest import TestCase
+from unittest.mock import patch
+
+from pubsub.ems_compression import EmsCompression, check_compression_dependencies, compress, decompress
+
+HAS_ZSTANDARD = importlib.util.find_spec("zstandard") is not None
+
+PAYLOAD = b'{"event": "purchase"}' * 100
+
+
+class TestEmsCompression(TestCase):
+
+    def test_gzip_roundTrips(self):
+        compressed = compress(PAYLOAD, EmsCompression.GZIP)
+
+        self.assertLess(len(compressed), len(PAYLOAD))
+        self.assertEqual(decompress(compressed, "gzip"), PAYLOAD)
+
+    def test_none_leavesDataAsItIs(self):
+        self.assertIs(compress(PAYLOAD, EmsCompression.NONE), PAYLOAD)
+        self.assertIs(decompress(PAYLOAD), PAYLOAD)
+
+    def test_decompress_leavesIdentityAndUnknownEncodingsAsTheyAre(self):
+        self.assertIs(decompress(PAYLOAD, "identity"), PAYLOAD)
+        self.assertIs(decompress(PAYLOAD, "br"), PAYLOAD)
+
+    def test_zstd_roundTripsWhenInstalled(self):
+        if not HAS_ZSTANDARD:
+            with self.assertRaises(ImportError):
+                check_compression_dependencies(EmsCompression.ZSTD)
+            return
+
+        self.assertEqual(decompress(compress(PAYLOAD, EmsCompression.ZSTD), "zstd"), PAYLOAD)
+
+    def test_zstd_withoutZstandard_raisesImportError(self):
+        with patch("pubsub.ems_compression.zstandard", None):
+            with self.assertRaises(ImportError):
+                compress(PAYLOAD, EmsCompression.ZSTD)
+            with self.assertRaises(ImportError):
+                decompress(PAYLOAD, "zstd")
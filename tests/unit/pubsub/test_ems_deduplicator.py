@@ -0,0 +1,68 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from pubsub.ems_deduplicator import EmsBloomDeduplicator, EmsLruDeduplicator
+from pubsub.ems_message import EmsMessage
+
+
+def create_message(message_id: str, attributes: dict = None) -> EmsMessage:
+    return EmsMessage("ack-" + message_id, b"{}", attributes or {}, message_id)
+
+
+class TestEmsLruDeduplicator(TestCase):
+
+    def test_is_duplicate_onlyAfterRemember(self):
+        deduplicator = EmsLruDeduplicator()
+        message = create_message("1")
+
+        self.assertFalse(deduplicator.is_duplicate(message))
+        deduplicator.remember(message)
+        self.assertTrue(deduplicator.is_duplicate(create_message("1")))
+        self.assertEqual((deduplicator.hits, deduplicator.misses, deduplicator.hit_ratio), (1, 1, 0.5))
+
+    def test_remember_evictsLeastRecentlyUsedKey(self):
+        deduplicator = EmsLruDeduplicator(max_size=2)
+        for message_id in ["1", "2"]:
+            deduplicator.remember(create_message(message_id))
+        deduplicator.is_duplicate(create_message("1"))
+
+        deduplicator.remember(create_message("3"))
+
+        self.assertEqual(len(deduplicator), 2)
+        self.assertTrue(deduplicator.is_duplicate(create_message("1")))
+        self.assertFalse(deduplicator.is_duplicate(create_message("2")))
+
+    def test_keyAttribute_isUsedInsteadOfMessageId(self):
+        deduplicator = EmsLruDeduplicator(key_attribute="event_id")
+        deduplicator.remember(create_message("1", {"event_id": "e"}))
+
+        self.assertTrue(deduplicator.is_duplicate(create_message("2", {"event_id": "e"})))
+        self.assertFalse(deduplicator.is_duplicate(create_message("1")))
+
+
+@patch("pubsub.ems_deduplicator.time.monotonic", return_value=0)
+class TestEmsBloomDeduplicator(TestCase):
+
+    def test_filterIsSizedForFalsePositiveRate(self, _):
+        deduplicator = EmsBloomDeduplicator(expected_items=1000, false_positive_rate=0.01)
+
+        self.assertEqual(deduplicator.bit_count, 9586)
+        self.assertEqual(deduplicator.hash_count, 7)
+
+    def test_is_duplicate_recognizesRememberedKeysWithoutFalseNegatives(self, _):
+        deduplicator = EmsBloomDeduplicator(expected_items=1000, false_positive_rate=0.01)
+        for index in range(1000):
+            deduplicator.remember(create_message(str(index)))
+
+        self.assertTrue(all(deduplicator.is_duplicate(create_message(str(index))) for index in range(1000)))
+        false_positives = sum(deduplicator.is_duplicate(create_message(f"new-{index}")) for index in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_keysExpireAfterTwoWindows(self, monotonic_patch):
+        deduplicator = EmsBloomDeduplicator(window_seconds=10)
+        deduplicator.remember(create_message("1"))
+
+        monotonic_patch.return_value = 15
+        self.assertTrue(deduplicator.is_duplicate(create_message("1")))
+        monotonic_patch.return_value = 26
+        self.assertFalse(deduplicator.is_duplicate(create_message("1")))
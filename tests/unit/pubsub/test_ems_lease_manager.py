@@ -0,0 +1,125 @@
+import threading
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from pubsub.ems_lease_manager import EmsLeaseManager, EmsProcessingTimeHistogram
+
+
+class TestEmsProcessingTimeHistogram(TestCase):
+
+    def test_percentile_withoutObservations_returnsMinimumDeadline(self):
+        self.assertEqual(EmsProcessingTimeHistogram().percentile(99), 10)
+
+    def test_percentile_returnsP99OfClampedSeconds(self):
+        histogram = EmsProcessingTimeHistogram()
+        for _ in range(98):
+            histogram.add(2)
+        histogram.add(45.2)
+        histogram.add(5000)
+
+        self.assertEqual(histogram.percentile(99), 600)
+        self.assertEqual(histogram.percentile(98), 46)
+        self.assertEqual(histogram.percentile(50), 10)
+        self.assertEqual(len(histogram), 100)
+
+    @patch("pubsub.ems_lease_manager.time.monotonic")
+    def test_percentile_forgetsObservationsOfExpiredWindows(self, monotonic_patch):
+        histogram = EmsProcessingTimeHistogram(window_seconds=60, window_count=2)
+        monotonic_patch.return_value = 0
+        histogram.add(300)
+        monotonic_patch.return_value = 60
+        histogram.add(20)
+
+        self.assertEqual(histogram.percentile(99), 300)
+
+        monotonic_patch.return_value = 120
+        self.assertEqual(histogram.percentile(99), 20)
+        self.assertEqual(len(histogram), 1)
+        monotonic_patch.return_value = 180
+        self.assertEqual(histogram.percentile(99), 10)
+
+
+@patch("pubsub.ems_lease_manager.time.monotonic")
+class TestEmsLeaseManager(TestCase):
+
+    def setUp(self):
+        self.modify_ack_deadline = Mock()
+        self.lease_manager = EmsLeaseManager(self.modify_ack_deadline, max_lease_duration=100)
+
+    def tearDown(self):
+        self.lease_manager.close()
+
+    def test_lease_extendsDeadlineRightAway(self, monotonic_patch):
+        monotonic_patch.return_value = 0
+
+        self.lease_manager.lease("subscription", ["a", "b"])
+
+        self.modify_ack_deadline.assert_called_with("subscription", ["a", "b"], 10)
+        self.assertEqual(self.lease_manager.leased_count, 2)
+
+    def test_extend_due_leases_renewsLeasesPastHalfOfDeadlineInOneCall(self, monotonic_patch):
+        monotonic_patch.return_value = 0
+        self.lease_manager.lease("subscription", ["a", "b"])
+        monotonic_patch.return_value = 3
+        self.lease_manager.lease("subscription", ["c"])
+        self.modify_ack_deadline.reset_mock()
+
+        monotonic_patch.return_value = 6
+        wait_seconds = self.lease_manager.extend_due_leases()
+
+        self.modify_ack_deadline.assert_called_once_with("subscription", ["a", "b"], 10)
+        self.assertEqual(wait_seconds, 2)
+
+    def test_release_recordsProcessingTimeForDeadline(self, monotonic_patch):
+        monotonic_patch.return_value = 0
+        self.lease_manager.lease("subscription", ["a"])
+        monotonic_patch.return_value = 42.5
+
+        self.lease_manager.release(["a"])
+
+        self.assertEqual(self.lease_manager.ack_deadline_seconds, 43)
+        self.assertEqual(self.lease_manager.leased_count, 0)
+
+    def test_release_withoutRecording_keepsDeadline(self, monotonic_patch):
+        monotonic_patch.return_value = 0
+        self.lease_manager.lease("subscription", ["a"])
+        monotonic_patch.return_value = 42.5
+
+        self.lease_manager.release(["a"], record_processing_time=False)
+
+        self.assertEqual(self.lease_manager.ack_deadline_seconds, 10)
+
+    def test_extend_due_leases_dropsLeasesOverMaxLeaseDuration(self, monotonic_patch):
+        monotonic_patch.return_value = 0
+        self.lease_manager.lease("subscription", ["a"])
+        self.modify_ack_deadline.reset_mock()
+        monotonic_patch.return_value = 100
+
+        self.lease_manager.extend_due_leases()
+
+        self.modify_ack_deadline.assert_not_called()
+        self.assertEqual(self.lease_manager.leased_count, 0)
+
+    def test_extend_due_leases_passesDroppedAckIdsToOnExpire(self, monotonic_patch):
+        on_expire = Mock()
+        lease_manager = EmsLeaseManager(self.modify_ack_deadline, max_lease_duration=100, on_expire=on_expire)
+        monotonic_patch.return_value = 0
+        lease_manager.lease("subscription", ["a"])
+        monotonic_patch.return_value = 50
+        lease_manager.lease("subscription", ["b"])
+        monotonic_patch.return_value = 100
+
+        lease_manager.extend_due_leases()
+        lease_manager.close()
+
+        on_expire.assert_called_once_with(["a"])
+
+    def test_close_stopsLeaseThread(self, monotonic_patch):
+        monotonic_patch.return_value = 0
+        self.lease_manager.lease("subscription", ["a"])
+        threads = [thread for thread in threading.enumerate() if thread.name == "ems-lease-manager"]
+
+        self.lease_manager.close()
+
+        self.assertTrue(threads)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
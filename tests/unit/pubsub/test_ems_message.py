@@ -1,8 +1,30 @@
+import gzip
+import importlib.util
+import json
+import pickle
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List
 from unittest import TestCase
+from unittest.mock import Mock, patch
 
+from pubsub.ems_json_decoder import get_json_decoder, set_json_decoder, use_fast_json_decoder
 from pubsub.ems_message import EmsMessage
 
 
+@dataclass
+class Customer:
+    id: int
+    name: str = None
+
+
+@dataclass
+class Order:
+    customer: Customer
+    items: List[str]
+
+
 class TestEmsMessage(TestCase):
 
     @staticmethod
@@ -15,3 +37,117 @@ class TestEmsMessage(TestCase):
     @staticmethod
     def test_constructorWontThrowOnInvalidData():
         EmsMessage("ackId", b"Invalid json", dict())
+
+    def test_messageIsPicklable(self):
+        message = EmsMessage("ackId", b'{"a":"v"}', {"key": "value"})
+
+        unpickled = pickle.loads(pickle.dumps(message))
+
+        self.assertEqual(unpickled.ack_id, "ackId")
+        self.assertEqual(unpickled.attributes, {"key": "value"})
+        self.assertEqual(unpickled.data_json, {"a": "v"})
+
+    def test_messageIdAndPublishTime_defaultToNone(self):
+        message = EmsMessage("ackId", b"{}", {})
+
+        self.assertIsNone(message.message_id)
+        self.assertIsNone(message.publish_time)
+
+    def test_messageIdAndPublishTime_survivePickling(self):
+        publish_time = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        message = EmsMessage("ackId", b"{}", {}, "messageId", publish_time)
+
+        unpickled = pickle.loads(pickle.dumps(message))
+
+        self.assertEqual(unpickled.message_id, "messageId")
+        self.assertEqual(unpickled.publish_time, publish_time)
+
+    def test_messageHasNoInstanceDict(self):
+        message = EmsMessage("ackId", b"{}", {})
+
+        with self.assertRaises(AttributeError):
+            message.extra = 1  # pylint: disable=assigning-non-slot
+
+    def test_dataJson_usesConfiguredDecoderOnce(self):
+        decoder = Mock(return_value={"a": "v"})
+        set_json_decoder(decoder)
+        self.addCleanup(set_json_decoder)
+        message = EmsMessage("ackId", b'{"a":"v"}', {})
+
+        self.assertEqual(message.data_json, {"a": "v"})
+        self.assertEqual(message.data_json, {"a": "v"})
+        decoder.assert_called_once_with(b'{"a":"v"}')
+
+    def test_dataJson_usesStandardLibraryByDefault(self):
+        self.assertIs(get_json_decoder(), json.loads)
+
+    def test_useFastJsonDecoder_withoutFastDecoder_raisesImportError(self):
+        with patch("pubsub.ems_json_decoder.importlib.import_module", side_effect=ImportError):
+            with self.assertRaises(ImportError):
+                use_fast_json_decoder()
+
+        self.assertIs(get_json_decoder(), json.loads)
+
+    def test_useFastJsonDecoder_raisesJsonDecodeErrorForDecoderErrors(self):
+        class DecodeError(Exception):
+            pass
+
+        def decode(data):
+            raise DecodeError(f"truncated {data!r}")
+
+        modules = {"msgspec.json": SimpleNamespace(decode=decode), "msgspec": SimpleNamespace(DecodeError=DecodeError)}
+
+        def import_module(name):
+            if name not in modules:
+                raise ImportError(name)
+            return modules[name]
+
+        with patch("pubsub.ems_json_decoder.importlib.import_module", side_effect=import_module):
+            decoder = use_fast_json_decoder()
+        self.addCleanup(set_json_decoder)
+
+        self.assertIs(get_json_decoder(), decoder)
+        with self.assertRaises(json.JSONDecodeError):
+            _ = EmsMessage("ackId", b'{"a":', {}).data_json
+
+    def test_dataAs_fillsNestedDataclassesAndIgnoresUnknownKeys(self):
+        message = EmsMessage("ackId", json.dumps({"customer": {"id": 1, "extra": True}, "items": ["a"]}).encode(), {})
+
+        self.assertEqual(message.data_as(Order), Order(Customer(1), ["a"]))
+
+    def test_dataAs_raisesValueErrorOnMismatchingPayload(self):
+        with self.assertRaises(ValueError):
+            EmsMessage("ackId", b'{"items": []}', {}).data_as(Order)
+        with self.assertRaises(ValueError):
+            EmsMessage("ackId", b"[1]", {}).data_as(Customer)
+        with self.assertRaises(ValueError):
+            EmsMessage("ackId", b"{}", {}).data_as(dict)
+
+    def test_dataAs_decodesMsgspecStructs(self):
+        if importlib.util.find_spec("msgspec") is None:
+            self.skipTest("msgspec is not installed")
+        import msgspec  # pylint: disable=import-outside-toplevel,import-error
+
+        class Event(msgspec.Struct):  # pylint: disable=too-few-public-methods
+            id: int
+
+        self.assertEqual(EmsMessage("ackId", b'{"id": 1, "x": 2}', {}).data_as(Event), Event(1))
+
+    def test_dataRaw_decompressesLazilyOnce(self):
+        message = EmsMessage("ackId", gzip.compress(b'{"a":"v"}'), {"ems-content-encoding": "gzip"})
+
+        with patch("pubsub.ems_message.decompress", side_effect=lambda data, _: gzip.decompress(data)) \
+                as decompress_patch:
+            decompress_patch.assert_not_called()
+            self.assertEqual(message.data_json, {"a": "v"})
+            self.assertEqual(message.data_raw, b'{"a":"v"}')
+
+        decompress_patch.assert_called_once()
+
+    def test_dataRaw_leavesPayloadOfOtherEncodingsAsItIs(self):
+        for attributes in ({"content-encoding": "identity"}, {"content-encoding": "gzip"},
+                           {"ems-content-encoding": "identity"}, {"ems-content-encoding": "br"}):
+            message = EmsMessage("ackId", b'{"a":"v"}', attributes)
+
+            self.assertEqual(message.data_raw, b'{"a":"v"}')
+            self.assertEqual(message.data_json, {"a": "v"})
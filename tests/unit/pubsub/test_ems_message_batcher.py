@@ -0,0 +1,105 @@
+import threading
+from unittest import TestCase
+from unittest.mock import Mock
+
+from google.cloud.pubsub_v1.subscriber.message import Message
+
+from pubsub.ems_deduplicator import EmsLruDeduplicator
+from pubsub.ems_message_batcher import DEFAULT_MAX_WAIT_SECONDS, EmsMessageBatcher, EmsMessageBatchSettings
+
+
+def create_message(ack_id: str, data: bytes = b"{}") -> Message:
+    message = Mock(Message)
+    message.ack_id = ack_id
+    message.data = data
+    message.attributes = {}
+    message.size = len(data)
+    message.message_id = "message-" + ack_id
+    message.publish_time = None
+    return message
+
+
+class TestEmsMessageBatcher(TestCase):
+
+    def test_add_deliversBatchWhenMaxMessagesIsReached(self):
+        callback = Mock()
+        batcher = EmsMessageBatcher(callback, EmsMessageBatchSettings(max_messages=2))
+        messages = [create_message("1"), create_message("2"), create_message("3")]
+
+        for message in messages:
+            batcher.add(message)
+
+        callback.assert_called_once()
+        self.assertEqual([message.ack_id for message in callback.call_args[0][0]], ["1", "2"])
+        messages[0].ack.assert_called_once_with()
+        messages[1].ack.assert_called_once_with()
+        messages[2].ack.assert_not_called()
+
+    def test_add_deliversBatchWhenMaxBytesIsReached(self):
+        callback = Mock()
+        batcher = EmsMessageBatcher(callback, EmsMessageBatchSettings(max_messages=100, max_bytes=10))
+
+        batcher.add(create_message("1", b"12345"))
+        callback.assert_not_called()
+        batcher.add(create_message("2", b"12345"))
+
+        self.assertEqual(len(callback.call_args[0][0]), 2)
+
+    def test_failingCallback_nacksWholeBatch(self):
+        batcher = EmsMessageBatcher(Mock(side_effect=RuntimeError("boom")),
+                                    EmsMessageBatchSettings(max_messages=2))
+        messages = [create_message("1"), create_message("2")]
+
+        for message in messages:
+            batcher.add(message)
+
+        for message in messages:
+            message.nack.assert_called_once_with()
+            message.ack.assert_not_called()
+
+    def test_maxWait_deliversPartialBatch(self):
+        delivered = threading.Event()
+        batcher = EmsMessageBatcher(lambda batch: delivered.set(),
+                                    EmsMessageBatchSettings(max_messages=100, max_wait=0.05))
+        message = create_message("1")
+
+        batcher.add(message)
+
+        self.assertTrue(delivered.wait(2))
+        batcher.close()
+        message.ack.assert_called_once_with()
+
+    def test_close_nacksOpenBatchAndLaterMessages(self):
+        callback = Mock()
+        batcher = EmsMessageBatcher(callback, EmsMessageBatchSettings(max_messages=100))
+        pending = create_message("1")
+        batcher.add(pending)
+
+        batcher.close()
+        late = create_message("2")
+        batcher.add(late)
+
+        pending.nack.assert_called_once_with()
+        late.nack.assert_called_once_with()
+        callback.assert_not_called()
+
+    def test_add_withDeduplicator_acksRedeliveredMessageOfDeliveredBatch(self):
+        callback = Mock()
+        batcher = EmsMessageBatcher(callback, EmsMessageBatchSettings(max_messages=1),
+                                    deduplicator=EmsLruDeduplicator())
+        batcher.add(create_message("1"))
+        redelivered = create_message("1")
+
+        batcher.add(redelivered)
+
+        callback.assert_called_once()
+        redelivered.ack.assert_called_once_with()
+
+    def test_rejectsNonPositiveMaxMessages(self):
+        with self.assertRaises(ValueError):
+            EmsMessageBatchSettings(max_messages=0)
+
+    def test_settings_haveFiniteMaxWaitByDefault(self):
+        self.assertEqual(EmsMessageBatchSettings(max_messages=10).max_wait, DEFAULT_MAX_WAIT_SECONDS)
+        with self.assertRaises(ValueError):
+            EmsMessageBatchSettings(max_messages=10, max_wait=None)
@@ -0,0 +1,54 @@
+import json
+import logging
+import time
+from dataclasses import dataclass
+from unittest import TestCase
+
+from pubsub.ems_json_decoder import get_json_decoder
+from pubsub.ems_message import EmsMessage
+
+LOGGER = logging.getLogger(__name__)
+
+PAYLOAD = json.dumps({
+    "customer_id": 123456,
+    "event_type": "purchase",
+    "event_time": "2020-01-01T00:00:00Z",
+    "items": [{"item_id": f"item-{index}", "price": 9.99, "quantity": 2} for index in range(5)],
+}).encode("utf-8")
+
+
+@dataclass
+class Event:
+    customer_id: int
+    event_type: str
+    event_time: str
+    items: list
+
+
+class TestEmsMessageDecodingBenchmark(TestCase):
+    MESSAGE_COUNT = 20000
+    MIN_MESSAGES_PER_SECOND = 5000
+
+    def test_dataJson_decodesMessagesPerSecond(self):
+        rate = self.__measure(lambda message: message.data_json)
+
+        LOGGER.info("data_json with %s: %.0f messages/s", self.__decoder_name(), rate)
+        self.assertGreater(rate, self.MIN_MESSAGES_PER_SECOND)
+
+    def test_dataAs_decodesMessagesPerSecond(self):
+        rate = self.__measure(lambda message: message.data_as(Event))
+
+        LOGGER.info("data_as with %s: %.0f messages/s", self.__decoder_name(), rate)
+        self.assertGreater(rate, self.MIN_MESSAGES_PER_SECOND)
+
+    def __measure(self, decode) -> float:
+        messages = [EmsMessage(f"ack-{index}", PAYLOAD, {}) for index in range(self.MESSAGE_COUNT)]
+        start = time.perf_counter()
+        for message in messages:
+            decode(message)
+        return self.MESSAGE_COUNT / (time.perf_counter() - start)
+
+    @staticmethod
+    def __decoder_name() -> str:
+        decoder = get_json_decoder()
+        return f"{decoder.__module__}.{decoder.__name__}"
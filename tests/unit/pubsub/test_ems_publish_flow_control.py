@@ -0,0 +1,50 @@
+import threading
+from unittest import TestCase
+
+from pubsub.ems_publish_flow_control import EmsFlowControlBehavior, EmsPublishFlowController, \
+    FlowControlLimitExceededError
+
+
+class TestEmsPublishFlowController(TestCase):
+
+    def test_acquire_tracksOutstandingMessagesAndBytes(self):
+        controller = EmsPublishFlowController(max_messages=10, max_bytes=100)
+
+        controller.acquire(30)
+        controller.acquire(20)
+        controller.release(30)
+
+        self.assertEqual((controller.outstanding_messages, controller.outstanding_bytes), (1, 20))
+
+    def test_acquire_withErrorBehavior_raisesWhenLimitIsReached(self):
+        controller = EmsPublishFlowController(max_messages=1, behavior=EmsFlowControlBehavior.ERROR)
+        controller.acquire(1)
+
+        with self.assertRaises(FlowControlLimitExceededError):
+            controller.acquire(1)
+
+    def test_acquire_withDropBehavior_dropsMessagesOverByteLimit(self):
+        controller = EmsPublishFlowController(max_bytes=10, behavior=EmsFlowControlBehavior.DROP)
+
+        self.assertTrue(controller.acquire(8))
+        self.assertFalse(controller.acquire(8))
+        self.assertEqual((controller.outstanding_messages, controller.dropped_messages), (1, 1))
+
+    def test_acquire_letsOversizedMessageThroughWhenNothingIsOutstanding(self):
+        controller = EmsPublishFlowController(max_bytes=10, behavior=EmsFlowControlBehavior.ERROR)
+
+        self.assertTrue(controller.acquire(50))
+
+    def test_acquire_withBlockBehavior_waitsForRelease(self):
+        controller = EmsPublishFlowController(max_messages=1)
+        controller.acquire(1)
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: acquired.set() if controller.acquire(1) else None)
+
+        waiter.start()
+        self.assertFalse(acquired.wait(0.1))
+        controller.release(1)
+        waiter.join(1)
+
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(controller.outstanding_messages, 1)
@@ -0,0 +1,160 @@
+import gzip
+import json
+from concurrent.futures import Future
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from google.cloud.pubsub_v1.types import BatchSettings
+from google.protobuf.timestamp_pb2 import Timestamp  # pylint: disable=no-name-in-module
+from google.pubsub_v1.types import Encoding, Schema, SchemaSettings, Topic
+
+from pubsub.ems_compression import EmsCompression, EmsCompressionSettings
+from pubsub.ems_message import EmsMessage
+from pubsub.ems_publish_flow_control import EmsFlowControlBehavior, EmsPublishFlowControl, MessageDroppedError
+from pubsub.ems_publisher_batch_settings import EmsPublisherBatchSettings
+from pubsub.ems_publisher_client import EmsPublisherClient
+from pubsub.ems_schema_registry import EmsSchemaRegistry
+
+
+@patch("pubsub.ems_publisher_client.PublisherClient")
+class TestEmsPublisherClient(TestCase):
+
+    def test_constructor_passesBatchSettingsAndPublisherOptions(self, publisher_client_patch):
+        client = EmsPublisherClient(EmsPublisherBatchSettings(max_messages=500, max_latency=0.05,
+                                                              enable_message_ordering=True))
+
+        kwargs = publisher_client_patch.call_args[1]
+        self.assertEqual(kwargs["batch_settings"], BatchSettings(max_messages=500, max_latency=0.05))
+        self.assertEqual(kwargs["batch_settings"].max_bytes, BatchSettings().max_bytes)
+        self.assertTrue(kwargs["publisher_options"].enable_message_ordering)
+        self.assertEqual(client.batch_settings.max_messages, 500)
+
+    def test_publish_withCompression_compressesPayloadsAboveThreshold(self, publisher_client_patch):
+        payload = json.dumps([{"event": "purchase", "index": index} for index in range(100)]).encode("utf-8")
+        client = EmsPublisherClient(compression=EmsCompressionSettings(EmsCompression.GZIP, threshold_bytes=1024))
+
+        client.publish("topic", payload, key="v")
+
+        kwargs = publisher_client_patch.return_value.publish.call_args[1]
+        self.assertEqual(kwargs["ems-content-encoding"], "gzip")
+        self.assertLess(len(kwargs["data"]), len(payload) / 4)
+        self.assertEqual(gzip.decompress(kwargs["data"]), payload)
+        received = EmsMessage("ackId", kwargs["data"], {"key": kwargs["key"], "ems-content-encoding": "gzip"})
+        self.assertEqual(received.data_raw, payload)
+
+    def test_publish_withCompression_leavesSmallAndIncompressiblePayloadsAsTheyAre(self, publisher_client_patch):
+        client = EmsPublisherClient(compression=EmsCompressionSettings(EmsCompression.GZIP, threshold_bytes=16))
+
+        client.publish("topic", b"small")
+        client.publish("topic", bytes(range(32)))
+
+        for call in publisher_client_patch.return_value.publish.call_args_list:
+            self.assertNotIn("ems-content-encoding", call[1])
+        self.assertEqual(publisher_client_patch.return_value.publish.call_args[1]["data"], bytes(range(32)))
+
+    def test_publish_withCompression_rejectsReservedAttribute(self, _):
+        client = EmsPublisherClient(compression=EmsCompressionSettings(EmsCompression.GZIP, threshold_bytes=0))
+
+        with self.assertRaises(ValueError):
+            client.publish("topic", b"a" * 100, **{"ems-content-encoding": "br"})
+
+    def test_publish_records_encodesWithTopicSchemaFetchedOnce(self, publisher_client_patch):
+        api = publisher_client_patch.return_value.api
+        api.get_topic.return_value = Topic(schema_settings=SchemaSettings(schema="projects/p/schemas/s",
+                                                                          encoding=Encoding.BINARY))
+        schema_client = Mock()
+        schema_client.get_schema.return_value = Schema(name="projects/p/schemas/s",
+                                                       type_=Schema.Type.PROTOCOL_BUFFER,
+                                                       definition="message Timestamp { int64 seconds = 1; }")
+        client = EmsPublisherClient(compression=EmsCompressionSettings(EmsCompression.GZIP, threshold_bytes=0),
+                                    schema_registry=EmsSchemaRegistry(schema_client, [Timestamp]))
+
+        client.publish_records("topic", [{"seconds": 1}], key="v")
+        client.publish_records("topic", [Timestamp(seconds=2)])
+
+        publish = publisher_client_patch.return_value.publish
+        publish.assert_any_call(topic="topic", data=Timestamp(seconds=1).SerializeToString(), key="v")
+        publish.assert_any_call(topic="topic", data=Timestamp(seconds=2).SerializeToString())
+        api.get_topic.assert_called_once_with(request={"topic": "topic"})
+        schema_client.get_schema.assert_called_once()
+
+    def test_publish_records_raisesForTopicWithoutSchema(self, publisher_client_patch):
+        publisher_client_patch.return_value.api.get_topic.return_value = Topic()
+
+        with self.assertRaises(ValueError):
+            EmsPublisherClient().publish_records("topic", [{}])
+
+    def test_publish_many_returnsPerMessageResultsInOrder(self, publisher_client_patch):
+        futures = [Future(), Future(), Future()]
+        publisher_client_patch.return_value.publish.side_effect = futures
+        client = EmsPublisherClient()
+
+        aggregate = client.publish_many("topic", (payload for payload in [b"a", (b"b", {"k": "v"}), b"c"]))
+
+        self.assertFalse(aggregate.done())
+        futures[2].set_result("id-c")
+        futures[0].set_result("id-a")
+        futures[1].set_exception(RuntimeError("boom"))
+
+        results = aggregate.result(timeout=1)
+        self.assertEqual([result.message_id for result in results], ["id-a", None, "id-c"])
+        self.assertIsInstance(results[1].error, RuntimeError)
+        self.assertEqual((aggregate.published_count, aggregate.failed_count), (2, 1))
+        publisher_client_patch.return_value.publish.assert_any_call(topic="topic", data=b"b", k="v")
+
+    def test_publish_many_withNoMessages_completesImmediately(self, _):
+        aggregate = EmsPublisherClient().publish_many("topic", [])
+
+        self.assertEqual(aggregate.result(timeout=1), [])
+
+    def test_publish_many_recordsSynchronousPublishErrors(self, publisher_client_patch):
+        publisher_client_patch.return_value.publish.side_effect = TypeError("data must be bytes")
+
+        results = EmsPublisherClient().publish_many("topic", ["not bytes"]).result(timeout=1)
+
+        self.assertTrue(results[0].is_failed)
+
+    def test_publish_many_recordsAnyPublishErrorAndCompletes(self, publisher_client_patch):
+        published = Future()
+        publisher_client_patch.return_value.publish.side_effect = [RuntimeError("publisher stopped"), published]
+
+        aggregate = EmsPublisherClient().publish_many("topic", [b"a", b"b"])
+        published.set_result("id-b")
+
+        results = aggregate.result(timeout=1)
+        self.assertIsInstance(results[0].error, RuntimeError)
+        self.assertEqual(results[1].message_id, "id-b")
+        self.assertEqual(aggregate.failed_count, 1)
+
+    def test_publish_tracksOutstandingMessagesUntilPublished(self, publisher_client_patch):
+        future = Future()
+        publisher_client_patch.return_value.publish.return_value = future
+        client = EmsPublisherClient()
+
+        client.publish("topic", b"12345", key="v")
+        self.assertEqual((client.outstanding_messages, client.outstanding_bytes), (1, 9))
+
+        future.set_result("id")
+        self.assertEqual((client.outstanding_messages, client.outstanding_bytes), (0, 0))
+
+    def test_publish_withDropBehavior_returnsFailedFutureOverLimit(self, publisher_client_patch):
+        publisher_client_patch.return_value.publish.return_value = Future()
+        client = EmsPublisherClient(flow_control=EmsPublishFlowControl(max_messages=1,
+                                                                       behavior=EmsFlowControlBehavior.DROP))
+
+        client.publish("topic", b"first")
+        dropped = client.publish("topic", b"second")
+
+        self.assertIsInstance(dropped.exception(timeout=1), MessageDroppedError)
+        self.assertEqual(client.dropped_messages, 1)
+        publisher_client_patch.return_value.publish.assert_called_once()
+
+    def test_publish_many_withErrorBehavior_reportsRejectedMessages(self, publisher_client_patch):
+        publisher_client_patch.return_value.publish.return_value = Future()
+        client = EmsPublisherClient(flow_control=EmsPublishFlowControl(max_messages=1,
+                                                                       behavior=EmsFlowControlBehavior.ERROR))
+
+        aggregate = client.publish_many("topic", [b"a", b"b"])
+
+        self.assertEqual(aggregate.failed_count, 1)
+        self.assertEqual(client.outstanding_messages, 1)
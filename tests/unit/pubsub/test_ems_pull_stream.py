@@ -0,0 +1,86 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import Mock
+
+from google.api_core.exceptions import DeadlineExceeded, PermissionDenied
+
+from pubsub.ems_message import EmsMessage
+from pubsub.ems_pull_stream import EmsPullStream
+from pubsub.ems_subscriber_client import EmsSubscriberClient
+
+
+class TestEmsPullStream(TestCase):
+
+    def setUp(self):
+        self.subscriber_mock = Mock(EmsSubscriberClient)
+        self.batches = [[self.__message(f"{batch}-{index}") for index in range(3)] for batch in range(4)]
+        self.lock = threading.Lock()
+        self.subscriber_mock.pull.side_effect = self.__pull
+
+    def test_iteration_yieldsMessagesOfEveryPull(self):
+        expected_ack_ids = {message.ack_id for batch in self.batches for message in batch}
+
+        with EmsPullStream(self.subscriber_mock, "subscription", max_messages_per_pull=3, pulls_in_flight=2) as stream:
+            ack_ids = {next(stream).ack_id for _ in range(12)}
+
+        self.assertEqual(ack_ids, expected_ack_ids)
+        self.subscriber_mock.pull.assert_any_call("subscription", 3)
+
+    def test_ack_sendsAcksInBatchesOfAckBatchSize(self):
+        stream = EmsPullStream(self.subscriber_mock, "subscription", pulls_in_flight=1,
+                               ack_batch_size=4, ack_max_delay=60)
+        for _ in range(8):
+            stream.ack(next(stream))
+
+        self.__wait_until(lambda: self.subscriber_mock.acknowledge.call_count == 2)
+        stream.close()
+
+        self.assertEqual([len(call[0][1]) for call in self.subscriber_mock.acknowledge.call_args_list], [4, 4])
+
+    def test_ack_sendsPartialBatchAfterMaxDelay(self):
+        stream = EmsPullStream(self.subscriber_mock, "subscription", pulls_in_flight=1,
+                               ack_batch_size=100, ack_max_delay=0.05)
+
+        stream.ack(next(stream))
+
+        self.__wait_until(lambda: self.subscriber_mock.acknowledge.call_count == 1)
+        stream.close()
+        self.assertEqual(self.subscriber_mock.acknowledge.call_args[0], ("subscription", ["0-0"]))
+
+    def test_close_sendsPendingAcksAndNacksUnyieldedMessages(self):
+        stream = EmsPullStream(self.subscriber_mock, "subscription", pulls_in_flight=1, ack_max_delay=60)
+        stream.ack(next(stream))
+        self.__wait_until(lambda: self.subscriber_mock.pull.call_count >= 2)
+
+        stream.close()
+
+        self.subscriber_mock.acknowledge.assert_called_once_with("subscription", ["0-0"])
+        nacked = [ack_id for call in self.subscriber_mock.modify_ack_deadline.call_args_list for ack_id in call[0][1]]
+        self.assertIn("0-1", nacked)
+        self.assertTrue(all(call[0][2] == 0 for call in self.subscriber_mock.modify_ack_deadline.call_args_list))
+        self.assertRaises(StopIteration, next, stream)
+
+    def test_iteration_raisesPullErrors(self):
+        self.subscriber_mock.pull.side_effect = [DeadlineExceeded("slow"), PermissionDenied("no access")]
+        stream = EmsPullStream(self.subscriber_mock, "subscription", pulls_in_flight=1)
+
+        with self.assertRaises(PermissionDenied):
+            next(stream)
+
+    def __pull(self, *_):
+        with self.lock:
+            if self.batches:
+                return iter(self.batches.pop(0))
+        time.sleep(0.01)
+        return iter([])
+
+    @staticmethod
+    def __message(ack_id: str) -> EmsMessage:
+        return EmsMessage(ack_id, b"{}", {})
+
+    @staticmethod
+    def __wait_until(condition, timeout: float = 2):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
@@ -0,0 +1,108 @@
+import importlib.util
+import json
+from unittest import TestCase, skipUnless
+from unittest.mock import Mock
+
+from google.protobuf.timestamp_pb2 import Timestamp  # pylint: disable=no-name-in-module
+from google.pubsub_v1.types import Schema
+
+from pubsub.ems_message import EmsMessage
+from pubsub.ems_schema_registry import EmsProtobufCodec, EmsSchemaRegistry
+
+HAS_FASTAVRO = importlib.util.find_spec("fastavro") is not None
+
+AVRO_SCHEMA = "projects/p/schemas/event"
+PROTOBUF_SCHEMA = "projects/p/schemas/timestamp"
+
+AVRO_DEFINITION = json.dumps({
+    "type": "record",
+    "name": "Event",
+    "fields": [{"name": "customer_id", "type": "long"}, {"name": "event_type", "type": ["null", "string"]}],
+})
+PROTOBUF_DEFINITION = """
+syntax = "proto3";
+message Timestamp {
+  int64 seconds = 1;
+  int32 nanos = 2;
+}
+"""
+
+SCHEMAS = {
+    AVRO_SCHEMA: Schema(name=AVRO_SCHEMA, type_=Schema.Type.AVRO, definition=AVRO_DEFINITION),
+    PROTOBUF_SCHEMA: Schema(name=PROTOBUF_SCHEMA, type_=Schema.Type.PROTOCOL_BUFFER, definition=PROTOBUF_DEFINITION),
+}
+
+
+def create_message(data: bytes, schema_name: str, encoding: str = "BINARY", revision_id: str = None) -> EmsMessage:
+    attributes = {"googclient_schemaname": schema_name, "googclient_schemaencoding": encoding}
+    if revision_id is not None:
+        attributes["googclient_schemarevisionid"] = revision_id
+    return EmsMessage("ackId", data, attributes)
+
+
+class TestEmsSchemaRegistry(TestCase):
+
+    def setUp(self):
+        self.schema_client = Mock()
+        self.schema_client.get_schema.side_effect = lambda request: SCHEMAS[request["name"].split("@")[0]]
+        self.registry = EmsSchemaRegistry(self.schema_client, protobuf_message_classes=[Timestamp])
+
+    def test_get_codec_fetchesSchemaOnce(self):
+        codec = self.registry.get_codec(PROTOBUF_SCHEMA)
+
+        self.assertIs(self.registry.get_codec(PROTOBUF_SCHEMA), codec)
+        self.assertIsNot(self.registry.get_codec(PROTOBUF_SCHEMA, "JSON"), codec)
+        self.schema_client.get_schema.assert_called_once_with(request={"name": PROTOBUF_SCHEMA})
+
+    def test_protobuf_roundTripsDictsAndMessages(self):
+        payloads = self.registry.encode_many(PROTOBUF_SCHEMA, [{"seconds": 1}, Timestamp(seconds=2, nanos=3)])
+
+        messages = [create_message(payload, PROTOBUF_SCHEMA) for payload in payloads]
+        self.assertEqual(self.registry.decode_messages(messages), [Timestamp(seconds=1), Timestamp(seconds=2, nanos=3)])
+
+    def test_protobufJson_roundTrips(self):
+        codec = EmsProtobufCodec(Timestamp, "JSON")
+
+        self.assertEqual(codec.decode(codec.encode({"seconds": 5})), Timestamp(seconds=5))
+
+    def test_get_codec_raisesWithoutProtobufMessageClass(self):
+        with self.assertRaises(ValueError):
+            EmsSchemaRegistry(self.schema_client).get_codec(PROTOBUF_SCHEMA)
+
+    def test_decode_messages_raisesOnMessageWithoutSchema(self):
+        with self.assertRaises(ValueError):
+            self.registry.decode_messages([EmsMessage("ackId", b"", {})])
+
+    def test_codec_rejectsUnknownEncoding(self):
+        with self.assertRaises(ValueError):
+            EmsProtobufCodec(Timestamp, "XML")
+
+    @skipUnless(HAS_FASTAVRO, "fastavro is not installed")
+    def test_decode_messages_decodesMixedSchemasAndRevisionsInOrder(self):
+        events = [{"customer_id": 1, "event_type": "purchase"}, {"customer_id": 2, "event_type": None}]
+        avro_payloads = self.registry.encode_many(AVRO_SCHEMA, events)
+        messages = [create_message(avro_payloads[0], AVRO_SCHEMA, revision_id="r1"),
+                    create_message(Timestamp(seconds=7).SerializeToString(), PROTOBUF_SCHEMA),
+                    create_message(avro_payloads[1], AVRO_SCHEMA, revision_id="r1")]
+
+        records = self.registry.decode_messages(messages)
+
+        self.assertEqual(records, [events[0], Timestamp(seconds=7), events[1]])
+        self.schema_client.get_schema.assert_any_call(request={"name": AVRO_SCHEMA + "@r1"})
+
+    @skipUnless(HAS_FASTAVRO, "fastavro is not installed")
+    def test_avroJson_roundTrips(self):
+        event = {"customer_id": 1, "event_type": "purchase"}
+
+        payload = self.registry.encode_many(AVRO_SCHEMA, [event], "JSON")[0]
+
+        self.assertEqual(json.loads(payload), {"customer_id": 1, "event_type": {"string": "purchase"}})
+        self.assertEqual(self.registry.decode_messages([create_message(payload, AVRO_SCHEMA, "JSON")]), [event])
+
+    @skipUnless(HAS_FASTAVRO, "fastavro is not installed")
+    def test_avroBinary_isSmallerThanJson(self):
+        event = {"customer_id": 123456, "event_type": "purchase"}
+
+        payload = self.registry.encode_many(AVRO_SCHEMA, [event])[0]
+
+        self.assertLess(len(payload), len(json.dumps(event)) / 3)
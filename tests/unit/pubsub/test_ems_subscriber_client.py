@@ -0,0 +1,272 @@
+from datetime import datetime, timezone
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from google.cloud.pubsub_v1.subscriber.message import Message
+
+from pubsub.ems_deduplicator import EmsLruDeduplicator
+from pubsub.ems_message import EmsMessage
+from pubsub.ems_message_batcher import EmsMessageBatchSettings
+from pubsub.ems_subscriber_client import EmsSubscriberClient
+
+PUBLISH_TIME = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+# one test per behaviour of the client, they share the SubscriberClient patch and the message helpers
+@patch("pubsub.ems_subscriber_client.SubscriberClient")
+class TestEmsSubscriberClient(TestCase):  # pylint: disable=too-many-public-methods
+
+    def test_subscribe_passesFlowControlSettings(self, subscriber_client_patch):
+        EmsSubscriberClient().subscribe("subscription", Mock(), max_messages=10, max_lease_duration=600)
+
+        flow_control = subscriber_client_patch.return_value.subscribe.call_args[1]["flow_control"]
+        self.assertEqual((flow_control.max_messages, flow_control.max_lease_duration), (10, 600))
+        self.assertEqual(flow_control.max_bytes, 100 * 1024 * 1024)
+
+    def test_subscribe_withMaxWorkers_usesSchedulerWithThreadPoolOfThatSize(self, subscriber_client_patch):
+        EmsSubscriberClient().subscribe("subscription", Mock(), max_workers=4)
+
+        scheduler = subscriber_client_patch.return_value.subscribe.call_args[1]["scheduler"]
+        self.assertEqual(scheduler._executor._max_workers, 4)  # pylint: disable=protected-access
+
+    def test_subscribe_withThreadPoolExecutor_usesItAsScheduler(self, subscriber_client_patch):
+        executor = ThreadPoolExecutor(max_workers=2)
+
+        EmsSubscriberClient().subscribe("subscription", Mock(), executor=executor)
+
+        scheduler = subscriber_client_patch.return_value.subscribe.call_args[1]["scheduler"]
+        self.assertIs(scheduler._executor, executor)  # pylint: disable=protected-access
+        executor.shutdown()
+
+    def test_subscribe_callsCallbackWithEmsMessageAndAcks(self, subscriber_client_patch):
+        callback = Mock()
+        EmsSubscriberClient().subscribe("subscription", callback)
+        message = self.__message()
+
+        subscriber_client_patch.return_value.subscribe.call_args[1]["callback"](message)
+
+        ems_message = callback.call_args[0][0]
+        self.assertEqual((ems_message.ack_id, ems_message.data_raw, ems_message.attributes),
+                         ("ack-id", b"{}", {"key": "value"}))
+        message.ack.assert_called_once_with()
+
+    def test_subscribe_withOtherExecutor_dispatchesCallbackToIt(self, subscriber_client_patch):
+        executor = Mock(Executor)
+        future = Future()
+        future.set_result(None)
+        executor.submit.return_value = future
+        callback = Mock()
+        EmsSubscriberClient().subscribe("subscription", callback, executor=executor)
+        message = self.__message()
+
+        subscriber_client_patch.return_value.subscribe.call_args[1]["callback"](message)
+
+        self.assertIs(executor.submit.call_args[0][0], callback)
+        self.assertIsInstance(executor.submit.call_args[0][1], EmsMessage)
+        callback.assert_not_called()
+        message.ack.assert_called_once_with()
+        self.assertIsNone(subscriber_client_patch.return_value.subscribe.call_args[1]["scheduler"])
+
+    def test_subscribe_doesNotAckWhenCallbackFails(self, subscriber_client_patch):
+        EmsSubscriberClient().subscribe("subscription", Mock(side_effect=RuntimeError("boom")))
+        message = self.__message()
+
+        with self.assertRaises(RuntimeError):
+            subscriber_client_patch.return_value.subscribe.call_args[1]["callback"](message)
+
+        message.ack.assert_not_called()
+
+    def test_subscribe_batched_acksBatchAfterCallback(self, subscriber_client_patch):
+        batch_callback = Mock()
+        EmsSubscriberClient().subscribe_batched("subscription", batch_callback,
+                                                EmsMessageBatchSettings(max_messages=2, max_bytes=1000))
+        subscribe_kwargs = subscriber_client_patch.return_value.subscribe.call_args[1]
+        messages = [self.__message(), self.__message()]
+
+        for message in messages:
+            subscribe_kwargs["callback"](message)
+
+        self.assertEqual(len(batch_callback.call_args[0][0]), 2)
+        for message in messages:
+            message.ack.assert_called_once_with()
+        self.assertEqual(subscribe_kwargs["flow_control"].max_messages, 1000)
+
+    def test_subscribe_batched_raisesFlowControlAboveBatchSize(self, subscriber_client_patch):
+        EmsSubscriberClient().subscribe_batched("subscription", Mock(), EmsMessageBatchSettings(max_messages=5000))
+
+        flow_control = subscriber_client_patch.return_value.subscribe.call_args[1]["flow_control"]
+        self.assertEqual(flow_control.max_messages, 10000)
+
+    def test_acknowledge_splitsAckIdsToRequestLimit(self, subscriber_client_patch):
+        EmsSubscriberClient().acknowledge("subscription", [str(index) for index in range(6000)])
+
+        requests = [call[1]["request"] for call in subscriber_client_patch.return_value.api.acknowledge.call_args_list]
+        self.assertEqual([len(request["ack_ids"]) for request in requests], [2500, 2500, 1000])
+        self.assertEqual(requests[2]["ack_ids"][-1], "5999")
+
+    def test_modify_ack_deadline_splitsAckIdsToRequestLimit(self, subscriber_client_patch):
+        EmsSubscriberClient().modify_ack_deadline("subscription", [str(index) for index in range(2501)], 30)
+
+        api = subscriber_client_patch.return_value.api
+        self.assertEqual(api.modify_ack_deadline.call_count, 2)
+        self.assertEqual(api.modify_ack_deadline.call_args[1]["request"],
+                         {"subscription": "subscription", "ack_ids": ["2500"], "ack_deadline_seconds": 30})
+
+    def test_pull_withExtendLeases_leasesUntilAcknowledged(self, subscriber_client_patch):
+        api = subscriber_client_patch.return_value.api
+        received = Mock(ack_id="ack-1", message=Mock(data=b"{}", attributes={}))
+        api.pull.return_value.received_messages = [received]
+        client = EmsSubscriberClient(extend_leases=True)
+
+        messages = list(client.pull("subscription", 10))
+        self.assertEqual(client.lease_manager.leased_count, 1)
+        self.assertEqual(api.modify_ack_deadline.call_args[1]["request"]["ack_ids"], ["ack-1"])
+
+        client.acknowledge("subscription", [messages[0].ack_id])
+        self.assertEqual(client.lease_manager.leased_count, 0)
+        client.lease_manager.close()
+
+    def test_modify_ack_deadline_withZero_endsLease(self, _):
+        client = EmsSubscriberClient(extend_leases=True)
+        client.lease_manager.lease("subscription", ["ack-1"])
+
+        client.modify_ack_deadline("subscription", ["ack-1"], 0)
+
+        self.assertEqual(client.lease_manager.leased_count, 0)
+        self.assertEqual(client.lease_manager.ack_deadline_seconds, 10)
+        client.lease_manager.close()
+
+    def test_close_stopsLeaseManagerAndClosesClient(self, subscriber_client_patch):
+        with EmsSubscriberClient(extend_leases=True) as client:
+            client.lease_manager.lease("subscription", ["ack-1"])
+
+        self.assertEqual(client.lease_manager.leased_count, 0)
+        subscriber_client_patch.return_value.close.assert_called_once_with()
+
+    def test_pull_withoutExtendLeases_doesNotModifyDeadlines(self, subscriber_client_patch):
+        api = subscriber_client_patch.return_value.api
+        api.pull.return_value.received_messages = [Mock(ack_id="ack-1", message=Mock(data=b"{}", attributes={}))]
+        client = EmsSubscriberClient()
+
+        list(client.pull("subscription", 10))
+
+        self.assertIsNone(client.lease_manager)
+        api.modify_ack_deadline.assert_not_called()
+
+    def test_subscribe_withDeduplicator_acksAndSkipsProcessedMessages(self, subscriber_client_patch):
+        callback = Mock()
+        client = EmsSubscriberClient(deduplicator=EmsLruDeduplicator())
+        client.subscribe("subscription", callback)
+        subscribe_callback = subscriber_client_patch.return_value.subscribe.call_args[1]["callback"]
+        first, redelivered = self.__message(), self.__message()
+
+        subscribe_callback(first)
+        subscribe_callback(redelivered)
+
+        callback.assert_called_once()
+        redelivered.ack.assert_called_once_with()
+        self.assertEqual(client.deduplicator.hits, 1)
+
+    def test_subscribe_withDeduplicator_redeliversMessagesWhoseCallbackFailed(self, subscriber_client_patch):
+        callback = Mock(side_effect=[RuntimeError("boom"), None])
+        EmsSubscriberClient(deduplicator=EmsLruDeduplicator()).subscribe("subscription", callback)
+        subscribe_callback = subscriber_client_patch.return_value.subscribe.call_args[1]["callback"]
+
+        with self.assertRaises(RuntimeError):
+            subscribe_callback(self.__message())
+        subscribe_callback(self.__message())
+
+        self.assertEqual(callback.call_count, 2)
+
+    def test_pull_withDeduplicator_dropsMessagesAckedBefore(self, subscriber_client_patch):
+        api = subscriber_client_patch.return_value.api
+        client = EmsSubscriberClient(deduplicator=EmsLruDeduplicator())
+        api.pull.return_value.received_messages = [self.__received_message("ack-1", "message-1")]
+        first = list(client.pull("subscription", 10))
+        client.acknowledge("subscription", [first[0].ack_id])
+        api.pull.return_value.received_messages = [self.__received_message("ack-2", "message-1"),
+                                                   self.__received_message("ack-3", "message-2")]
+
+        second = list(client.pull("subscription", 10))
+
+        self.assertEqual([message.message_id for message in second], ["message-2"])
+        self.assertEqual(api.acknowledge.call_args[1]["request"]["ack_ids"], ["ack-2"])
+
+    def test_pull_withDeduplicator_forgetsNackedMessages(self, subscriber_client_patch):
+        api = subscriber_client_patch.return_value.api
+        client = EmsSubscriberClient(deduplicator=EmsLruDeduplicator())
+        api.pull.return_value.received_messages = [self.__received_message("ack-1", "message-1")]
+        list(client.pull("subscription", 10))
+        client.modify_ack_deadline("subscription", ["ack-1"], 0)
+        client.acknowledge("subscription", ["ack-1"])
+        api.pull.return_value.received_messages = [self.__received_message("ack-2", "message-1")]
+
+        redelivered = list(client.pull("subscription", 10))
+
+        self.assertEqual([message.message_id for message in redelivered], ["message-1"])
+
+    @patch("pubsub.ems_lease_manager.time.monotonic")
+    def test_pull_withDeduplicator_forgetsMessagesWhoseLeaseExpired(self, monotonic_patch, subscriber_client_patch):
+        api = subscriber_client_patch.return_value.api
+        client = EmsSubscriberClient(extend_leases=True, max_lease_duration=100, deduplicator=EmsLruDeduplicator())
+        api.pull.return_value.received_messages = [self.__received_message("ack-1", "message-1")]
+        monotonic_patch.return_value = 0
+        list(client.pull("subscription", 10))
+        monotonic_patch.return_value = 100
+        client.lease_manager.extend_due_leases()
+        client.acknowledge("subscription", ["ack-1"])
+        api.pull.return_value.received_messages = [self.__received_message("ack-2", "message-1")]
+
+        redelivered = list(client.pull("subscription", 10))
+
+        self.assertEqual([message.message_id for message in redelivered], ["message-1"])
+        client.close()
+
+    @patch("pubsub.ems_subscriber_client.MAX_PENDING_KEYS", 1)
+    def test_pull_withDeduplicator_keepsAtMostMaxPendingKeys(self, subscriber_client_patch):
+        api = subscriber_client_patch.return_value.api
+        client = EmsSubscriberClient(deduplicator=EmsLruDeduplicator())
+        api.pull.return_value.received_messages = [self.__received_message("ack-1", "message-1"),
+                                                   self.__received_message("ack-2", "message-2")]
+        list(client.pull("subscription", 10))
+        client.acknowledge("subscription", ["ack-1", "ack-2"])
+        api.pull.return_value.received_messages = [self.__received_message("ack-3", "message-1"),
+                                                   self.__received_message("ack-4", "message-2")]
+
+        redelivered = list(client.pull("subscription", 10))
+
+        self.assertEqual([message.message_id for message in redelivered], ["message-1"])
+
+    def test_pull_returnsMessageIdAndPublishTime(self, subscriber_client_patch):
+        api = subscriber_client_patch.return_value.api
+        api.pull.return_value.received_messages = [self.__received_message("ack-1", "message-1")]
+
+        message = next(EmsSubscriberClient().pull("subscription", 10))
+
+        self.assertEqual((message.message_id, message.publish_time), ("message-1", PUBLISH_TIME))
+
+    def test_decode_records_delegatesToSchemaRegistry(self, _):
+        schema_registry = Mock()
+        messages = [EmsMessage("ack-1", b"", {})]
+
+        records = EmsSubscriberClient(schema_registry=schema_registry).decode_records(messages)
+
+        self.assertIs(records, schema_registry.decode_messages.return_value)
+        schema_registry.decode_messages.assert_called_once_with(messages)
+
+    @staticmethod
+    def __received_message(ack_id: str, message_id: str) -> Mock:
+        return Mock(ack_id=ack_id, message=Mock(data=b"{}", attributes={}, message_id=message_id,
+                                                publish_time=PUBLISH_TIME))
+
+    @staticmethod
+    def __message() -> Message:
+        message = Mock(Message)
+        message.ack_id = "ack-id"
+        message.data = b"{}"
+        message.attributes = {"key": "value"}
+        message.size = 2
+        message.message_id = "message-id"
+        message.publish_time = None
+        return message
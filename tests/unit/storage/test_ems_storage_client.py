@@ -50,3 +50,30 @@ class TestEmsStorageClient(TestCase):
         ems_client = EmsStorageClient("some-project-id")
 
         self.assertFalse(ems_client.is_blob_empty("bucket_name", "blob_name"))
+
+    @patch("storage.ems_storage_client.storage")
+    def test_list_blob_names_returnsNamesWithPrefix(self, storage_module):
+        mock_client = Mock()
+        storage_module.Client.return_value = mock_client
+        first_blob, second_blob = Mock(), Mock()
+        first_blob.name = "prefix-1"
+        second_blob.name = "prefix-2"
+        mock_client.list_blobs.return_value = [first_blob, second_blob]
+
+        ems_client = EmsStorageClient("some-project-id")
+
+        self.assertEqual(["prefix-1", "prefix-2"], ems_client.list_blob_names("bucket_name", "prefix-"))
+        mock_client.list_blobs.assert_called_once_with("bucket_name", prefix="prefix-")
+
+    @patch("storage.ems_storage_client.storage")
+    def test_open_blob_opensBlobForBinaryReading(self, storage_module):
+        mock_client = Mock()
+        storage_module.Client.return_value = mock_client
+        mock_blob = mock_client.bucket.return_value.blob.return_value
+
+        stream = EmsStorageClient("some-project-id").open_blob("bucket_name", "blob_name")
+
+        mock_client.bucket.assert_called_once_with("bucket_name")
+        mock_client.bucket.return_value.blob.assert_called_once_with("blob_name")
+        mock_blob.open.assert_called_once_with("rb")
+        self.assertIs(mock_blob.open.return_value, stream)